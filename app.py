@@ -1,19 +1,52 @@
-﻿import os
+﻿import hmac
+import os
+import threading
+import time
 from datetime import datetime
-from io import BytesIO
+from functools import wraps
 from uuid import uuid4
 
-from flask import Flask, flash, jsonify, redirect, render_template, request, send_file, url_for
+import click
+from flask import Flask, Response, abort, flash, jsonify, redirect, render_template, request, send_file, send_from_directory, session, stream_with_context, url_for
 from flask_login import LoginManager, current_user, login_required, login_user, logout_user
 from werkzeug.security import check_password_hash, generate_password_hash
-from werkzeug.utils import secure_filename
+from markupsafe import Markup
 
+from chatbot_analytics import ChatbotAnalytics, summary as chatbot_analytics_summary
 from config import Config
-from models.db_setup import NewsletterSubscriber, Product, QuoteRequest, Service, User, db
-from chatbot_data import CHATBOT_DEFAULT_SUGGESTIONS, generate_helpdesk_reply
+from db_profiles import apply_profile, engine_options
+from models.db_setup import Product, Service, User, db, ensure_columns, ensure_indexes
+from models.search import ensure_search_indexes, search_catalogue
+from models.queries import (
+    LEAD_FILTER_ARGS,
+    QUOTE_COLUMNS,
+    SUBSCRIBER_COLUMNS,
+    dashboard_counts,
+    lead_counts,
+    parse_lead_filters,
+    product_table_page,
+    quote_page,
+    recent_quotes,
+    service_table_page,
+    stream_quotes,
+    stream_subscribers,
+    subscriber_page,
+)
+from ingest import IngestBuffer
+from images import variant_filename, variant_size, variant_widths
+from jobs import JOB_KINDS, SUMMARY_PERIODS, JobRunner
+from metrics import Metrics
+from page_cache import PageCache
+from storage import LocalStorage, create_storage
+from uploads import collect_orphans, is_content_addressed, release_image, store_incoming, store_upload
 
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+LEAD_EXPORT_FORMATS = {
+    'csv': ('csv_chunks', 'text/csv'),
+    'ndjson': ('ndjson_chunks', 'application/x-ndjson'),
+    'parquet': ('parquet_chunks', 'application/vnd.apache.parquet'),
+}
 CONTACT_INFO = {
     'phone_display': '+266 6914 1413',
     'phone_tel': '+26669141413',
@@ -38,7 +71,29 @@ except OSError:
     app.config['UPLOAD_FOLDER'] = '/tmp/uploads'
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
 db.init_app(app)
+with app.app_context():
+    apply_profile(db.engine, app.config)
+storage = create_storage(app.config)
+app.jinja_env.globals.update(
+    upload_url=storage.url,
+    direct_uploads=storage.direct_uploads,
+    variant_filename=variant_filename,
+    variant_size=variant_size,
+    variant_widths=variant_widths
+)
+
+_chatbot_cache = None
+_chatbot_configured = False
+_chatbot_lock = threading.Lock()
+_bootstrap_lock = threading.Lock()
+_bootstrapped = False
+page_cache = PageCache(app.config['PAGE_CACHE_TTL'])
+job_runner = JobRunner(app)
+ingest_buffer = IngestBuffer(app)
+chatbot_analytics = ChatbotAnalytics(app)
+metrics = Metrics(app, db) if app.config['METRICS_ENABLED'] else None
 
 login_manager = LoginManager(app)
 login_manager.login_view = 'admin_login'
@@ -55,72 +110,230 @@ def allowed_file(filename):
 
 
 def save_uploaded_image(file_storage):
+    """Store an upload and return the image fields for its Product/Service, or None.
+
+    Uploads are content-addressed in the configured storage (see uploads.py
+    and storage.py): with Pillow installed the upload is decoded once into
+    resized WebP and JPEG variants (see images.py); otherwise the original
+    file is kept as is. When the browser already sent the file straight to
+    the bucket, the form carries its ``image_key`` instead of the bytes.
+    """
+    image_key = request.form.get('image_key', '').strip()
+    if image_key:
+        if not allowed_file(image_key):
+            return None
+        return store_incoming(image_key, storage)
+
     if not file_storage or not file_storage.filename:
         return None
 
     if not allowed_file(file_storage.filename):
         return None
 
-    filename = secure_filename(file_storage.filename)
-    extension = filename.rsplit('.', 1)[1].lower()
-    unique_name = f"{uuid4().hex}.{extension}"
-    destination = os.path.join(app.config['UPLOAD_FOLDER'], unique_name)
-    file_storage.save(destination)
-    return unique_name
+    return store_upload(file_storage, storage)
+
+
+def image_submitted(file_storage):
+    return bool(request.form.get('image_key', '').strip() or (file_storage and file_storage.filename))
+
+
+def apply_image(item, image_fields):
+    for field, value in image_fields.items():
+        setattr(item, field, value)
+
+
+def page_cache_key(path):
+    """Cache key of a public page; base.html renders the chatbot's suggestion chips into every page."""
+    return ('page', path, chatbot_engine().current_snapshot().version)
+
+
+def cached_page(static=False):
+    """Serve the view from the page cache for anonymous visitors.
+
+    Logged-in admins and requests carrying flash messages see per-user content
+    in base.html, so they always render fresh (catalogue fragments still come
+    from the cache). ``static`` pages are rendered once per deploy.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if current_user.is_authenticated or '_flashes' in session:
+                return view(*args, **kwargs)
+            return page_cache.get_or_render(page_cache_key(request.path), lambda: view(*args, **kwargs), static)
+        # asgi.py answers cache hits for these pages without a worker thread.
+        wrapper.page_cached = True
+        return wrapper
+    return decorator
+
+
+def product_cards(limit=None, show_price=False, empty_text='No products available yet.'):
+    def render():
+        query = Product.query.order_by(Product.created_at.desc())
+        if limit:
+            query = query.limit(limit)
+        return render_template(
+            'partials/product_cards.html',
+            products=query.all(),
+            show_price=show_price,
+            empty_text=empty_text
+        )
+    return Markup(page_cache.get_or_render(('fragment', 'products', limit, show_price), render))
+
+
+def service_cards(limit=None, empty_text='No services available yet.'):
+    def render():
+        query = Service.query.order_by(Service.created_at.desc())
+        if limit:
+            query = query.limit(limit)
+        return render_template('partials/service_cards.html', services=query.all(), empty_text=empty_text)
+    return Markup(page_cache.get_or_render(('fragment', 'services', limit), render))
+
+
+def chatbot_engine():
+    """The helpdesk chatbot module, imported and configured on first use rather than at cold start."""
+    global _chatbot_configured
+    import chatbot_data
+
+    if not _chatbot_configured:
+        with _chatbot_lock:
+            if not _chatbot_configured:
+                chatbot_data.configure(app.config['CHATBOT_KNOWLEDGE_PATH'], app.config['CHATBOT_SNAPSHOT_PATH'])
+                if metrics is not None:
+                    chatbot_data.MATCH_OBSERVERS.append(metrics.observe_chatbot_match)
+                # Cached pages embed the suggestion chips; entries keyed on the old version are dead weight.
+                chatbot_data.RELOAD_OBSERVERS.append(page_cache.clear)
+                _chatbot_configured = True
+    return chatbot_data
+
+
+def chatbot_cache():
+    """The helpdesk reply cache."""
+    global _chatbot_cache
+    if _chatbot_cache is None:
+        _chatbot_cache = chatbot_engine().ReplyCache(app.config['CHATBOT_CACHE_SIZE'])
+    return _chatbot_cache
 
 
 def bootstrap_admin():
     admin_username = os.getenv('ADMIN_USERNAME', 'admin')
-    admin_password = os.getenv('ADMIN_PASSWORD', 'admin123')
 
     existing_admin = User.query.filter_by(username=admin_username).first()
     if not existing_admin:
+        # A precomputed ADMIN_PASSWORD_HASH skips the deliberately slow KDF on fresh databases.
+        password_hash = os.getenv('ADMIN_PASSWORD_HASH') or generate_password_hash(os.getenv('ADMIN_PASSWORD', 'admin123'))
         admin = User(
             username=admin_username,
-            password=generate_password_hash(admin_password)
+            password=password_hash
         )
         db.session.add(admin)
         db.session.commit()
 
 
+def bootstrap_database():
+    """Create missing tables, columns and indexes and the admin user. Safe to repeat."""
+    db.create_all()
+    ensure_columns()
+    ensure_indexes()
+    if not ensure_search_indexes():
+        app.logger.warning('No full-text index on this database; search falls back to LIKE scans.')
+    bootstrap_admin()
+
+
+@app.before_request
+def bootstrap_on_first_request():
+    # SCHEMA_BOOTSTRAP='first-request' is for throwaway databases (local or /tmp SQLite);
+    # persistent databases are prepared once per deploy with 'flask bootstrap'.
+    global _bootstrapped
+    if _bootstrapped or app.config['SCHEMA_BOOTSTRAP'] != 'first-request':
+        return
+    with _bootstrap_lock:
+        if _bootstrapped:
+            return
+        try:
+            bootstrap_database()
+        except Exception as exc:
+            # Keep serving; check logs and DATABASE_URL config.
+            print(f'Database initialization warning: {exc}')
+        _bootstrapped = True
+
+
 @app.context_processor
 def inject_models():
-    return {'Product': Product, 'Service': Service, 'contact': CONTACT_INFO, 'chatbot_suggestions': CHATBOT_DEFAULT_SUGGESTIONS}
+    return {'contact': CONTACT_INFO, 'chatbot_suggestions': chatbot_engine().current_snapshot().default_suggestions}
 
 
 @app.route('/')
+@cached_page()
 def index():
-    recent_products = Product.query.order_by(Product.created_at.desc()).limit(3).all()
-    recent_services = Service.query.order_by(Service.created_at.desc()).limit(3).all()
     return render_template(
         'index.html',
-        recent_products=recent_products,
-        recent_services=recent_services
+        product_cards=product_cards(limit=3, empty_text='No products yet.'),
+        service_cards=service_cards(limit=3, empty_text='No services yet.')
     )
 
 
 @app.route('/products')
+@cached_page()
 def products():
-    items = Product.query.order_by(Product.created_at.desc()).all()
-    return render_template('products.html', products=items)
+    return render_template('products.html', product_cards=product_cards(show_price=True))
 
 
 @app.route('/services')
+@cached_page()
 def services():
-    items = Service.query.order_by(Service.created_at.desc()).all()
-    return render_template('services.html', services=items)
+    return render_template('services.html', service_cards=service_cards())
+
+
+@app.route('/search')
+def search():
+    query = request.args.get('q', '').strip()[:200]
+    product_results = service_results = ''
+    if query:
+        product_results = render_template(
+            'partials/product_cards.html',
+            products=search_catalogue(Product, query),
+            show_price=True,
+            empty_text='No matching products.'
+        )
+        service_results = render_template(
+            'partials/service_cards.html',
+            services=search_catalogue(Service, query),
+            empty_text='No matching services.'
+        )
+    return render_template(
+        'search.html',
+        query=query,
+        product_results=Markup(product_results),
+        service_results=Markup(service_results)
+    )
 
 
 @app.route('/contact')
+@cached_page(static=True)
 def contact():
     return render_template('contact.html')
 
 
 @app.route('/company')
+@cached_page(static=True)
 def company():
     return render_template('company.html')
 
 
+@app.route('/uploads/<path:filename>')
+def uploaded_file(filename):
+    if not isinstance(storage, LocalStorage):
+        abort(404)
+    # A hashed upload name always refers to the same bytes, so browsers and the
+    # CDN may keep it forever; replacing an image produces a new name.
+    if is_content_addressed(filename):
+        response = send_from_directory(app.config['UPLOAD_FOLDER'], filename, max_age=31536000)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
+    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+
+
 @app.route('/request-quote', methods=['GET', 'POST'])
 def request_quote():
     if request.method == 'POST':
@@ -136,17 +349,19 @@ def request_quote():
             flash('Please complete all required quote fields.', 'danger')
             return render_template('request_quote.html')
 
-        quote = QuoteRequest(
-            full_name=full_name,
-            phone=phone,
-            email=email or None,
-            location=location,
-            property_type=property_type,
-            service_type=service_type,
-            message=message or None
-        )
-        db.session.add(quote)
-        db.session.commit()
+        try:
+            ingest_buffer.submit('quote', {
+                'full_name': full_name,
+                'phone': phone,
+                'email': email or None,
+                'location': location,
+                'property_type': property_type,
+                'service_type': service_type,
+                'message': message or None,
+            })
+        except ValueError as exc:
+            flash(str(exc), 'danger')
+            return render_template('request_quote.html')
         flash('Quote request sent. We will contact you shortly.', 'success')
         return redirect(url_for('request_quote'))
 
@@ -160,19 +375,23 @@ def subscribe():
         flash('Please enter a valid email address.', 'danger')
         return redirect(request.referrer or url_for('index'))
 
-    exists = NewsletterSubscriber.query.filter_by(email=email).first()
-    if exists:
+    try:
+        created = ingest_buffer.submit('subscriber', {'email': email})
+    except ValueError as exc:
+        flash(str(exc), 'danger')
+        return redirect(request.referrer or url_for('index'))
+
+    # Buffered signups are acknowledged before the duplicate check runs at flush time.
+    if created is False:
         flash('This email is already subscribed.', 'info')
         return redirect(request.referrer or url_for('index'))
 
-    subscriber = NewsletterSubscriber(email=email)
-    db.session.add(subscriber)
-    db.session.commit()
     flash('Subscribed successfully. Thank you for joining.', 'success')
     return redirect(request.referrer or url_for('index'))
 
 
 @app.route('/promotions')
+@cached_page(static=True)
 def promotions():
     return render_template(
         'info_page.html',
@@ -183,6 +402,7 @@ def promotions():
 
 
 @app.route('/video-gallery')
+@cached_page(static=True)
 def video_gallery():
     return render_template(
         'info_page.html',
@@ -193,6 +413,7 @@ def video_gallery():
 
 
 @app.route('/blog')
+@cached_page(static=True)
 def blog():
     return render_template(
         'info_page.html',
@@ -203,6 +424,7 @@ def blog():
 
 
 @app.route('/terms-and-conditions')
+@cached_page(static=True)
 def terms_and_conditions():
     return render_template(
         'legal.html',
@@ -218,6 +440,7 @@ def terms_and_conditions():
 
 
 @app.route('/privacy-policy')
+@cached_page(static=True)
 def privacy_policy():
     return render_template(
         'legal.html',
@@ -233,6 +456,7 @@ def privacy_policy():
 
 
 @app.route('/cookie-policy')
+@cached_page(static=True)
 def cookie_policy():
     return render_template(
         'legal.html',
@@ -246,19 +470,64 @@ def cookie_policy():
     )
 
 
-@app.route('/api/chatbot/message', methods=['POST'])
-def chatbot_message():
-    payload = request.get_json(silent=True) or {}
-    message = (payload.get('message') or '').strip()
-
+def chatbot_reply(message):
+    """JSON body answering a chatbot message; needs no request or app context (see asgi.py)."""
     if not message:
-        return jsonify({
+        return {
             'reply': 'Please type your question so I can assist you.',
-            'suggestions': CHATBOT_DEFAULT_SUGGESTIONS,
-        })
+            'suggestions': chatbot_engine().current_snapshot().default_suggestions,
+        }
+
+    started = time.perf_counter()
+    answer = chatbot_cache().reply(message, CONTACT_INFO, app.config['CHATBOT_MODE'])
+    chatbot_analytics.record(message, answer, app.config['CHATBOT_MODE'], time.perf_counter() - started)
+    return {
+        'reply': answer.reply,
+        'suggestions': answer.suggestions,
+        'route': answer.route,
+        'scores': chatbot_engine().score_rows(answer.scores),
+    }
+
+
+def chatbot_response(payload, method):
+    response = app.response_class(app.json.dumps(payload) + '\n', mimetype='application/json')
+    response.add_etag()
+    if method == 'GET':
+        # GET is used for verbatim suggestion clicks so the CDN can answer them.
+        response.cache_control.public = True
+        response.cache_control.max_age = app.config['CHATBOT_CACHE_MAX_AGE']
+        response.cache_control.s_maxage = app.config['CHATBOT_CACHE_MAX_AGE']
+    return response
+
+
+@app.route('/api/chatbot/message', methods=['GET', 'POST'])
+def chatbot_message():
+    if request.method == 'GET':
+        message = request.args.get('message', '').strip()
+    else:
+        payload = request.get_json(silent=True) or {}
+        message = (payload.get('message') or '').strip()
+
+    return chatbot_response(chatbot_reply(message), request.method).make_conditional(request)
+
+
+@app.route('/api/chatbot/batch', methods=['POST'])
+@login_required
+def chatbot_batch():
+    # Staff transcript replay only: a batch can cost seconds of CPU, so visitors cannot call it.
+    payload = request.get_json(silent=True)
+    messages = payload.get('messages') if isinstance(payload, dict) else payload
+    if not isinstance(messages, list) or not all(isinstance(item, str) for item in messages):
+        return jsonify({'error': 'Send a JSON array of message strings.'}), 400
+
+    limit = app.config['CHATBOT_BATCH_LIMIT']
+    if len(messages) > limit:
+        return jsonify({'error': f'A batch may contain at most {limit} messages.'}), 413
+
+    results = chatbot_engine().generate_helpdesk_replies(messages, CONTACT_INFO, app.config['CHATBOT_MODE'])
+    return jsonify({'results': results})
+
 
-    reply, suggestions = generate_helpdesk_reply(message, CONTACT_INFO)
-    return jsonify({'reply': reply, 'suggestions': suggestions})
 @app.route('/admin/login', methods=['GET', 'POST'])
 def admin_login():
     if current_user.is_authenticated:
@@ -290,117 +559,269 @@ def admin_logout():
 @app.route('/admin/dashboard')
 @login_required
 def admin_dashboard():
-    product_count = Product.query.count()
-    service_count = Service.query.count()
-    quote_count = QuoteRequest.query.count()
-    subscriber_count = NewsletterSubscriber.query.count()
-    recent_quotes = QuoteRequest.query.order_by(QuoteRequest.created_at.desc()).limit(8).all()
+    counts = dashboard_counts()
+    per_page = app.config['DASHBOARD_PAGE_SIZE']
+    products_after = request.args.get('products_after')
+    services_after = request.args.get('services_after')
+    product_rows, next_products = product_table_page(products_after, per_page)
+    service_rows, next_services = service_table_page(services_after, per_page)
     return render_template(
         'admin/dashboard.html',
-        product_count=product_count,
-        service_count=service_count,
-        quote_count=quote_count,
-        subscriber_count=subscriber_count,
-        recent_quotes=recent_quotes
+        product_count=counts['products'],
+        service_count=counts['services'],
+        quote_count=counts['quotes'],
+        subscriber_count=counts['subscribers'],
+        recent_quotes=recent_quotes(),
+        products=product_rows,
+        services=service_rows,
+        products_after=products_after,
+        services_after=services_after,
+        next_products=next_products,
+        next_services=next_services,
+        chatbot_cache_stats=chatbot_cache().stats()
+    )
+
+
+@app.route('/admin/chatbot/knowledge', methods=['GET', 'POST'])
+@login_required
+def admin_chatbot_knowledge():
+    engine = chatbot_engine()
+    if request.method == 'POST':
+        document = request.form.get('knowledge', '')
+        try:
+            snapshot = engine.save_knowledge(document)
+        except ValueError as exc:
+            flash(f'Knowledge base not saved. {exc}', 'danger')
+            return render_template('admin/chatbot_knowledge.html', document=document, snapshot=engine.current_snapshot())
+        except OSError:
+            flash('Knowledge base not saved: the file is read-only on this server.', 'danger')
+            return render_template('admin/chatbot_knowledge.html', document=document, snapshot=engine.current_snapshot())
+        # Cached pages embed the default suggestion chips.
+        page_cache.clear()
+        flash(f'Knowledge base revision {snapshot.revision} is live.', 'success')
+        return redirect(url_for('admin_chatbot_knowledge'))
+
+    return render_template('admin/chatbot_knowledge.html', document=engine.knowledge_document(), snapshot=engine.current_snapshot())
+
+
+@app.route('/admin/chatbot/analytics', methods=['GET', 'POST'])
+@login_required
+def admin_chatbot_analytics():
+    if request.method == 'POST':
+        try:
+            chatbot_analytics.rollup()
+        except Exception:
+            app.logger.exception('Rolling up chatbot analytics failed')
+            flash('Chatbot analytics could not be refreshed. Check the server log.', 'danger')
+        else:
+            flash('Chatbot analytics are up to date.', 'success')
+        return redirect(url_for('admin_chatbot_analytics', days=request.args.get('days')))
+
+    days = request.args.get('days', 7, type=int)
+    if days not in (1, 7, 30, 90):
+        days = 7
+    return render_template(
+        'admin/chatbot_analytics.html',
+        days=days,
+        report=chatbot_analytics_summary(days),
+        buffer_stats=chatbot_analytics.stats(),
+        rollup_minutes=app.config['CHATBOT_ANALYTICS_ROLLUP_INTERVAL'] / 60
     )
 
 
 @app.route('/admin/leads')
 @login_required
 def admin_leads():
-    quotes = QuoteRequest.query.order_by(QuoteRequest.created_at.desc()).all()
-    subscribers = NewsletterSubscriber.query.order_by(NewsletterSubscriber.created_at.desc()).all()
-    return render_template('admin/leads.html', quotes=quotes, subscribers=subscribers)
+    filters = parse_lead_filters(request.args)
+    filter_args = {key: request.args[key] for key in LEAD_FILTER_ARGS if request.args.get(key)}
+    per_page = app.config['LEADS_PAGE_SIZE']
+    quotes_after = request.args.get('quotes_after')
+    subscribers_after = request.args.get('subscribers_after')
+    quotes, next_quotes = quote_page(filters, quotes_after, per_page)
+    subscribers, next_subscribers = subscriber_page(filters, subscribers_after, per_page)
+    return render_template(
+        'admin/leads.html',
+        quotes=quotes,
+        subscribers=subscribers,
+        filter_args=filter_args,
+        quotes_after=quotes_after,
+        subscribers_after=subscribers_after,
+        next_quotes=next_quotes,
+        next_subscribers=next_subscribers
+    )
+
+
+@app.route('/admin/api/leads')
+@login_required
+def admin_leads_api():
+    kind = request.args.get('kind', 'quotes')
+    if kind not in ('quotes', 'subscribers'):
+        return jsonify({'error': "kind must be 'quotes' or 'subscribers'."}), 400
+
+    per_page = min(request.args.get('per_page', app.config['LEADS_PAGE_SIZE'], type=int), 500)
+    page = quote_page if kind == 'quotes' else subscriber_page
+    rows, next_cursor = page(parse_lead_filters(request.args), request.args.get('cursor'), max(per_page, 1))
+    items = [{**row._asdict(), 'created_at': row.created_at.isoformat()} for row in rows]
+    return jsonify({'kind': kind, 'items': items, 'next_cursor': next_cursor})
 
 
 @app.route('/admin/leads/export/pdf')
 @login_required
 def export_leads_pdf():
+    from reports import leads_pdf_chunks
+
+    filters = parse_lead_filters(request.args)
+    counts = lead_counts(filters)
+    chunks = leads_pdf_chunks(
+        stream_quotes(filters), stream_subscribers(filters), counts['quotes'], counts['subscribers']
+    )
+    filename = f"smartpest-leads-{datetime.now().strftime('%Y%m%d-%H%M')}.pdf"
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/pdf',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+@app.route('/admin/leads/export/<export_format>')
+@login_required
+def export_leads(export_format):
+    if export_format not in LEAD_EXPORT_FORMATS:
+        return jsonify({'error': f"Unknown export format '{export_format}'."}), 404
+
+    kind = request.args.get('kind', 'quotes')
+    if kind not in ('quotes', 'subscribers'):
+        return jsonify({'error': "kind must be 'quotes' or 'subscribers'."}), 400
+
+    filters = parse_lead_filters(request.args)
+    if kind == 'quotes':
+        rows, columns = stream_quotes(filters), QUOTE_COLUMNS
+    else:
+        rows, columns = stream_subscribers(filters), SUBSCRIBER_COLUMNS
+
+    import reports
+
+    render, mimetype = LEAD_EXPORT_FORMATS[export_format]
     try:
-        from reportlab.lib.pagesizes import A4
-        from reportlab.pdfgen import canvas
+        chunks = getattr(reports, render)(rows, columns)
     except ImportError:
-        flash('PDF export requires reportlab. Run: pip install reportlab', 'danger')
+        flash('Parquet export requires pyarrow. Run: pip install pyarrow', 'danger')
         return redirect(url_for('admin_leads'))
 
-    quotes = QuoteRequest.query.order_by(QuoteRequest.created_at.desc()).all()
-    subscribers = NewsletterSubscriber.query.order_by(NewsletterSubscriber.created_at.desc()).all()
-
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=A4)
-    width, height = A4
-    left = 40
-    y = height - 40
-
-    def new_page():
-        nonlocal y
-        pdf.showPage()
-        y = height - 40
-        pdf.setFont('Helvetica-Bold', 14)
-        pdf.drawString(left, y, 'Smart Pest Solutions - Leads Report (continued)')
-        y -= 24
-        pdf.setFont('Helvetica', 9)
-
-    def ensure_space(min_space=60):
-        nonlocal y
-        if y < min_space:
-            new_page()
-
-    pdf.setFont('Helvetica-Bold', 16)
-    pdf.drawString(left, y, 'Smart Pest Solutions - Leads Report')
-    y -= 18
-    pdf.setFont('Helvetica', 9)
-    pdf.drawString(left, y, f'Generated: {datetime.now().strftime("%Y-%m-%d %H:%M")}')
-    y -= 22
-
-    pdf.setFont('Helvetica-Bold', 12)
-    pdf.drawString(left, y, f'Quote Requests ({len(quotes)})')
-    y -= 16
-    pdf.setFont('Helvetica', 9)
-    pdf.drawString(left, y, 'Date | Name | Phone | Location | Service')
-    y -= 12
-    pdf.line(left, y, width - left, y)
-    y -= 10
-
-    for quote in quotes:
-        ensure_space()
-        date_txt = quote.created_at.strftime('%Y-%m-%d')
-        line = f"{date_txt} | {quote.full_name[:20]} | {quote.phone[:16]} | {quote.location[:18]} | {quote.service_type[:22]}"
-        pdf.drawString(left, y, line)
-        y -= 12
-        if quote.email:
-            ensure_space()
-            pdf.drawString(left + 14, y, f'Email: {quote.email[:55]}')
-            y -= 12
-        if quote.message:
-            ensure_space()
-            msg = quote.message.replace('\n', ' ')[:90]
-            pdf.drawString(left + 14, y, f'Note: {msg}')
-            y -= 12
-        y -= 4
-
-    ensure_space(90)
-    y -= 8
-    pdf.setFont('Helvetica-Bold', 12)
-    pdf.drawString(left, y, f'Newsletter Subscribers ({len(subscribers)})')
-    y -= 16
-    pdf.setFont('Helvetica', 9)
-    pdf.drawString(left, y, 'Date | Email')
-    y -= 12
-    pdf.line(left, y, width - left, y)
-    y -= 10
-
-    for subscriber in subscribers:
-        ensure_space()
-        date_txt = subscriber.created_at.strftime('%Y-%m-%d')
-        pdf.drawString(left, y, f'{date_txt} | {subscriber.email[:70]}')
-        y -= 12
-
-    pdf.save()
-    buffer.seek(0)
+    filename = f"smartpest-{kind}-{datetime.now().strftime('%Y%m%d-%H%M')}.{export_format}"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+
+def job_status(job):
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job_runner.progress(job),
+        'total': job.total,
+        'error': job.error,
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+        'download_url': url_for('download_job', job_id=job.id) if job.status == 'done' else None,
+    }
+
+
+@app.route('/admin/jobs', methods=['GET', 'POST'])
+@login_required
+def admin_jobs():
+    if request.method == 'POST':
+        kind = request.form.get('kind', '')
+        if kind not in JOB_KINDS:
+            flash('Choose a valid export or report.', 'danger')
+            return redirect(url_for('admin_jobs'))
+
+        params = {key: request.form.get(key, '').strip() for key in ('period', 'since', 'until')}
+        job = job_runner.enqueue(kind, params)
+        flash(f'{JOB_KINDS[kind]} queued as job #{job.id}.', 'success')
+        return redirect(url_for('admin_jobs'))
+
+    jobs = job_runner.recent()
+    return render_template(
+        'admin/jobs.html',
+        jobs=[job_status(job) for job in jobs],
+        job_kinds=JOB_KINDS,
+        summary_periods=SUMMARY_PERIODS,
+        refresh=any(job.status in ('queued', 'running') for job in jobs)
+    )
+
+
+@app.route('/admin/jobs/<int:job_id>')
+@login_required
+def job_detail(job_id):
+    job = job_runner.get(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found.'}), 404
+    return jsonify(job_status(job))
+
+
+@app.route('/admin/jobs/<int:job_id>/download')
+@login_required
+def download_job(job_id):
+    job = job_runner.get(job_id)
+    path = job_runner.artifact_path(job) if job and job.status == 'done' else None
+    if not path or not os.path.exists(path):
+        flash('That export is not available. Queue it again.', 'danger')
+        return redirect(url_for('admin_jobs'))
+    return send_file(path, as_attachment=True, download_name=f'smartpest-{job.artifact}')
+
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Scrapers authenticate with METRICS_TOKEN as a bearer token; admins can open it in the browser.
+    if metrics is None:
+        abort(404)
+    token = app.config['METRICS_TOKEN']
+    authorized = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not authorized and not current_user.is_authenticated:
+        abort(401 if token else 404)
+    response = Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
+    response.cache_control.no_store = True
+    return response
+
+
+@app.route('/admin/metrics')
+@login_required
+def admin_metrics():
+    if metrics is None:
+        flash('Request metrics are disabled (METRICS_ENABLED=0).', 'danger')
+        return redirect(url_for('admin_dashboard'))
+    return render_template(
+        'admin/metrics.html',
+        endpoints=metrics.endpoint_summary(),
+        templates=metrics.template_summary(),
+        chatbot_matches=metrics.chatbot_summary(),
+        slow_requests=list(metrics.slow_requests),
+        slow_request_ms=app.config['SLOW_REQUEST_MS'],
+        sql_statements_total=metrics.sql_statements_total,
+        sql_seconds_total=metrics.sql_seconds_total,
+        uptime=datetime.utcnow() - datetime.utcfromtimestamp(metrics.started_at)
+    )
 
-    filename = f"smartpest-leads-{datetime.now().strftime('%Y%m%d-%H%M')}.pdf"
-    return send_file(buffer, as_attachment=True, download_name=filename, mimetype='application/pdf')
+
+@app.route('/admin/uploads/presign', methods=['POST'])
+@login_required
+def presign_upload():
+    if not storage.direct_uploads:
+        return jsonify({'error': 'Direct uploads are not available for this storage backend.'}), 404
+
+    payload = request.get_json(silent=True) or {}
+    filename = str(payload.get('filename', ''))
+    content_type = str(payload.get('content_type', ''))
+    if not allowed_file(filename) or not content_type.startswith('image/'):
+        return jsonify({'error': 'Image must be png, jpg, jpeg, gif, or webp.'}), 400
+
+    key = f"incoming/{uuid4().hex}.{filename.rsplit('.', 1)[1].lower()}"
+    upload = storage.presigned_upload(key, content_type, app.config['MAX_CONTENT_LENGTH'])
+    return jsonify({'key': key, 'url': upload['url'], 'fields': upload['fields']})
 
 
 @app.route('/admin/products/add', methods=['GET', 'POST'])
@@ -424,19 +845,21 @@ def add_product():
                 flash('Price must be a valid number.', 'danger')
                 return render_template('admin/add_product.html')
 
-        image_name = save_uploaded_image(image_file)
-        if image_file and image_file.filename and image_name is None:
+        image = save_uploaded_image(image_file)
+        if image_submitted(image_file) and image is None:
             flash('Image must be png, jpg, jpeg, gif, or webp.', 'danger')
             return render_template('admin/add_product.html')
 
         product = Product(
             name=name,
             description=description,
-            price=price,
-            image=image_name
+            price=price
         )
+        if image:
+            apply_image(product, image)
         db.session.add(product)
         db.session.commit()
+        page_cache.invalidate_catalogue()
 
         flash('Product created successfully.', 'success')
         return redirect(url_for('admin_dashboard'))
@@ -470,18 +893,22 @@ def edit_product(product_id):
                 flash('Price must be a valid number.', 'danger')
                 return render_template('admin/edit_product.html', product=product)
 
-        image_name = save_uploaded_image(image_file)
-        if image_file and image_file.filename and image_name is None:
+        image = save_uploaded_image(image_file)
+        if image_submitted(image_file) and image is None:
             flash('Image must be png, jpg, jpeg, gif, or webp.', 'danger')
             return render_template('admin/edit_product.html', product=product)
 
         product.name = name
         product.description = description
         product.price = price
-        if image_name:
-            product.image = image_name
+        previous_image = product.image
+        if image:
+            apply_image(product, image)
 
         db.session.commit()
+        if previous_image != product.image:
+            release_image(previous_image, storage)
+        page_cache.invalidate_catalogue()
         flash('Product updated successfully.', 'success')
         return redirect(url_for('admin_dashboard'))
 
@@ -496,8 +923,11 @@ def delete_product(product_id):
         flash('Product not found.', 'danger')
         return redirect(url_for('admin_dashboard'))
 
+    image = product.image
     db.session.delete(product)
     db.session.commit()
+    release_image(image, storage)
+    page_cache.invalidate_catalogue()
     flash('Product deleted successfully.', 'success')
     return redirect(url_for('admin_dashboard'))
 
@@ -514,14 +944,17 @@ def add_service():
             flash('Service name is required.', 'danger')
             return render_template('admin/add_service.html')
 
-        image_name = save_uploaded_image(image_file)
-        if image_file and image_file.filename and image_name is None:
+        image = save_uploaded_image(image_file)
+        if image_submitted(image_file) and image is None:
             flash('Image must be png, jpg, jpeg, gif, or webp.', 'danger')
             return render_template('admin/add_service.html')
 
-        service = Service(name=name, description=description, image=image_name)
+        service = Service(name=name, description=description)
+        if image:
+            apply_image(service, image)
         db.session.add(service)
         db.session.commit()
+        page_cache.invalidate_catalogue()
 
         flash('Service created successfully.', 'success')
         return redirect(url_for('admin_dashboard'))
@@ -546,17 +979,21 @@ def edit_service(service_id):
             flash('Service name is required.', 'danger')
             return render_template('admin/edit_service.html', service=service)
 
-        image_name = save_uploaded_image(image_file)
-        if image_file and image_file.filename and image_name is None:
+        image = save_uploaded_image(image_file)
+        if image_submitted(image_file) and image is None:
             flash('Image must be png, jpg, jpeg, gif, or webp.', 'danger')
             return render_template('admin/edit_service.html', service=service)
 
         service.name = name
         service.description = description
-        if image_name:
-            service.image = image_name
+        previous_image = service.image
+        if image:
+            apply_image(service, image)
 
         db.session.commit()
+        if previous_image != service.image:
+            release_image(previous_image, storage)
+        page_cache.invalidate_catalogue()
         flash('Service updated successfully.', 'success')
         return redirect(url_for('admin_dashboard'))
 
@@ -571,19 +1008,56 @@ def delete_service(service_id):
         flash('Service not found.', 'danger')
         return redirect(url_for('admin_dashboard'))
 
+    image = service.image
     db.session.delete(service)
     db.session.commit()
+    release_image(image, storage)
+    page_cache.invalidate_catalogue()
     flash('Service deleted successfully.', 'success')
     return redirect(url_for('admin_dashboard'))
 
 
-with app.app_context():
+@app.cli.command('gc-uploads')
+@click.option('--grace', default=3600, show_default=True, help='Keep files modified within this many seconds.')
+@click.option('--dry-run', is_flag=True, help='List orphaned uploads without deleting them.')
+def gc_uploads_command(grace, dry_run):
+    """Delete uploaded images no product or service references."""
+    removed = collect_orphans(storage, grace, dry_run)
+    for filename in removed:
+        click.echo(filename)
+    click.echo(f"{'Would remove' if dry_run else 'Removed'} {len(removed)} orphaned upload(s).")
+
+
+@app.cli.command('flush-submissions')
+def flush_submissions_command():
+    """Insert journalled quote requests and signups, including ones left by a crashed worker."""
+    ingest_buffer.flush()
+    click.echo('Buffered submissions flushed.')
+
+
+@app.cli.command('chatbot-rollup')
+@click.option('--days', default=2, show_default=True, help='Rebuild the rollups of this many most recent days.')
+def chatbot_rollup_command(days):
+    """Rebuild the daily chatbot analytics rollups and purge expired events."""
+    chatbot_analytics.rollup(days)
+    click.echo(f'Chatbot analytics rolled up for the last {days} day(s).')
+
+
+@app.cli.command('chatbot-snapshot')
+def chatbot_snapshot_command():
+    """Validate the chatbot knowledge base and write its compiled snapshot."""
     try:
-        db.create_all()
-        bootstrap_admin()
-    except Exception as exc:
-        # Avoid crashing serverless cold start; check logs and DATABASE_URL config.
-        print(f'Database initialization warning: {exc}')
+        snapshot = chatbot_engine().reload_knowledge()
+    except ValueError as exc:
+        raise click.ClickException(f"{app.config['CHATBOT_KNOWLEDGE_PATH']}: {exc}")
+    click.echo(f"Knowledge base revision {snapshot.revision} ({snapshot.version[:12]}) compiled to {app.config['CHATBOT_SNAPSHOT_PATH']}.")
+
+
+@app.cli.command('bootstrap')
+def bootstrap_command():
+    """Create the schema and the admin user; safe to run on every deploy."""
+    bootstrap_database()
+    click.echo('Database schema and admin user are ready.')
 
 
 if __name__ == '__main__':
@@ -0,0 +1,266 @@
+"""ASGI serving mode: ``uvicorn asgi:application --workers 4``.
+
+uvicorn is a deploy-time dependency of this mode only (pip install uvicorn);
+it stays out of requirements.txt because the Vercel and WSGI deployments
+never import this module.
+
+The event loop answers the two request types behind bursty public traffic
+itself, without tying up a thread:
+
+  /api/chatbot/message  chatbot replies never touch the database (analytics
+                        are queued in memory), so the reply is computed on
+                        the loop; it takes microseconds on a reply-cache hit
+  public pages          anonymous GETs of @cached_page views are sent
+                        straight from the page cache
+
+Every other request, page-cache misses included, runs the unchanged Flask
+app on a pool of ASGI_WSGI_THREADS threads. Those are the only requests
+that query the database, so the synchronous SQLAlchemy engine is kept and
+its calls stay off the loop. Open connections cost the loop nothing while
+they wait, so idle or slow clients no longer hold a worker.
+
+app.py remains the WSGI entry point (Vercel, ``flask run``, gunicorn).
+benchmarks/asgi_load.py compares both modes under concurrent connections.
+"""
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+from werkzeug.http import parse_cookie, parse_options_header
+
+from app import app, chatbot_engine, chatbot_reply, chatbot_response, metrics, page_cache, page_cache_key
+
+
+CHATBOT_PATH = '/api/chatbot/message'
+# The ASGI server writes its own; passing Werkzeug's through would send them twice.
+SERVER_HEADERS = frozenset({'date', 'server'})
+# _read_body() result when the client went away before sending the whole body.
+DISCONNECTED = object()
+# Anonymous visitors carry neither cookie; logged-in admins and pending flash messages need Flask.
+SESSION_COOKIES = (app.config['SESSION_COOKIE_NAME'], app.config.get('REMEMBER_COOKIE_NAME', 'remember_token'))
+
+
+def _cached_paths():
+    """Map the argument-less @cached_page routes to their endpoint names."""
+    return {
+        rule.rule: rule.endpoint
+        for rule in app.url_map.iter_rules()
+        if not rule.arguments and getattr(app.view_functions[rule.endpoint], 'page_cached', False)
+    }
+
+
+def _header(scope, name):
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+
+def _environ(scope, body):
+    """PEP 3333 environ for an ASGI HTTP scope whose body has been read."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': scope['client'][0] if scope.get('client') else '',
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for key, value in scope['headers']:
+        name = key.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+            continue
+        if name == 'CONTENT_LENGTH':
+            continue
+        name = f'HTTP_{name}'
+        if name in environ:
+            value = environ[name] + ('; ' if name == 'HTTP_COOKIE' else ',') + value
+        environ[name] = value
+    return environ
+
+
+def _start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (name.lower().encode('latin-1'), value.encode('latin-1'))
+            for name, value in headers
+            if name.lower() not in SERVER_HEADERS
+        ],
+    }
+
+
+async def _send_response(send, status, headers, body):
+    await send(_start_message(status, headers))
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class Application:
+    """ASGI callable wrapping the Flask app (module attribute ``application``)."""
+
+    def __init__(self, flask_app, threads):
+        self.flask_app = flask_app
+        self.max_body = flask_app.config['MAX_CONTENT_LENGTH']
+        self.cached_paths = _cached_paths()
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='smartpest-wsgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return  # websockets are not served
+
+        body = await self._read_body(scope, receive)
+        if body is DISCONNECTED:
+            return  # a truncated body must never reach a view; there is nobody left to answer
+        if body is None:
+            await _send_response(send, 413, [('Content-Type', 'text/plain')], b'Request Entity Too Large')
+            return
+
+        started = time.perf_counter()
+        path = scope['path']
+        method = scope['method']
+        if path == CHATBOT_PATH and method in ('GET', 'POST'):
+            message = self._chatbot_message(scope, body)
+            if message is not None:
+                response = chatbot_response(chatbot_reply(message), method)
+                status = await self._send_flask_response(scope, send, response, body)
+                self._observe('chatbot_message', method, status, started)
+                return
+        elif method == 'GET' and path in self.cached_paths and self._anonymous(scope):
+            html = page_cache.get(page_cache_key(path))
+            if html is not None:
+                response = self.flask_app.response_class(html, mimetype='text/html')
+                status = await self._send_flask_response(scope, send, response, body)
+                self._observe(self.cached_paths[path], method, status, started)
+                return
+
+        await self._call_wsgi(scope, send, body)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                # Compile the chatbot knowledge base before the first message rather than on it.
+                await asyncio.get_running_loop().run_in_executor(self.executor, lambda: chatbot_engine().current_snapshot())
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _read_body(self, scope, receive):
+        """The whole request body, None when it is larger than MAX_CONTENT_LENGTH, or DISCONNECTED."""
+        chunks = []
+        size = 0
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return DISCONNECTED
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if self.max_body is not None and size > self.max_body:
+                return None
+            chunks.append(chunk)
+            more_body = message.get('more_body', False)
+        return b''.join(chunks)
+
+    @staticmethod
+    def _anonymous(scope):
+        cookies = _header(scope, b'cookie')
+        return not cookies or not any(name in parse_cookie(cookies) for name in SESSION_COOKIES)
+
+    @staticmethod
+    def _chatbot_message(scope, body):
+        """The stripped message, or None when Flask should handle the request (and its errors) itself."""
+        if scope['method'] == 'GET':
+            for key, value in parse_qsl(scope['query_string'].decode('utf-8', 'replace'), keep_blank_values=True):
+                if key == 'message':
+                    return value.strip()
+            return ''
+
+        mimetype, _ = parse_options_header(_header(scope, b'content-type'))
+        if not (mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))):
+            return ''
+        try:
+            payload = app.json.loads(body) if body else None
+        except ValueError:
+            return ''
+        if not payload:
+            return ''
+        if not isinstance(payload, dict) or not isinstance(payload.get('message') or '', str):
+            return None
+        return (payload.get('message') or '').strip()
+
+    async def _send_flask_response(self, scope, send, response, body):
+        # Flask marks these responses as session-dependent; keep shared caches keyed the same way.
+        response.vary.add('Cookie')
+        environ = _environ(scope, body)
+        # Werkzeug's own WSGI finalization drops the body of 304s and HEAD requests.
+        app_iter, status, headers = response.make_conditional(environ).get_wsgi_response(environ)
+        status = int(status.split(' ', 1)[0])
+        await _send_response(send, status, headers, b''.join(app_iter))
+        return status
+
+    @staticmethod
+    def _observe(endpoint, method, status, started):
+        if metrics is not None:
+            metrics.observe_request(endpoint, method, status, time.perf_counter() - started)
+
+    async def _call_wsgi(self, scope, send, body):
+        loop = asyncio.get_running_loop()
+        environ = _environ(scope, body)
+
+        def send_from_thread(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def run():
+            started = []
+
+            def start_response(status, headers, exc_info=None):
+                if exc_info and started:
+                    raise exc_info[1].with_traceback(exc_info[2])
+                started[:] = [int(status.split(' ', 1)[0]), headers]
+
+            result = self.flask_app(environ, start_response)
+            try:
+                sent_start = False
+                for chunk in result:
+                    if not chunk:
+                        continue
+                    if not sent_start:
+                        send_from_thread(_start_message(*started))
+                        sent_start = True
+                    # Backpressure: the thread waits until the loop has handed the chunk to the client.
+                    send_from_thread({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                if not sent_start:
+                    send_from_thread(_start_message(*started))
+                send_from_thread({'type': 'http.response.body', 'body': b''})
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()  # runs call_on_close handlers (request metrics)
+
+        await loop.run_in_executor(self.executor, run)
+
+
+application = Application(app, app.config['ASGI_WSGI_THREADS'])
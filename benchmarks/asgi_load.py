@@ -0,0 +1,257 @@
+"""Compare concurrent-connection capacity of the WSGI and ASGI deployments.
+
+Both servers run on this machine, one after the other, against the same
+throwaway SQLite database and with the same number of worker processes:
+
+  sync   gunicorn app:app (sync workers: one request per process at a time)
+  asgi   uvicorn asgi:application (see asgi.py)
+
+For each --concurrency level, that many keep-alive connections send a mix of
+chatbot messages (as the widget in base.html does, mostly repeated
+questions plus some unique ones) and public page views for --duration
+seconds, pausing --think-ms between requests like a visitor would.
+Reported per server and level:
+
+  req/s       completed requests per second
+  p50/p99     latency of completed requests, including time spent queued
+  errors      refused, reset or timed-out connections and 5xx responses
+
+A server's capacity is the highest level it served with under 1% errors
+and a p99 below --slo-ms. The load generator shares the CPU with the
+server, equally for both modes; use --client-processes to spread it out.
+
+Needs gunicorn and uvicorn (pip install gunicorn uvicorn); neither is a
+runtime dependency.
+
+Usage: python benchmarks/asgi_load.py [--concurrency 10,100,250,500,750,1000] [--duration 10]
+                                      [--workers 2] [--think-ms 100] [--output results.json]
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+HOST = '127.0.0.1'
+PORT = 8765
+SUGGESTIONS = ('How do I book a service?', 'How do you treat cockroaches?', 'Are treatments safe for children and pets?',
+               'How do I get rid of rats?', 'termites in my door frames', 'how much does fumigation cost')
+PAGES = ('/', '/products', '/services', '/contact')
+
+
+def build_request(n, connection):
+    """The n-th request of a connection: 7 in 10 are chatbot messages, 1 in 10 of those never seen before."""
+    if n % 10 < 7:
+        message = f'question {connection} {n}' if n % 10 == 0 else SUGGESTIONS[(connection + n) % len(SUGGESTIONS)]
+        body = json.dumps({'message': message}).encode('utf-8')
+        head = (f'POST /api/chatbot/message HTTP/1.1\r\nHost: {HOST}\r\nContent-Type: application/json\r\n'
+                f'Content-Length: {len(body)}\r\n\r\n')
+        return head.encode('latin-1') + body
+    return f'GET {PAGES[n % len(PAGES)]} HTTP/1.1\r\nHost: {HOST}\r\n\r\n'.encode('latin-1')
+
+
+async def read_response(reader):
+    """Read one response; return (status, keep_alive)."""
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    version, status = lines[0].split(' ', 2)[:2]
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip().lower()
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    keep_alive = version == 'HTTP/1.1' and headers.get('connection') != 'close'
+    return int(status), keep_alive
+
+
+async def connection_loop(number, deadline, think, timeout, latencies, errors):
+    reader = writer = None
+    n = 0
+    while time.monotonic() < deadline:
+        n += 1
+        request = build_request(n, number)
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(HOST, PORT), timeout)
+            writer.write(request)
+            status, keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+        except (OSError, ValueError, asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            errors.append('connection')
+            keep_alive = False
+        else:
+            if status >= 500:
+                errors.append(str(status))
+            else:
+                latencies.append(time.perf_counter() - started)
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+        if think:
+            await asyncio.sleep(think)
+    if writer is not None:
+        writer.close()
+
+
+async def run_client(first, connections, duration, think, timeout):
+    latencies = []
+    errors = []
+    deadline = time.monotonic() + duration
+    await asyncio.gather(*(connection_loop(first + n, deadline, think, timeout, latencies, errors) for n in range(connections)))
+    return {'latencies': latencies, 'errors': len(errors)}
+
+
+def server_command(mode, workers):
+    if mode == 'sync':
+        return [sys.executable, '-m', 'gunicorn', '--workers', str(workers), '--bind', f'{HOST}:{PORT}',
+                '--backlog', '2048', '--log-level', 'warning', 'app:app']
+    return [sys.executable, '-m', 'uvicorn', 'asgi:application', '--workers', str(workers), '--host', HOST,
+            '--port', str(PORT), '--backlog', '2048', '--log-level', 'warning']
+
+
+def wait_until_ready(process):
+    for _ in range(200):
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with status {process.returncode}')
+        try:
+            # Also renders each page once so both modes start with a warm page cache.
+            for path in PAGES:
+                urllib.request.urlopen(f'http://{HOST}:{PORT}{path}', timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def run_level(connections, args):
+    """Spread ``connections`` over --client-processes child processes and merge their results."""
+    per_process = [connections // args.client_processes + (1 if n < connections % args.client_processes else 0)
+                   for n in range(args.client_processes)]
+    children = []
+    first = 0
+    for count in per_process:
+        if count:
+            command = [sys.executable, __file__, '--client', str(first), str(count), '--duration', str(args.duration),
+                       '--think-ms', str(args.think_ms), '--timeout', str(args.timeout)]
+            children.append(subprocess.Popen(command, stdout=subprocess.PIPE, text=True))
+            first += count
+    latencies = []
+    errors = 0
+    for child in children:
+        output, _ = child.communicate()
+        result = json.loads(output)
+        latencies += result['latencies']
+        errors += result['errors']
+    latencies.sort()
+    total = len(latencies) + errors
+    return {
+        'connections': connections,
+        'requests': len(latencies),
+        'requests_per_second': len(latencies) / args.duration,
+        'p50_ms': statistics.median(latencies) * 1000 if latencies else None,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000 if latencies else None,
+        'errors': errors,
+        'error_rate': errors / total if total else 1.0,
+    }
+
+
+def run_mode(mode, args, env):
+    process = subprocess.Popen(server_command(mode, args.workers), cwd=ROOT, env=env)
+    try:
+        wait_until_ready(process)
+        levels = []
+        for connections in args.concurrency:
+            print(f'{mode}: {connections} connections...', file=sys.stderr)
+            levels.append(run_level(connections, args))
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return levels
+
+
+def capacity(levels, slo_ms):
+    served = [level['connections'] for level in levels
+              if level['error_rate'] < 0.01 and level['p99_ms'] is not None and level['p99_ms'] <= slo_ms]
+    return max(served, default=0)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', default='10,100,250,500,750,1000')
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Server worker processes for both modes.')
+    parser.add_argument('--think-ms', type=float, default=100, help='Pause between a connection\'s requests.')
+    parser.add_argument('--timeout', type=float, default=10, help='Seconds before a request counts as an error.')
+    parser.add_argument('--slo-ms', type=float, default=1000, help='p99 a level must stay under to count as served.')
+    parser.add_argument('--client-processes', type=int, default=1)
+    parser.add_argument('--modes', default='sync,asgi')
+    parser.add_argument('--output', help='Write results to this JSON file.')
+    parser.add_argument('--client', nargs=2, type=int, metavar=('FIRST', 'CONNECTIONS'), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv[1:])
+
+    if args.client:
+        result = asyncio.run(run_client(*args.client, args.duration, args.think_ms / 1000, args.timeout))
+        print(json.dumps(result))
+        return 0
+
+    args.concurrency = [int(value) for value in args.concurrency.split(',')]
+    modes = [mode for mode in args.modes.split(',') if mode]
+    for mode, module in (('sync', 'gunicorn'), ('asgi', 'uvicorn')):
+        if mode in modes and importlib.util.find_spec(module) is None:
+            parser.error(f'the {mode} mode needs {module}: pip install {module}')
+
+    workdir = tempfile.mkdtemp(prefix='smartpest-asgi-load-')
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'load.db')}",
+        SCHEMA_BOOTSTRAP='command',
+        INGEST_JOURNAL_FOLDER=os.path.join(workdir, 'journal'),
+        CHATBOT_SNAPSHOT_PATH=os.path.join(workdir, 'chatbot.snapshot'),
+        SLOW_REQUEST_MS='1000000',
+    )
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'bootstrap'], cwd=ROOT, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+
+    results = {
+        'meta': {'workers': args.workers, 'duration': args.duration, 'think_ms': args.think_ms,
+                 'slo_ms': args.slo_ms, 'cpus': os.cpu_count()},
+        'modes': {mode: run_mode(mode, args, env) for mode in modes},
+    }
+
+    print(f"\n{args.workers} worker process(es) per server, {args.think_ms:.0f}ms think time, {args.duration:.0f}s per level")
+    print(f'{"mode":>5}  {"conns":>6}  {"req/s":>8}  {"p50":>9}  {"p99":>9}  {"errors":>7}')
+    for mode, levels in results['modes'].items():
+        for level in levels:
+            p50 = f"{level['p50_ms']:>7.1f}ms" if level['p50_ms'] is not None else f'{"-":>9}'
+            p99 = f"{level['p99_ms']:>7.1f}ms" if level['p99_ms'] is not None else f'{"-":>9}'
+            print(f"{mode:>5}  {level['connections']:>6}  {level['requests_per_second']:>8.0f}  {p50}  {p99}  "
+                  f"{level['error_rate'] * 100:>6.1f}%")
+    for mode, levels in results['modes'].items():
+        results['modes'][mode] = {'levels': levels, 'capacity': capacity(levels, args.slo_ms)}
+        print(f"{mode} capacity: {results['modes'][mode]['capacity']} concurrent connections "
+              f'(p99 <= {args.slo_ms:.0f}ms, < 1% errors)')
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2)
+            handle.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,72 @@
+"""Measure what chatbot conversation analytics cost the request and the database.
+
+  record    time ChatbotAnalytics.record() adds to a chatbot request, in
+            microseconds per call (the background writer is not started)
+  flush     multi-row INSERT throughput of queued events into a throwaway
+            SQLite database, in events per second
+  rollup    time to rebuild one day's rollup from --events events
+
+Usage: python benchmarks/chatbot_analytics.py [--events 100000] [--repeats 200000]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+MESSAGES = ('How do I get rid of rats?', 'termites in my door frames', 'do you sell garden gnomes', 'hello')
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--events', type=int, default=100000)
+    parser.add_argument('--repeats', type=int, default=200000)
+    args = parser.parse_args(argv[1:])
+
+    workdir = tempfile.mkdtemp(prefix='smartpest-analytics-')
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        SCHEMA_BOOTSTRAP='command',
+        CHATBOT_ANALYTICS_BUFFER=str(max(args.events, args.repeats)),
+        METRICS_ENABLED='0',
+    )
+    from app import CONTACT_INFO, app, bootstrap_database, chatbot_cache
+    from chatbot_analytics import ChatbotAnalytics
+
+    with app.app_context():
+        bootstrap_database()
+    answers = [chatbot_cache().reply(message, CONTACT_INFO, 'hybrid') for message in MESSAGES]
+
+    analytics = ChatbotAnalytics(app)
+    analytics._started = True  # keep the writer thread out of the measurement
+    samples = []
+    for _ in range(args.repeats // 1000):
+        started = time.perf_counter()
+        for n in range(1000):
+            analytics.record(MESSAGES[n % 4], answers[n % 4], 'hybrid', 0.0003)
+        samples.append((time.perf_counter() - started) / 1000)
+    samples.sort()
+    # A rare slow batch is a garbage collection pass over the queued tuples, not record() itself.
+    print(f'record: {statistics.median(samples) * 1e6:.2f}us median, '
+          f'{samples[int(len(samples) * 0.99)] * 1e6:.2f}us p99 over batches of 1000 calls')
+
+    analytics._events.clear()
+    for n in range(args.events):
+        analytics.record(MESSAGES[n % 4], answers[n % 4], 'hybrid', 0.0003)
+    started = time.perf_counter()
+    written = analytics.flush()
+    elapsed = time.perf_counter() - started
+    print(f'flush: {written} events in {elapsed:.2f}s ({written / elapsed:,.0f} events/s)')
+
+    started = time.perf_counter()
+    analytics.rollup(days=1)
+    print(f'rollup: {args.events} events in {time.perf_counter() - started:.2f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
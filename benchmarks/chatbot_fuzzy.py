@@ -0,0 +1,111 @@
+"""Measure typo-tolerant chatbot matching on the misspelling corpus.
+
+Routes every message of data/chatbot_misspellings.jsonl with fuzzy matching
+off and on and reports, for each:
+
+  precision   answered messages that got the expected route
+  recall      messages with an expected pest or intent that got it
+
+Negative cases (expected "fallback") include near-miss real words such as
+"clearing" or "clinical". Then it times the trigram index lookup for every
+message against a brute-force edit-distance scan over all terms, in
+microseconds.
+
+Usage: python benchmarks/chatbot_fuzzy.py [corpus.jsonl] [--mode hybrid] [--repeats 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.insert(0, ROOT)
+
+import chatbot_data  # noqa: E402
+from chatbot_retrieval import STOP_WORDS, edit_distance  # noqa: E402
+
+
+DEFAULT_CORPUS = os.path.join(ROOT, 'data', 'chatbot_misspellings.jsonl')
+CONTACT_STUB = {'phone_display': '', 'whatsapp_display': ''}
+
+
+def load(path):
+    with open(path, encoding='utf-8') as corpus:
+        return [json.loads(line) for line in corpus if line.strip()]
+
+
+def score(cases, mode, fuzzy):
+    chatbot_data.FUZZY_MATCHING = fuzzy
+    answered = correct_answers = positives = found = 0
+    misses = []
+    for case in cases:
+        route = chatbot_data.classify_message(case['message'], CONTACT_STUB, mode)
+        if route != 'fallback':
+            answered += 1
+            correct_answers += route == case['expected']
+        if case['expected'] != 'fallback':
+            positives += 1
+            found += route == case['expected']
+        if route != case['expected']:
+            misses.append((case['message'], case['expected'], route))
+    return {
+        'precision': correct_answers / answered if answered else 0.0,
+        'recall': found / positives if positives else 0.0,
+        'misses': misses,
+    }
+
+
+def brute_force(words):
+    index = chatbot_data.current_snapshot().fuzzy_index
+    best = None
+    for word in words:
+        limit = index.max_distance(word)
+        if not limit or word in STOP_WORDS:
+            continue
+        for term, key in index.terms:
+            distance = edit_distance(word, term, limit)
+            if distance <= limit and (best is None or distance < best[1]):
+                best = (key, distance)
+    return best
+
+
+def timed(function, argument, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        function(argument)
+    return (time.perf_counter() - started) / repeats * 1e6
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('corpus', nargs='?', default=DEFAULT_CORPUS)
+    parser.add_argument('--mode', choices=chatbot_data.CHATBOT_MODES, default='hybrid')
+    parser.add_argument('--repeats', type=int, default=200)
+    args = parser.parse_args(argv[1:])
+
+    cases = load(args.corpus)
+    print(f"{len(cases)} messages, {sum(c['expected'] != 'fallback' for c in cases)} with an expected answer, "
+          f'mode {args.mode}, {len(chatbot_data.current_snapshot().fuzzy_index.terms)} indexed terms')
+    for fuzzy in (False, True):
+        result = score(cases, args.mode, fuzzy)
+        print(f"fuzzy {'on ' if fuzzy else 'off'}  precision {result['precision']:.1%}  recall {result['recall']:.1%}")
+    for message, expected, route in result['misses']:
+        print(f'  miss {message!r}: expected {expected}, got {route}')
+
+    indexed, scanned = [], []
+    for case in cases:
+        words = chatbot_data._WORD_RE.findall(chatbot_data._normalize(case['message']))
+        words += [first + second for first, second in zip(words, words[1:])]
+        indexed.append(timed(chatbot_data.current_snapshot().fuzzy_index.search, words, args.repeats))
+        scanned.append(timed(brute_force, words, max(1, args.repeats // 10)))
+    for label, samples in (('trigram index', indexed), ('full scan', scanned)):
+        samples.sort()
+        p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+        print(f'{label:>14}: p50 {statistics.median(samples):7.1f}us  p99 {p99:7.1f}us per message')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
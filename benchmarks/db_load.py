@@ -0,0 +1,130 @@
+"""Load-test the database engine profiles with concurrent writers.
+
+For each profile a fresh interpreter starts N writer threads
+and has each post quote requests and newsletter signups through the Flask
+test client, the way concurrent visitors would. Reported per profile:
+accepted writes per second, failed requests (e.g. "database is locked"),
+and p50/p99 request latency.
+
+SQLite runs against a throwaway file and compares 'default' with 'sqlite'.
+Pass --database-url to test a Postgres server instead; that compares
+'default' with 'serverless-postgres' (add --external-pooler when the URL
+points at PgBouncer or a similar pooler). The Postgres tables are shared
+between runs, so use a scratch database.
+
+Submissions are inserted during the request (INGEST_MODE=sync) so the
+engine is what gets measured; --ingest-mode buffered times the
+write-behind journal instead.
+
+Usage: python benchmarks/db_load.py [--writers 16] [--requests 50] [--database-url URL] [--ingest-mode sync]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+
+def run_writers(writers, requests_per_writer):
+    """Child side: hammer the write endpoints from ``writers`` threads."""
+    sys.path.insert(0, ROOT)
+    from app import app, bootstrap_database
+
+    with app.app_context():
+        bootstrap_database()
+
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+    run_id = uuid.uuid4().hex[:8]
+
+    def writer(number):
+        client = app.test_client()
+        for n in range(requests_per_writer):
+            if n % 2:
+                path, form = '/subscribe', {'email': f'load-{run_id}-{number}-{n}@example.com'}
+            else:
+                path, form = '/request-quote', {
+                    'full_name': f'Load Test {number}',
+                    'phone': f'+266 5000{number:04d}',
+                    'location': 'Maseru',
+                    'property_type': 'Residential',
+                    'service_type': 'Pest Control',
+                    'message': f'Writer {number} request {n}',
+                }
+            started = time.perf_counter()
+            response = client.post(path, data=form)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code >= 400:
+                    failures.append(response.status_code)
+
+    threads = [threading.Thread(target=writer, args=(number,)) for number in range(writers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'failed': len(failures),
+        'writes_per_second': (len(latencies) - len(failures)) / wall,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+    }
+
+
+def run_profile(profile, args, database_url):
+    env = dict(os.environ, DB_ENGINE_PROFILE=profile, DATABASE_URL=database_url, SCHEMA_BOOTSTRAP='command',
+               INGEST_MODE=args.ingest_mode)
+    if args.external_pooler:
+        env['DB_EXTERNAL_POOLER'] = '1'
+    output = subprocess.run(
+        [sys.executable, __file__, '--child', '--writers', str(args.writers), '--requests', str(args.requests)],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=50, help='Requests per writer.')
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--external-pooler', action='store_true')
+    parser.add_argument('--ingest-mode', choices=('sync', 'buffered'), default='sync')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv[1:])
+
+    if args.child:
+        print(json.dumps(run_writers(args.writers, args.requests)))
+        return 0
+
+    workdir = tempfile.mkdtemp(prefix='smartpest-dbload-')
+    if args.database_url:
+        runs = [(profile, args.database_url) for profile in ('default', 'serverless-postgres')]
+    else:
+        runs = [(profile, f"sqlite:///{os.path.join(workdir, f'{profile}.db')}") for profile in ('default', 'sqlite')]
+
+    print(f'{args.writers} writers x {args.requests} requests, {args.ingest_mode} ingestion')
+    print(f'{"profile":>20}  {"writes/s":>9}  {"failed":>6}  {"p50":>8}  {"p99":>8}')
+    for profile, database_url in runs:
+        result = run_profile(profile, args, database_url)
+        print(f"{profile:>20}  {result['writes_per_second']:>9.0f}  {result['failed']:>6}  "
+              f"{result['p50_ms']:>6.1f}ms  {result['p99_ms']:>6.1f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,88 @@
+"""Show that the streaming leads PDF export runs in flat memory.
+
+Seeds a throwaway SQLite database with N quote requests (and N/10 subscribers)
+for each requested size, streams the report through ``leads_pdf_chunks`` and
+reports traced peak Python memory next to the PDF size. Timings include
+tracemalloc overhead and are only comparable between runs of this script.
+
+Usage: python benchmarks/export_pdf_memory.py [sizes]   (default 1000,10000,100000,500000)
+"""
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+DB_PATH = os.path.join(tempfile.mkdtemp(prefix='smartpest-bench-'), 'bench.db')
+os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import app, bootstrap_database  # noqa: E402
+from models.db_setup import NewsletterSubscriber, QuoteRequest, db  # noqa: E402
+from models.queries import dashboard_counts, stream_quotes, stream_subscribers  # noqa: E402
+from reports import leads_pdf_chunks  # noqa: E402
+
+
+SEED_BATCH = 5000
+
+
+def seed_to(quotes, subscribers):
+    """Top the tables up to the requested row counts."""
+    start = datetime(2024, 1, 1)
+    counts = dashboard_counts()
+    for offset in range(counts['quotes'], quotes, SEED_BATCH):
+        rows = [
+            {
+                'full_name': f'Customer {n}',
+                'phone': f'+266 5{n % 10000000:07d}',
+                'email': f'customer{n}@example.com' if n % 3 == 0 else None,
+                'location': ('Maseru', 'Leribe', 'Mafeteng', 'Berea')[n % 4],
+                'property_type': 'Residential',
+                'service_type': 'Pest Control',
+                'message': 'Rats in the ceiling and droppings in the kitchen.' if n % 5 == 0 else None,
+                'created_at': start + timedelta(minutes=n),
+            }
+            for n in range(offset, min(offset + SEED_BATCH, quotes))
+        ]
+        db.session.execute(insert(QuoteRequest), rows)
+        db.session.commit()
+    for offset in range(counts['subscribers'], subscribers, SEED_BATCH):
+        rows = [
+            {'email': f'subscriber{n}@example.com', 'created_at': start + timedelta(minutes=n)}
+            for n in range(offset, min(offset + SEED_BATCH, subscribers))
+        ]
+        db.session.execute(insert(NewsletterSubscriber), rows)
+        db.session.commit()
+
+
+def measure():
+    counts = dashboard_counts()
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = 0
+    for chunk in leads_pdf_chunks(stream_quotes(), stream_subscribers(), counts['quotes'], counts['subscribers']):
+        size += len(chunk)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    db.session.remove()
+    return size, peak, elapsed
+
+
+def main(argv):
+    sizes = [int(value) for value in argv[1].split(',')] if len(argv) > 1 else [1000, 10000, 100000, 500000]
+    print(f'{"leads":>8}  {"pdf size":>10}  {"peak memory":>11}  {"time":>7}')
+    with app.app_context():
+        bootstrap_database()
+        for leads in sorted(sizes):
+            seed_to(leads, leads // 10)
+            size, peak, elapsed = measure()
+            print(f'{leads:>8}  {size / 1e6:>8.1f}MB  {peak / 1e6:>9.2f}MB  {elapsed:>6.1f}s')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
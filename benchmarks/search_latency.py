@@ -0,0 +1,97 @@
+"""Time full-text lead and catalogue search on a seeded database.
+
+Seeds a throwaway SQLite database (or DATABASE_URL if set) with N quote
+requests whose names, phones, locations and messages vary, builds the
+search indexes via bootstrap, then times the first page of the admin lead
+search (``quote_page`` with ``q``) and the public catalogue search for a mix
+of rare, common, prefix and multi-term queries.
+
+Usage: python benchmarks/search_latency.py [rows] [repeats]   (default 100000, 20)
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if 'DATABASE_URL' not in os.environ:
+    DB_PATH = os.path.join(tempfile.mkdtemp(prefix='smartpest-bench-'), 'bench.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{DB_PATH}'
+os.environ.setdefault('SCHEMA_BOOTSTRAP', 'command')
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import app, bootstrap_database  # noqa: E402
+from models.db_setup import Product, QuoteRequest, Service, db  # noqa: E402
+from models.queries import dashboard_counts, quote_page  # noqa: E402
+from models.search import search_catalogue  # noqa: E402
+
+
+SEED_BATCH = 5000
+FIRST_NAMES = ('Thabo', 'Lineo', 'Palesa', 'Teboho', 'Mpho', 'Lerato', 'Tumelo', 'Nthabiseng', 'Retselisitse', 'Karabo')
+SURNAMES = ('Mokoena', 'Mohapi', 'Letsie', 'Molapo', 'Ramakatsa', 'Sekhesa', 'Nkhahle', 'Phafane', 'Tau', 'Moshoeshoe')
+LOCATIONS = ('Maseru', 'Leribe', 'Mafeteng', 'Berea', 'Butha-Buthe', 'Mohale\'s Hoek', 'Quthing', 'Qacha\'s Nek')
+MESSAGES = (
+    'Rats in the ceiling and droppings in the kitchen.',
+    'Termites damaging the door frames.',
+    'Cockroaches in the restaurant storeroom.',
+    'Need weed control around the school fence.',
+    'Bed bugs in two guest rooms.',
+    None,
+)
+QUERIES = ('Mokoena', 'maseru', 'termites', 'cockroach restaurant', 'Thabo Letsie', 'mas', '5123', 'zzzz')
+
+
+def seed(rows):
+    start = datetime(2023, 1, 1)
+    for offset in range(dashboard_counts()['quotes'], rows, SEED_BATCH):
+        batch = [
+            {
+                'full_name': f'{FIRST_NAMES[n % 10]} {SURNAMES[(n // 10) % 10]}',
+                'phone': f'+266 5{n % 1000:03d} {n % 10000:04d}',
+                'location': LOCATIONS[n % len(LOCATIONS)],
+                'property_type': 'Residential',
+                'service_type': 'Pest Control',
+                'message': MESSAGES[n % len(MESSAGES)],
+                'created_at': start + timedelta(minutes=n),
+            }
+            for n in range(offset, min(offset + SEED_BATCH, rows))
+        ]
+        db.session.execute(insert(QuoteRequest), batch)
+        db.session.commit()
+    if not db.session.execute(db.select(Product.id).limit(1)).first():
+        db.session.add_all([Product(name=f'Rodent bait station {n}', description='Tamper-resistant rat bait box.') for n in range(50)])
+        db.session.add_all([Service(name='Termite treatment', description='Soil barrier and baiting for termites.')])
+        db.session.commit()
+
+
+def timed(function, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+        db.session.remove()
+    samples.sort()
+    return statistics.median(samples), samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def main(argv):
+    rows = int(argv[1]) if len(argv) > 1 else 100000
+    repeats = int(argv[2]) if len(argv) > 2 else 20
+    with app.app_context():
+        bootstrap_database()
+        seed(rows)
+        print(f'{dashboard_counts()["quotes"]} quote requests, {repeats} runs per query')
+        print(f'{"query":>22}  {"leads p50":>9}  {"leads p99":>9}  {"catalogue p50":>13}')
+        for query in QUERIES:
+            lead_p50, lead_p99 = timed(lambda: quote_page({'q': query}, None, 50), repeats)
+            catalogue_p50, _ = timed(lambda: search_catalogue(Product, query), repeats)
+            print(f'{query:>22}  {lead_p50:>7.1f}ms  {lead_p99:>7.1f}ms  {catalogue_p50:>11.1f}ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,90 @@
+"""Measure cold start: import of app.py and time to the first response.
+
+Every sample runs in a fresh interpreter, like a new serverless instance.
+Two scenarios are timed:
+
+  fresh      throwaway SQLite file; SCHEMA_BOOTSTRAP=first-request creates the
+             schema and admin user inside the first request (the Vercel default)
+  prepared   database already set up by 'flask bootstrap'; SCHEMA_BOOTSTRAP=command
+
+Times are medians over the samples. Exits with status 1 when a median
+import-to-first-response time exceeds --budget-ms, so CI can catch regressions.
+
+Usage: python benchmarks/startup.py [--samples 7] [--path /] [--budget-ms 1500]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+
+CHILD = '''
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {root!r})
+import app
+imported = time.perf_counter()
+response = app.app.test_client().get({path!r})
+finished = time.perf_counter()
+print(json.dumps({{
+    'status': response.status_code,
+    'import_ms': (imported - started) * 1000,
+    'first_response_ms': (finished - started) * 1000,
+}}))
+'''
+
+
+def run_child(path, env):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD.format(root=ROOT, path=path)],
+        env=env, cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def scenario_env(workdir, name, sample):
+    env = dict(os.environ)
+    if name == 'fresh':
+        env['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, f'fresh-{sample}.db')}"
+        env['SCHEMA_BOOTSTRAP'] = 'first-request'
+    else:
+        env['DATABASE_URL'] = f"sqlite:///{os.path.join(workdir, 'prepared.db')}"
+        env['SCHEMA_BOOTSTRAP'] = 'command'
+    return env
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--samples', type=int, default=7)
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--budget-ms', type=float, default=None)
+    args = parser.parse_args(argv[1:])
+
+    workdir = tempfile.mkdtemp(prefix='smartpest-startup-')
+    prepared = scenario_env(workdir, 'prepared', 0)
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'app', 'bootstrap'], env=prepared, cwd=ROOT,
+                   capture_output=True, check=True)
+
+    print(f'{"scenario":>10}  {"import":>9}  {"first response":>14}  {"status":>6}')
+    over_budget = False
+    for name in ('fresh', 'prepared'):
+        samples = [run_child(args.path, scenario_env(workdir, name, n)) for n in range(args.samples)]
+        imported = statistics.median(sample['import_ms'] for sample in samples)
+        responded = statistics.median(sample['first_response_ms'] for sample in samples)
+        statuses = ','.join(sorted({str(sample['status']) for sample in samples}))
+        print(f'{name:>10}  {imported:>7.0f}ms  {responded:>12.0f}ms  {statuses:>6}')
+        if args.budget_ms is not None and responded > args.budget_ms:
+            over_budget = True
+
+    if over_budget:
+        print(f'First response exceeded the {args.budget_ms:.0f}ms budget.')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,304 @@
+"""Benchmark the hot endpoints at several data scales and compare with a baseline.
+
+For each scale a fresh interpreter seeds a throwaway SQLite database with
+N quote requests and N subscribers, plus N * --catalogue-ratio products and
+services (at least 10 each). The catalogue is deliberately smaller than the
+lead tables: it is edited by hand and grows with neither, and /products and
+/services render every row unpaginated, so a full-scale catalogue would
+benchmark a site nobody runs; pass --catalogue-ratio 1 to seed it at N anyway.
+It then drives every endpoint below through the Flask test client, serially,
+as a visitor or a logged-in admin would. Per endpoint:
+
+  p50/p99     latency over --repeats timed requests, after warm-up requests
+  req/s       serial throughput of the timed requests
+  peak_kb     traced peak Python memory of one extra request (tracemalloc
+              slows requests down, so it is kept out of the timed runs)
+
+plus the child's peak RSS per scale. Anonymous catalogue pages are served
+from the page cache after the warm-up, as they are in production; their
+*_uncached variants empty the page cache (untimed) before every request, so
+they measure the render and its queries, as after a catalogue edit.
+Submissions are inserted during the request (INGEST_MODE=sync) unless
+--ingest-mode buffered is given.
+
+--output writes the results as JSON. --baseline compares them with an earlier
+JSON file and exits with status 1 when a p50 or p99 is more than --tolerance
+slower (and by at least --min-delta-ms), so a CI job or a before/after run
+can flag regressions.
+
+Usage: python benchmarks/suite.py [--scales 1000,10000,100000] [--repeats 30]
+                                  [--only index,products] [--catalogue-ratio 0.01] [--output results.json]
+                                  [--baseline baseline.json] [--tolerance 0.2]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+SEED_BATCH = 5000
+
+# name -> (method, path, admin, body); body is a callable of the request number for unique submissions.
+ENDPOINTS = {
+    'index': ('GET', '/', False, None),
+    'products': ('GET', '/products', False, None),
+    'services': ('GET', '/services', False, None),
+    'index_uncached': ('GET', '/', False, None),
+    'products_uncached': ('GET', '/products', False, None),
+    'services_uncached': ('GET', '/services', False, None),
+    'chatbot_message': ('POST', '/api/chatbot/message', False,
+                        lambda n: {'json': {'message': ('How do I get rid of rats?', 'termites in my door frames',
+                                                         'how much does fumigation cost', f'question {n}')[n % 4]}}),
+    'request_quote': ('POST', '/request-quote', False, lambda n: {'data': {
+        'full_name': f'Bench Customer {n}', 'phone': f'+266 5{n:07d}', 'location': 'Maseru',
+        'property_type': 'Residential', 'service_type': 'Pest Control', 'message': 'Rats in the roof.',
+    }}),
+    'subscribe': ('POST', '/subscribe', False, lambda n: {'data': {'email': f'bench-{time.time_ns()}-{n}@example.com'}}),
+    'admin_dashboard': ('GET', '/admin/dashboard', True, None),
+    'admin_leads': ('GET', '/admin/leads', True, None),
+    'export_leads_pdf': ('GET', '/admin/leads/export/pdf', True, None),
+}
+# Whole-table exports are timed fewer times so the 100k scale finishes in minutes.
+SLOW_ENDPOINTS = {'export_leads_pdf'}
+UNCACHED_ENDPOINTS = {'index_uncached', 'products_uncached', 'services_uncached'}
+
+
+def seed(scale, catalogue_ratio):
+    from sqlalchemy import insert
+
+    from models.db_setup import NewsletterSubscriber, Product, QuoteRequest, Service, db
+
+    start = datetime(2024, 1, 1)
+    for offset in range(0, scale, SEED_BATCH):
+        numbers = range(offset, min(offset + SEED_BATCH, scale))
+        db.session.execute(insert(QuoteRequest), [
+            {
+                'full_name': f'Customer {n}',
+                'phone': f'+266 6{n:07d}',
+                'email': f'customer{n}@example.com' if n % 3 == 0 else None,
+                'location': ('Maseru', 'Leribe', 'Mafeteng', 'Berea')[n % 4],
+                'property_type': 'Residential',
+                'service_type': 'Pest Control',
+                'message': 'Rats in the ceiling and droppings in the kitchen.' if n % 5 == 0 else None,
+                'created_at': start + timedelta(minutes=n),
+            }
+            for n in numbers
+        ])
+        db.session.execute(insert(NewsletterSubscriber), [
+            {'email': f'subscriber{n}@example.com', 'created_at': start + timedelta(minutes=n)} for n in numbers
+        ])
+        db.session.commit()
+
+    catalogue = max(10, int(scale * catalogue_ratio))
+    db.session.execute(insert(Product), [
+        {'name': f'Rodent bait station {n}', 'description': 'Tamper-resistant rat bait box.',
+         'price': 150 + n % 50, 'created_at': start + timedelta(hours=n)}
+        for n in range(catalogue)
+    ])
+    db.session.execute(insert(Service), [
+        {'name': f'Termite treatment {n}', 'description': 'Soil barrier and baiting for termites.',
+         'created_at': start + timedelta(hours=n)}
+        for n in range(catalogue)
+    ])
+    db.session.commit()
+    return {'quotes': scale, 'subscribers': scale, 'products': catalogue, 'services': catalogue}
+
+
+def request_once(client, method, path, body, n, prepare=None):
+    if prepare is not None:
+        prepare()
+    response = client.open(path, method=method, buffered=True, **(body(n) if body else {}))
+    response.close()  # runs call_on_close handlers, as a WSGI server would
+    if response.status_code >= 400:
+        raise RuntimeError(f'{method} {path} returned {response.status_code}')
+
+
+def run_scale(scale, names, repeats, warmup, catalogue_ratio):
+    """Child side: seed, then time each endpoint. Returns the scale's result dict."""
+    sys.path.insert(0, ROOT)
+    from app import app, bootstrap_database, page_cache
+    from models.db_setup import db
+
+    with app.app_context():
+        bootstrap_database()
+        rows = seed(scale, catalogue_ratio)
+        db.session.remove()
+
+    visitor = app.test_client()
+    admin = app.test_client()
+    admin.post('/admin/login', data={'username': os.environ['ADMIN_USERNAME'], 'password': os.environ['ADMIN_PASSWORD']}).close()
+
+    endpoints = {}
+    sequence = 0
+    for name in names:
+        method, path, needs_admin, body = ENDPOINTS[name]
+        client = admin if needs_admin else visitor
+        runs = max(3, repeats // 10) if name in SLOW_ENDPOINTS else repeats
+        prepare = page_cache.clear if name in UNCACHED_ENDPOINTS else None
+        for _ in range(warmup):
+            sequence += 1
+            request_once(client, method, path, body, sequence, prepare)
+
+        samples = []
+        for _ in range(runs):
+            sequence += 1
+            if prepare is not None:
+                prepare()
+            started = time.perf_counter()
+            request_once(client, method, path, body, sequence)
+            samples.append(time.perf_counter() - started)
+
+        sequence += 1
+        if prepare is not None:
+            prepare()
+        tracemalloc.start()
+        request_once(client, method, path, body, sequence)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        samples.sort()
+        endpoints[name] = {
+            'requests': runs,
+            'p50_ms': statistics.median(samples) * 1000,
+            'p99_ms': samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+            'requests_per_second': runs / sum(samples),
+            'peak_kb': peak / 1024,
+        }
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'rows': rows,
+        'max_rss_mb': max_rss / (1024 * 1024 if sys.platform == 'darwin' else 1024),
+        'endpoints': endpoints,
+    }
+
+
+def run_child(scale, args):
+    workdir = tempfile.mkdtemp(prefix='smartpest-suite-')
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        SCHEMA_BOOTSTRAP='command',
+        INGEST_MODE=args.ingest_mode,
+        INGEST_JOURNAL_FOLDER=os.path.join(workdir, 'journal'),
+        ADMIN_USERNAME='bench',
+        ADMIN_PASSWORD='bench-password',
+        SLOW_REQUEST_MS='1000000',
+    )
+    env.pop('ADMIN_PASSWORD_HASH', None)
+    command = [sys.executable, __file__, '--child', '--scales', str(scale), '--repeats', str(args.repeats),
+               '--warmup', str(args.warmup), '--only', ','.join(args.only), '--catalogue-ratio', str(args.catalogue_ratio)]
+    output = subprocess.run(command, env=env, cwd=ROOT, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Yield (scale, endpoint, metric, old, new) for every latency that regressed."""
+    for scale, current in results['scales'].items():
+        previous = baseline.get('scales', {}).get(scale)
+        if not previous:
+            continue
+        for name, now in current['endpoints'].items():
+            before = previous['endpoints'].get(name)
+            if not before:
+                continue
+            for metric in ('p50_ms', 'p99_ms'):
+                old, new = before[metric], now[metric]
+                if new > old * (1 + tolerance) and new - old >= min_delta_ms:
+                    yield scale, name, metric, old, new
+
+
+def print_table(results, baseline):
+    for scale, result in results['scales'].items():
+        previous = baseline.get('scales', {}).get(scale, {}).get('endpoints', {}) if baseline else {}
+        rows = result['rows']
+        print(f"\n{scale} quotes/subscribers, {rows['products']} products/services, peak RSS {result['max_rss_mb']:.0f}MB")
+        print(f'{"endpoint":>18}  {"p50":>9}  {"p99":>9}  {"req/s":>8}  {"peak":>9}' + ('  p50 vs baseline' if baseline else ''))
+        for name, stats in result['endpoints'].items():
+            line = (f"{name:>18}  {stats['p50_ms']:>7.1f}ms  {stats['p99_ms']:>7.1f}ms  "
+                    f"{stats['requests_per_second']:>8.0f}  {stats['peak_kb']:>7.0f}KB")
+            if name in previous:
+                line += f"  {(stats['p50_ms'] / previous[name]['p50_ms'] - 1) * 100:>+14.0f}%"
+            print(line)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='1000,10000,100000')
+    parser.add_argument('--repeats', type=int, default=30)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', default=','.join(ENDPOINTS), help='Comma-separated endpoint names.')
+    parser.add_argument('--ingest-mode', choices=('sync', 'buffered'), default='sync')
+    parser.add_argument('--catalogue-ratio', type=float, default=0.01,
+                        help='Products and services seeded per quote request (1 = full scale).')
+    parser.add_argument('--output', help='Write results to this JSON file.')
+    parser.add_argument('--baseline', help='Compare with results saved by an earlier --output run.')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown before flagging (0.2 = 20%%).')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help='Ignore slowdowns smaller than this.')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv[1:])
+    args.only = [name for name in args.only.split(',') if name]
+    unknown = set(args.only) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoint(s): {', '.join(sorted(unknown))}")
+    scales = [int(value) for value in args.scales.split(',')]
+
+    if args.child:
+        print(json.dumps(run_scale(scales[0], args.only, args.repeats, args.warmup, args.catalogue_ratio)))
+        return 0
+
+    results = {
+        'meta': {
+            'revision': git_revision(),
+            'recorded_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeats': args.repeats,
+            'ingest_mode': args.ingest_mode,
+            'catalogue_ratio': args.catalogue_ratio,
+        },
+        'scales': {},
+    }
+    for scale in scales:
+        print(f'Running scale {scale}...', file=sys.stderr)
+        results['scales'][str(scale)] = run_child(scale, args)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as handle:
+            baseline = json.load(handle)
+    print_table(results, baseline)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as handle:
+            json.dump(results, handle, indent=2)
+            handle.write('\n')
+
+    if baseline:
+        regressions = list(compare(results, baseline, args.tolerance, args.min_delta_ms))
+        print(f"\nCompared with {args.baseline} ({baseline['meta'].get('revision') or 'unknown revision'}): "
+              f'{len(regressions)} regression(s)')
+        for scale, name, metric, old, new in regressions:
+            print(f'  {scale:>8} {name:>18} {metric}: {old:.1f}ms -> {new:.1f}ms')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,247 @@
+import atexit
+import json
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from chatbot_retrieval import STOP_WORDS
+from metrics import Histogram
+from models.db_setup import ChatbotEvent, ChatbotRollup, db
+
+
+# Reply latency as seen by the view, cache hits included; rollups of different days merge bucket by bucket.
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+TOP_NGRAMS = 50
+MAX_MESSAGE_LENGTH = ChatbotEvent.__table__.columns['message'].type.length
+# Keeps each statement well under SQLite's bound-parameter limit.
+MAX_ROWS_PER_STATEMENT = 1000
+# Route labels of knowledge-base rules (see chatbot_data.KnowledgeSnapshot).
+MATCHED_ROUTE_PREFIXES = ('pest:', 'intent:')
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _ngrams(message):
+    words = [word for word in _WORD_RE.findall(message) if word not in STOP_WORDS]
+    return words + [f'{first} {second}' for first, second in zip(words, words[1:])]
+
+
+def rollup_day(day):
+    """Summarize one UTC day of chatbot events into its ChatbotRollup row and return the payload."""
+    start = datetime.combine(day, datetime.min.time())
+    routes = Counter()
+    matchers = Counter()
+    unmatched = Counter()
+    latency = Histogram(LATENCY_BUCKETS)
+    rows = db.session.execute(
+        db.select(ChatbotEvent.route, ChatbotEvent.matched_by, ChatbotEvent.latency_us, ChatbotEvent.message)
+        .where(ChatbotEvent.created_at >= start, ChatbotEvent.created_at < start + timedelta(days=1))
+        .execution_options(yield_per=MAX_ROWS_PER_STATEMENT)
+    )
+    for route, matched_by, latency_us, message in rows:
+        routes[route] += 1
+        if matched_by:
+            matchers[matched_by] += 1
+        latency.observe(latency_us / 1_000_000)
+        if route == 'fallback':
+            unmatched.update(set(_ngrams(message)))
+
+    payload = {
+        'routes': dict(routes),
+        'matchers': dict(matchers),
+        'latency': {'counts': latency.counts, 'sum': latency.sum},
+        'unmatched': unmatched.most_common(TOP_NGRAMS),
+    }
+    db.session.merge(ChatbotRollup(day=day, events=latency.count, payload=json.dumps(payload), computed_at=datetime.utcnow()))
+    db.session.commit()
+    return payload
+
+
+def summary(days, today=None):
+    """Merge the rollups of the last ``days`` days (today included) into one report for the admin page."""
+    today = today or datetime.utcnow().date()
+    rollups = ChatbotRollup.query.filter(ChatbotRollup.day > today - timedelta(days=days)).order_by(ChatbotRollup.day).all()
+    routes = Counter()
+    matchers = Counter()
+    unmatched = Counter()
+    latency = Histogram(LATENCY_BUCKETS)
+    daily = []
+    for rollup in rollups:
+        payload = json.loads(rollup.payload)
+        routes.update(payload['routes'])
+        matchers.update(payload['matchers'])
+        unmatched.update(dict(payload['unmatched']))
+        latency.counts = [total + count for total, count in zip(latency.counts, payload['latency']['counts'])]
+        latency.sum += payload['latency']['sum']
+        latency.count += rollup.events
+        daily.append({
+            'day': rollup.day,
+            'events': rollup.events,
+            'fallbacks': payload['routes'].get('fallback', 0),
+            'computed_at': rollup.computed_at,
+        })
+
+    total = latency.count
+    return {
+        'events': total,
+        'fallbacks': routes.get('fallback', 0),
+        'fallback_rate': routes.get('fallback', 0) / total if total else 0.0,
+        'routes': routes.most_common(),
+        'matchers': matchers.most_common(),
+        # Per-day lists are already truncated, so merged counts are a lower bound for rarer n-grams.
+        'unmatched': unmatched.most_common(TOP_NGRAMS),
+        'latency_us': {
+            label: latency.quantile(q) * 1_000_000 if total else None
+            for label, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+        },
+        'daily': daily,
+    }
+
+
+class ChatbotAnalytics:
+    """Best-effort log of helpdesk chatbot conversations.
+
+    ``record`` only appends a tuple to a bounded in-memory deque, so a chat
+    request pays a few microseconds and never waits on a lock or the
+    database. A background thread drains the deque every
+    CHATBOT_ANALYTICS_FLUSH_INTERVAL seconds into ChatbotEvent with multi-row
+    INSERTs, and every CHATBOT_ANALYTICS_ROLLUP_INTERVAL seconds rebuilds the
+    ChatbotRollup rows for today (and yesterday, once the day turns over) and
+    deletes events older than CHATBOT_ANALYTICS_RETENTION_DAYS. When the
+    database falls behind the deque drops its oldest events instead of
+    growing; drops and failed batches are counted, not retried.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._started = False
+        self._last_rollup = 0.0
+        self._rolled_up_day = None
+        self.dropped = 0
+        self.failed = 0
+        self.written = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config['CHATBOT_ANALYTICS_ENABLED']
+        self.interval = app.config['CHATBOT_ANALYTICS_FLUSH_INTERVAL']
+        self.rollup_interval = app.config['CHATBOT_ANALYTICS_ROLLUP_INTERVAL']
+        self.retention = timedelta(days=app.config['CHATBOT_ANALYTICS_RETENTION_DAYS'])
+        self._events = deque(maxlen=app.config['CHATBOT_ANALYTICS_BUFFER'])
+        self._batch_size = max(1, self._events.maxlen // 2)
+
+    def record(self, message, answer, mode, seconds):
+        """Queue one answered message; called on the request path, so it must stay trivially cheap."""
+        if not self.enabled:
+            return
+        if not self._started:
+            self._start_once()
+        events = self._events
+        if len(events) == events.maxlen:
+            self.dropped += 1
+        # Only rule answers were picked by a scorer; special replies and the fallback carry keyword scores too.
+        matched_by = answer.scores[0][2] if answer.scores and answer.route.startswith(MATCHED_ROUTE_PREFIXES) else None
+        events.append((time.time(), message, answer.route, matched_by, mode, int(seconds * 1_000_000)))
+        if len(events) >= self._batch_size and not self._wake.is_set():
+            self._wake.set()
+
+    def pending(self):
+        return len(self._events)
+
+    def flush(self):
+        """Write every queued event; returns how many were inserted."""
+        with self._flush_lock:
+            batch = []
+            while self._events:
+                try:
+                    batch.append(self._events.popleft())
+                except IndexError:
+                    break
+            if not batch:
+                return 0
+            rows = [
+                {
+                    'created_at': datetime.utcfromtimestamp(at),
+                    'message': ' '.join(message.lower().split())[:MAX_MESSAGE_LENGTH],
+                    'route': route[:120],
+                    'matched_by': matched_by,
+                    'mode': mode,
+                    'latency_us': latency_us,
+                }
+                for at, message, route, matched_by, mode, latency_us in batch
+            ]
+            with self.app.app_context():
+                try:
+                    for start in range(0, len(rows), MAX_ROWS_PER_STATEMENT):
+                        db.session.execute(insert(ChatbotEvent), rows[start:start + MAX_ROWS_PER_STATEMENT])
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                    self.failed += len(rows)
+                    raise
+            self.written += len(rows)
+            return len(rows)
+
+    def rollup(self, days=2):
+        """Flush, then rebuild the rollups of the last ``days`` days and purge expired events."""
+        self.flush()
+        today = datetime.utcnow().date()
+        with self.app.app_context():
+            for offset in range(days):
+                rollup_day(today - timedelta(days=offset))
+            cutoff = datetime.combine(today, datetime.min.time()) - self.retention
+            db.session.execute(db.delete(ChatbotEvent).where(ChatbotEvent.created_at < cutoff))
+            db.session.commit()
+        self._last_rollup = time.monotonic()
+        self._rolled_up_day = today
+
+    def _start_once(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._loop, name='smartpest-chatbot-analytics', daemon=True).start()
+        atexit.register(self._flush_quietly)
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._flush_quietly()
+            if time.monotonic() - self._last_rollup >= self.rollup_interval:
+                self._rollup_quietly()
+
+    def _rollup_quietly(self):
+        # Yesterday is rebuilt once more after midnight so its last events are counted.
+        today = datetime.utcnow().date()
+        days = 2 if self._rolled_up_day != today else 1
+        try:
+            self.rollup(days)
+        except Exception:
+            self._last_rollup = time.monotonic()
+            self.app.logger.exception('Rolling up chatbot analytics failed')
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            self.app.logger.exception('Writing chatbot analytics events failed')
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'pending': self.pending(),
+            'capacity': self._events.maxlen,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+        }
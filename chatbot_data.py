@@ -1,137 +1,33 @@
+import hashlib
+import heapq
+import json
+import logging
+import os
+import pickle
 import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
 
+from chatbot_retrieval import BM25Index, FuzzyIndex
 
-CHATBOT_DEFAULT_SUGGESTIONS = [
-    "How do I book a service?",
-    "How do you treat cockroaches?",
-    "Are treatments safe for children and pets?",
-    "What is included in weed management?",
-    "How much does pest control cost?",
-]
-
-
-PEST_PROFILES = [
-    {
-        "aliases": ["rat", "rats", "rodent", "rodents", "mouse", "mice"],
-        "title": "Rodents (Rats and Mice)",
-        "signs": "Droppings, gnaw marks, scratching sounds in ceilings/walls, food packaging damage, and grease marks near walls.",
-        "risks": "Disease spread, food contamination, wiring damage, and possible fire risk from damaged cables.",
-        "prevention": "Seal entry points, store food in hard containers, fix leaks, remove clutter, and improve waste control.",
-        "treatment": "Inspection, bait stations, controlled trapping strategy, proofing recommendations, and follow-up monitoring.",
-    },
-    {
-        "aliases": ["cockroach", "cockroaches", "roach", "roaches"],
-        "title": "Cockroaches",
-        "signs": "Night activity, pepper-like droppings, egg cases, and musty odor in cupboards or drains.",
-        "risks": "Food contamination and asthma/allergy triggers.",
-        "prevention": "Keep kitchens dry/clean, repair leaks, close drain gaps, and remove food residue.",
-        "treatment": "Targeted baiting, crack-and-crevice treatment, sanitation corrections, and scheduled follow-up.",
-    },
-    {
-        "aliases": ["termite", "termites", "white ant", "white ants"],
-        "title": "Termites",
-        "signs": "Mud tubes, hollow-sounding wood, blistered paint, discarded wings, and damaged wood frames.",
-        "risks": "Serious structural damage if not managed early.",
-        "prevention": "Reduce wood-soil contact, fix dampness, and inspect timber and foundations regularly.",
-        "treatment": "Inspection, targeted treatment barriers, colony control strategy, and periodic re-inspection.",
-    },
-    {
-        "aliases": ["ant", "ants"],
-        "title": "Ants",
-        "signs": "Visible trails, colony activity around moisture zones or wall voids.",
-        "risks": "Recurring food contamination and persistent re-entry from active colonies.",
-        "prevention": "Seal gaps, remove food residue, control moisture, and trim vegetation touching structures.",
-        "treatment": "Species-targeted bait program and entry-point treatment.",
-    },
-    {
-        "aliases": ["bedbug", "bedbugs", "bed bug", "bed bugs"],
-        "title": "Bed Bugs",
-        "signs": "Bites in clusters/lines, blood spots on sheets, and dark spotting near mattress seams.",
-        "risks": "Sleep disruption and repeated spread through luggage or furniture.",
-        "prevention": "Inspect second-hand furniture, reduce clutter, and check luggage after travel.",
-        "treatment": "Detailed room inspection, targeted treatment plan, and staged follow-up visits.",
-    },
-    {
-        "aliases": ["mosquito", "mosquitoes"],
-        "title": "Mosquitoes",
-        "signs": "High activity near standing water and frequent bites at dusk/night.",
-        "risks": "Vector-borne disease risk and high nuisance levels.",
-        "prevention": "Remove stagnant water, maintain drainage, and clear overgrown vegetation.",
-        "treatment": "Larval source control, adult mosquito reduction, and prevention guidance.",
-    },
-    {
-        "aliases": ["fly", "flies"],
-        "title": "Flies",
-        "signs": "Persistent indoor/outdoor fly activity near waste, drains, or food handling zones.",
-        "risks": "Food hygiene risk and contamination.",
-        "prevention": "Strict waste control, drain cleaning, and proofing with screens/door control.",
-        "treatment": "Source reduction, targeted treatment, and control devices where needed.",
-    },
-    {
-        "aliases": ["wasp", "wasps", "bee", "bees"],
-        "title": "Wasps and Stinging Insects",
-        "signs": "Nest activity under roofs, eaves, trees, or cavity spaces.",
-        "risks": "Stings and possible allergic reactions.",
-        "prevention": "Early nest detection and no disturbance around active nests.",
-        "treatment": "Controlled removal by trained technicians using PPE and safe perimeter control.",
-    },
-    {
-        "aliases": ["bird", "birds", "gull", "gulls", "pigeon", "pigeons"],
-        "title": "Bird and Gull Control",
-        "signs": "Nesting/roosting on roofs, droppings accumulation, blocked gutters, and noise issues.",
-        "risks": "Hygiene risk, damage, and business disruption.",
-        "prevention": "Proofing, sanitation, and habitat management.",
-        "treatment": "Humane exclusion methods, bird-proofing systems, and maintenance plans.",
-    },
-]
-
-
-INTENT_RULES = [
-    {
-        "keywords": ["book", "booking", "appointment", "schedule", "visit"],
-        "reply": "Booking is simple. Share your location, pest/problem type, and preferred date. You can use our Request Quote page or WhatsApp for faster coordination.",
-    },
-    {
-        "keywords": ["price", "cost", "quote", "how much", "charges"],
-        "reply": "Pricing depends on pest type, infestation level, property size, and treatment frequency. We usually confirm cost after inspection to keep pricing fair and accurate.",
-    },
-    {
-        "keywords": ["safe", "safety", "child", "children", "pet", "pets", "toxic"],
-        "reply": "Safety is our priority. We use controlled methods, PPE, and clear re-entry guidance. We also provide MSDS where required and avoid risky indoor liquid overuse.",
-    },
-    {
-        "keywords": ["weed", "herbicide", "lawn", "broadleaf", "perennial"],
-        "reply": "Our weed management covers lawns, pavements, open grounds, agricultural, and industrial spaces. We target broadleaf, annual, and perennial weeds with planned application cycles.",
-    },
-    {
-        "keywords": ["disinfection", "cleaning", "sanitize", "sanitization", "covid"],
-        "reply": "We provide post-construction cleaning, high-touch disinfection, and deep sanitization for schools, clinics, offices, and commercial spaces.",
-    },
-    {
-        "keywords": ["chemical", "rodenticide", "insecticide", "toilet", "odor"],
-        "reply": "We supply ready-to-use chemical solutions, including rodenticides, herbicides, insecticides, pit toilet chemicals, and odor-control solutions.",
-    },
-    {
-        "keywords": ["season", "summer", "fall", "winter", "spring"],
-        "reply": "We run seasonal programs: Summer (insect/rodent control), Fall (preventive treatment), Winter (indoor monitoring), and Spring (weed control and pest barriers).",
-    },
-    {
-        "keywords": ["response", "urgent", "emergency", "fast"],
-        "reply": "Urgent infestations are prioritized. Share your area and issue now, and we will guide the fastest available response window.",
-    },
-    {
-        "keywords": ["preparation", "prepare", "before service", "before treatment"],
-        "reply": "Before service: clear food surfaces, secure utensils, reduce clutter around treatment points, and keep children/pets away from active treatment zones.",
-    },
-    {
-        "keywords": ["after treatment", "after service", "follow up", "warranty", "guarantee"],
-        "reply": "After treatment, follow re-entry and hygiene guidance. We provide follow-up monitoring and prevention recommendations to reduce re-infestation risk.",
-    },
-    {
-        "keywords": ["school", "clinic", "institution", "government", "commercial"],
-        "reply": "Yes, we serve homes, businesses, schools, clinics, and government institutions with tailored treatment and reporting structures.",
-    },
-]
+
+# The knowledge base (pest profiles, intent rules, keyword lists) lives in this
+# JSON file so wording can change without a deploy; see configure().
+KNOWLEDGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "chatbot_knowledge.json")
+KNOWLEDGE_FORMAT = 1
+# Bump whenever KnowledgeSnapshot or the index classes change shape, so stale snapshot files are rebuilt.
+SNAPSHOT_FORMAT = 2
+# How often a request may stat the knowledge file to notice an edit.
+RELOAD_CHECK_SECONDS = 2.0
+
+PEST_FIELDS = ("title", "signs", "risks", "prevention", "treatment")
+PEST_SUGGESTIONS = ("How much will treatment cost?", "How long does treatment take?", "Book inspection")
+INTENT_SUGGESTIONS = ("Request a quote", "Talk on WhatsApp", "View services")
+
+logger = logging.getLogger("smartpest.chatbot")
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
 
 
 def _normalize(text):
@@ -139,83 +35,611 @@ def _normalize(text):
     return cleaned
 
 
-def _keyword_score(text, keywords):
-    score = 0
-    for keyword in keywords:
-        if keyword in text:
-            score += 1
-    return score
+def _string_list(data, key, where):
+    values = data.get(key)
+    if not isinstance(values, list) or not values or not all(isinstance(v, str) and v.strip() for v in values):
+        raise ValueError(f"{where}: '{key}' must be a non-empty list of strings.")
+    return tuple(values)
 
 
-def _pest_profile_match(text):
-    best_profile = None
-    best_score = 0
-    for profile in PEST_PROFILES:
-        score = _keyword_score(text, profile["aliases"])
-        if score > best_score:
-            best_score = score
-            best_profile = profile
-    return best_profile if best_score > 0 else None
+def validate_knowledge(data):
+    """Raise ValueError describing the first problem in a parsed knowledge-base document."""
+    if not isinstance(data, dict):
+        raise ValueError("The knowledge base must be a JSON object.")
+    if data.get("format") != KNOWLEDGE_FORMAT:
+        raise ValueError(f"Unsupported knowledge base format {data.get('format')!r}; expected {KNOWLEDGE_FORMAT}.")
+    for key in ("default_suggestions", "greeting_keywords", "thanks_keywords", "poison_keywords"):
+        _string_list(data, key, "Knowledge base")
+    for key in ("pest_profiles", "intent_rules"):
+        if not isinstance(data.get(key), list) or not data[key]:
+            raise ValueError(f"Knowledge base: '{key}' must be a non-empty list.")
 
+    for number, profile in enumerate(data["pest_profiles"], start=1):
+        where = f"Pest profile {number}"
+        if not isinstance(profile, dict):
+            raise ValueError(f"{where} must be an object.")
+        _string_list(profile, "aliases", where)
+        if "suggestion" in profile and (not isinstance(profile["suggestion"], str) or not profile["suggestion"].strip()):
+            raise ValueError(f"{where}: 'suggestion' must be a non-empty string.")
+        for field in PEST_FIELDS:
+            if not isinstance(profile.get(field), str) or not profile[field].strip():
+                raise ValueError(f"{where}: '{field}' must be a non-empty string.")
 
-def _intent_match(text):
-    best_reply = None
-    best_score = 0
-    for rule in INTENT_RULES:
-        score = _keyword_score(text, rule["keywords"])
-        if score > best_score:
-            best_score = score
-            best_reply = rule["reply"]
-    return best_reply if best_score > 0 else None
+    seen = set()
+    for number, rule in enumerate(data["intent_rules"], start=1):
+        where = f"Intent rule {number}"
+        if not isinstance(rule, dict):
+            raise ValueError(f"{where} must be an object.")
+        _string_list(rule, "keywords", where)
+        for field in ("id", "reply", "suggestion"):
+            if field == "suggestion" and field not in rule:
+                continue
+            if not isinstance(rule.get(field), str) or not rule[field].strip():
+                raise ValueError(f"{where}: '{field}' must be a non-empty string.")
+        if rule["id"] in seen:
+            raise ValueError(f"{where}: duplicate id {rule['id']!r}.")
+        seen.add(rule["id"])
 
 
-def generate_helpdesk_reply(message, contact_info):
-    text = _normalize(message)
-    if not text:
-        return (
-            "Please type your question and I will help immediately.",
-            CHATBOT_DEFAULT_SUGGESTIONS,
-        )
+class KnowledgeSnapshot:
+    """One compiled, read-only version of the knowledge base.
 
-    if any(word in text for word in ["hello", "hi", "hey", "good morning", "good afternoon", "good evening"]):
-        return (
-            "Hello, welcome to Smart Pest Solutions. How can I help you today with pest control, weed management, cleaning, or chemical products?",
-            CHATBOT_DEFAULT_SUGGESTIONS,
-        )
+    Holds the rule tables together with everything derived from them: the
+    keyword index, the BM25 and fuzzy indexes and the rendered replies. A new
+    version is compiled off to the side and published by swapping a single
+    reference, so a request always answers from one consistent snapshot.
 
-    if any(word in text for word in ["thank you", "thanks", "appreciate"]):
-        return (
-            "You are welcome. If you want, I can also help you prepare for inspection or create a quick service request checklist.",
-            ["Inspection checklist", "Service preparation guide", "Request a quote"],
+    Pest profiles and intent rules share one flat numbering ("rule ids",
+    profiles first) so a message is scored against all of them in one pass.
+    """
+
+    __slots__ = (
+        "version", "revision", "default_suggestions", "pest_profiles", "intent_rules", "rules", "labels",
+        "replies", "rule_suggestions", "related", "rule_index", "special_index", "max_ngram", "retrieval_index", "fuzzy_index",
+    )
+
+    def __init__(self, data):
+        validate_knowledge(data)
+        self.version = hashlib.sha1(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+        self.revision = data.get("revision", 0)
+        self.default_suggestions = tuple(data["default_suggestions"])
+        self.pest_profiles = tuple(dict(profile, aliases=tuple(profile["aliases"])) for profile in data["pest_profiles"])
+        self.intent_rules = tuple(dict(rule, keywords=tuple(rule["keywords"])) for rule in data["intent_rules"])
+
+        keywords = []
+        labels = []
+        replies = []
+        suggestions = []
+        for profile in self.pest_profiles:
+            keywords.append(profile["aliases"])
+            labels.append(f"pest:{profile['title']}")
+            replies.append(self._pest_reply(profile))
+            suggestions.append(profile.get("suggestion") or f"How do you treat {profile['title'].lower()}?")
+        for rule in self.intent_rules:
+            keywords.append(rule["keywords"])
+            labels.append(f"intent:{rule['id']}")
+            replies.append(rule["reply"])
+            suggestions.append(rule.get("suggestion"))
+        self.rules = tuple(("pest", n) for n in range(len(self.pest_profiles))) + tuple(
+            ("intent", n) for n in range(len(self.intent_rules))
         )
+        self.labels = tuple(labels)
+        self.replies = tuple(replies)
+        self.rule_suggestions = tuple(suggestions)
 
-    if any(word in text for word in ["poison", "swallowed", "ingested", "emergency health", "reaction"]):
+        specials = {group: data[f"{group}_keywords"] for group in ("greeting", "thanks", "poison")}
+        self.rule_index, self.special_index, self.max_ngram = self._inverted_index(keywords, specials)
+        self.retrieval_index = self._retrieval_index()
+        self.fuzzy_index = self._fuzzy_index(keywords)
+        self.related = tuple(self._related(rule_id, words) for rule_id, words in enumerate(keywords))
+
+    @staticmethod
+    def _inverted_index(keywords, specials):
+        rule_index = {}
+        special_index = {}
+        max_ngram = 1
+        entries = [(rule_id, words) for rule_id, words in enumerate(keywords)]
+        entries += [(group, words) for group, words in specials.items()]
+        for target, words in entries:
+            index = rule_index if isinstance(target, int) else special_index
+            for keyword in words:
+                token = " ".join(_WORD_RE.findall(keyword.lower()))
+                if target not in index.setdefault(token, []):
+                    index[token].append(target)
+                max_ngram = max(max_ngram, token.count(" ") + 1)
+        freeze = lambda index: {token: tuple(targets) for token, targets in index.items()}  # noqa: E731
+        return freeze(rule_index), freeze(special_index), max_ngram
+
+    def _retrieval_index(self):
+        documents = []
+        for rule_id, profile in enumerate(self.pest_profiles):
+            text = " ".join([*profile["aliases"], *(profile[field] for field in PEST_FIELDS)])
+            documents.append((rule_id, text))
+        for position, rule in enumerate(self.intent_rules):
+            documents.append((len(self.pest_profiles) + position, " ".join([*rule["keywords"], rule["reply"]])))
+        return BM25Index(documents)
+
+    def _related(self, rule_id, keywords):
+        """Other rules whose text strongly matches this rule's keywords, best first."""
+        hits = self.retrieval_index.search(" ".join(keywords), k=4)
+        return tuple(key for key, score, _ in hits if key != rule_id and score >= RETRIEVAL_MIN_SCORE)
+
+    @staticmethod
+    def _fuzzy_index(keywords):
+        entries = {}
+        for rule_id, words in enumerate(keywords):
+            for keyword in words:
+                # "bed bugs" is indexed as "bedbugs" so it also catches "bedbgs".
+                entries.setdefault("".join(_WORD_RE.findall(keyword.lower())), rule_id)
+        return FuzzyIndex((rule_id, term) for term, rule_id in entries.items())
+
+    @staticmethod
+    def _pest_reply(profile):
         return (
-            "If there is exposure or a severe reaction, please seek urgent medical help immediately. Then contact us so we can provide product safety details and incident support.",
-            ["Call emergency services", "Request MSDS", "Contact Smart Pest now"],
+            f"{profile['title']}: Signs: {profile['signs']} "
+            f"Risks: {profile['risks']} Prevention: {profile['prevention']} "
+            f"Our approach: {profile['treatment']}"
         )
 
-    pest_profile = _pest_profile_match(text)
-    if pest_profile:
-        reply = (
-            f"{pest_profile['title']}: Signs: {pest_profile['signs']} "
-            f"Risks: {pest_profile['risks']} Prevention: {pest_profile['prevention']} "
-            f"Our approach: {pest_profile['treatment']}"
-        )
-        return (
-            reply,
-            ["How much will treatment cost?", "How long does treatment take?", "Book inspection"],
+    def tokenize(self, text):
+        """Split normalized text into word tokens plus joined word n-grams.
+
+        N-grams go up to the longest multi-word keyword so phrases such as
+        "bed bugs" or "how much" are matched as single tokens.
+        """
+        words = _WORD_RE.findall(text)
+        tokens = set(words)
+        for size in range(2, self.max_ngram + 1):
+            for start in range(len(words) - size + 1):
+                tokens.add(" ".join(words[start:start + size]))
+        return tokens
+
+
+def compile_knowledge(data):
+    """Validate a parsed knowledge-base document and compile it into a snapshot."""
+    return KnowledgeSnapshot(data)
+
+
+def read_snapshot(path, source_hash):
+    """Load a serialized snapshot compiled from ``source_hash``, or None if it is missing or stale.
+
+    Snapshot files are pickles written by this module; only point
+    ``snapshot_path`` at a location the app itself controls.
+    """
+    try:
+        with open(path, "rb") as handle:
+            header = pickle.load(handle)
+            if header != {"format": SNAPSHOT_FORMAT, "source": source_hash}:
+                return None
+            return pickle.load(handle)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError):
+        return None
+
+
+def write_snapshot(snapshot, path, source_hash):
+    """Serialize a compiled snapshot next to its source hash; written atomically."""
+    partial = f"{path}.{os.getpid()}.part"
+    with open(partial, "wb") as handle:
+        pickle.dump({"format": SNAPSHOT_FORMAT, "source": source_hash}, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(snapshot, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(partial, path)
+
+
+_source = {"path": KNOWLEDGE_PATH, "snapshot_path": None, "stat": None, "checked": 0.0}
+_snapshot = None
+_load_lock = threading.Lock()
+_reloading = threading.Lock()
+# Callables run with no arguments after reload_knowledge() swaps in a new snapshot (app.py clears its page cache).
+RELOAD_OBSERVERS = []
+
+
+def configure(path=None, snapshot_path=None):
+    """Point the chatbot at a knowledge file and (optionally) a serialized snapshot cache.
+
+    Takes effect on the next lookup. Without ``snapshot_path`` the
+    knowledge base is compiled from the JSON on every cold start.
+    """
+    global _snapshot
+    with _load_lock:
+        _source.update(path=path or KNOWLEDGE_PATH, snapshot_path=snapshot_path, stat=None, checked=0.0)
+        _snapshot = None
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _load():
+    """Read the knowledge file and return its snapshot, from the serialized cache when it is current."""
+    path, snapshot_path = _source["path"], _source["snapshot_path"]
+    stat = _file_stat(path)
+    with open(path, "rb") as handle:
+        raw = handle.read()
+    source_hash = hashlib.sha1(raw).hexdigest()
+
+    snapshot = read_snapshot(snapshot_path, source_hash) if snapshot_path else None
+    if snapshot is None:
+        snapshot = compile_knowledge(json.loads(raw))
+        if snapshot_path:
+            try:
+                write_snapshot(snapshot, snapshot_path, source_hash)
+            except OSError as exc:
+                logger.warning("Could not write chatbot snapshot %s: %s", snapshot_path, exc)
+    return snapshot, stat
+
+
+def _publish(snapshot, stat):
+    global _snapshot
+    _source["stat"] = stat
+    _source["checked"] = time.monotonic()
+    _snapshot = snapshot
+
+
+def reload_knowledge():
+    """Recompile the knowledge file now and swap the result in; returns the new snapshot.
+
+    Raises ValueError (or OSError) and keeps serving the current snapshot
+    when the file is invalid.
+    """
+    with _load_lock:
+        snapshot, stat = _load()
+        _publish(snapshot, stat)
+    for observer in RELOAD_OBSERVERS:
+        observer()
+    return snapshot
+
+
+def _reload_in_background():
+    try:
+        reload_knowledge()
+        logger.info("Reloaded chatbot knowledge base %s", _source["path"])
+    except (OSError, ValueError) as exc:
+        logger.error("Keeping the current chatbot knowledge base; %s is invalid: %s", _source["path"], exc)
+        try:
+            _source["stat"] = _file_stat(_source["path"])  # report each bad edit once
+        except OSError:
+            pass
+    finally:
+        _reloading.release()
+
+
+def current_snapshot():
+    """The snapshot to answer from.
+
+    At most every RELOAD_CHECK_SECONDS a caller stats the knowledge file;
+    when it changed, a background thread compiles the new version while
+    requests keep using the current one. Only the very first call waits
+    for a load.
+    """
+    snapshot = _snapshot
+    if snapshot is None:
+        with _load_lock:
+            if _snapshot is None:
+                _publish(*_load())
+            return _snapshot
+
+    now = time.monotonic()
+    if now - _source["checked"] >= RELOAD_CHECK_SECONDS:
+        _source["checked"] = now
+        try:
+            changed = _file_stat(_source["path"]) != _source["stat"]
+        except OSError:
+            changed = False
+        if changed and _reloading.acquire(blocking=False):
+            threading.Thread(target=_reload_in_background, name="smartpest-chatbot-reload", daemon=True).start()
+    return snapshot
+
+
+def knowledge_document():
+    """The knowledge file's current text, for the admin editor."""
+    with open(_source["path"], encoding="utf-8") as handle:
+        return handle.read()
+
+
+def save_knowledge(text):
+    """Validate edited knowledge-base JSON, write it atomically and swap it in.
+
+    The revision counter is bumped on every save. Raises ValueError with a
+    readable message when the document is not valid.
+    """
+    try:
+        data = json.loads(text)
+    except ValueError as exc:
+        raise ValueError(f"Invalid JSON: {exc}") from exc
+    if isinstance(data, dict):
+        data["revision"] = current_snapshot().revision + 1
+    compile_knowledge(data)
+
+    path = _source["path"]
+    partial = f"{path}.{os.getpid()}.part"
+    with open(partial, "w", encoding="utf-8") as handle:
+        json.dump(data, handle, indent=2, ensure_ascii=False)
+        handle.write("\n")
+    os.replace(partial, path)
+    return reload_knowledge()
+
+
+_SNAPSHOT_ATTRIBUTES = {
+    "CHATBOT_DEFAULT_SUGGESTIONS": "default_suggestions",
+    "PEST_PROFILES": "pest_profiles",
+    "INTENT_RULES": "intent_rules",
+    "KNOWLEDGE_VERSION": "version",
+}
+
+
+def __getattr__(name):
+    # The rule tables used to be module constants; keep those names working.
+    if name in _SNAPSHOT_ATTRIBUTES:
+        return getattr(current_snapshot(), _SNAPSHOT_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# route is the best rule's label (e.g. "pest:Termites"); scores holds (rule, score, scorer) for the top-ranked rules.
+Answer = namedtuple("Answer", "route reply suggestions scores")
+
+CHATBOT_MODES = ("rules", "retrieval", "hybrid")
+# A retrieved document answers only if it shares several terms with the
+# message or one strongly weighted term; otherwise the fallback is safer.
+RETRIEVAL_MIN_TERMS = 2
+RETRIEVAL_MIN_SCORE = 3.5
+# Last resort before the fallback reply: correct misspelled pest names and keywords.
+FUZZY_MATCHING = True
+# How many matched rules one reply may cover, how many ranked rules are reported, and how many chips are offered.
+MAX_COMPOSED = 3
+TOP_K = 5
+SUGGESTION_COUNT = 3
+
+
+def _match_scores(snapshot, text):
+    """Score every pest profile and intent rule in one pass over the message tokens.
+
+    Returns the per-rule score array (each distinct keyword found adds 1)
+    and the set of special groups (greeting, thanks, poison) that matched.
+    """
+    scores = [0] * len(snapshot.rules)
+    specials = set()
+    for token in snapshot.tokenize(text):
+        for rule_id in snapshot.rule_index.get(token, ()):
+            scores[rule_id] += 1
+        specials.update(snapshot.special_index.get(token, ()))
+    return scores, specials
+
+
+def _rank(scores, k=TOP_K):
+    """Rule ids with a positive score, best first; ties go to the earlier rule (pests before intents)."""
+    return heapq.nlargest(k, (rule_id for rule_id, score in enumerate(scores) if score), key=lambda rule_id: (scores[rule_id], -rule_id))
+
+
+def _suggestions(snapshot, answered, candidates):
+    """Follow-up chips: the next-best rules for this message, then rules related to the answer, then the defaults."""
+    related = [rule_id for answered_id in answered for rule_id in snapshot.related[answered_id]]
+    chosen = []
+    for rule_id in [*candidates, *related]:
+        suggestion = snapshot.rule_suggestions[rule_id]
+        if rule_id not in answered and suggestion and suggestion not in chosen:
+            chosen.append(suggestion)
+    kind = snapshot.rules[answered[0]][0] if answered else None
+    defaults = PEST_SUGGESTIONS if kind == "pest" else INTENT_SUGGESTIONS if kind == "intent" else snapshot.default_suggestions
+    for suggestion in defaults:
+        if suggestion not in chosen:
+            chosen.append(suggestion)
+    return tuple(chosen[:SUGGESTION_COUNT])
+
+
+def _answer(snapshot, answered, scores, candidates=()):
+    """Compose the replies of the answered rules, best first."""
+    reply = "\n\n".join(snapshot.replies[rule_id] for rule_id in answered)
+    return Answer(snapshot.labels[answered[0]], reply, _suggestions(snapshot, answered, candidates), scores)
+
+
+def _retrieve(snapshot, text):
+    hits = snapshot.retrieval_index.search(text, k=TOP_K)
+    if not hits:
+        return None
+    rule_id, score, matched_terms = hits[0]
+    if matched_terms < RETRIEVAL_MIN_TERMS and score < RETRIEVAL_MIN_SCORE:
+        return None
+    scores = tuple((snapshot.labels[key], round(value, 3), "bm25") for key, value, _ in hits)
+    return _answer(snapshot, [rule_id], scores)
+
+
+def _fuzzy_match(snapshot, text):
+    """Answer a message whose only pest name or keyword is misspelled ("cockroches", "bedbgs")."""
+    words = _WORD_RE.findall(text)
+    candidates = words + [first + second for first, second in zip(words, words[1:])]
+    found = snapshot.fuzzy_index.search(candidates)
+    if not found:
+        return None
+    rule_id, term, distance = found
+    scores = ((snapshot.labels[rule_id], round(1 - distance / len(term), 3), "fuzzy"),)
+    return _answer(snapshot, [rule_id], scores)
+
+
+SPECIAL_REPLIES = {
+    "greeting": "Hello, welcome to Smart Pest Solutions. How can I help you today with pest control, weed management, cleaning, or chemical products?",
+    "thanks": "You are welcome. If you want, I can also help you prepare for inspection or create a quick service request checklist.",
+}
+# Opening line when a greeting or thanks comes with a question ("Hello, how much does termite treatment cost?").
+SPECIAL_PREFIXES = {
+    "greeting": "Hello, welcome to Smart Pest Solutions.",
+    "thanks": "You are welcome.",
+}
+SPECIAL_SUGGESTIONS = {"thanks": ("Inspection checklist", "Service preparation guide", "Request a quote")}
+
+
+# Callables run as observer(route, mode, seconds) after every match (see metrics.py).
+MATCH_OBSERVERS = []
+
+
+def _resolve(text, contact_info, mode="rules"):
+    """Route a normalized message, returning an Answer.
+
+    ``mode`` picks how knowledge-base answers are found: keyword ``rules``,
+    BM25 ``retrieval``, or ``hybrid`` (rules first, retrieval before the
+    fallback). Greeting, thanks and poison handling apply in every mode.
+    """
+    started = time.perf_counter()
+    answer = _route(current_snapshot(), text, contact_info, mode)
+    if MATCH_OBSERVERS:
+        elapsed = time.perf_counter() - started
+        for observer in MATCH_OBSERVERS:
+            observer(answer.route, mode, elapsed)
+    return answer
+
+
+def _match(snapshot, text, mode, ranked, keyword_scores):
+    """The knowledge-base Answer for a message, or None when no rule, retrieval hit or fuzzy term fits."""
+    if mode != "retrieval" and ranked:
+        return _answer(snapshot, ranked[:MAX_COMPOSED], keyword_scores, ranked[MAX_COMPOSED:])
+
+    if mode != "rules":
+        answer = _retrieve(snapshot, text)
+        if answer:
+            return answer
+
+    if FUZZY_MATCHING:
+        return _fuzzy_match(snapshot, text)
+    return None
+
+
+def _route(snapshot, text, contact_info, mode):
+    if mode not in CHATBOT_MODES:
+        raise ValueError(f"Unknown chatbot mode: {mode!r}")
+
+    if not text:
+        return Answer(
+            "empty",
+            "Please type your question and I will help immediately.",
+            snapshot.default_suggestions,
+            (),
         )
 
-    intent_reply = _intent_match(text)
-    if intent_reply:
-        return (
-            intent_reply,
-            ["Request a quote", "Talk on WhatsApp", "View services"],
+    scores, specials = _match_scores(snapshot, text)
+    ranked = _rank(scores)
+    keyword_scores = tuple((snapshot.labels[rule_id], scores[rule_id], "keywords") for rule_id in ranked)
+
+    # Safety comes first: "my child swallowed rat poison" must never get a pest or greeting reply.
+    if "poison" in specials:
+        return Answer(
+            "poison",
+            "If there is exposure or a severe reaction, please seek urgent medical help immediately. Then contact us so we can provide product safety details and incident support.",
+            ("Call emergency services", "Request MSDS", "Contact Smart Pest now"),
+            keyword_scores,
         )
 
+    answer = _match(snapshot, text, mode, ranked, keyword_scores)
+    # Greetings and thanks only open the reply when the message also asks something.
+    for special in ("greeting", "thanks"):
+        if special in specials:
+            if answer:
+                return answer._replace(reply=f"{SPECIAL_PREFIXES[special]}\n\n{answer.reply}")
+            return Answer(special, SPECIAL_REPLIES[special], SPECIAL_SUGGESTIONS.get(special, snapshot.default_suggestions), keyword_scores)
+    if answer:
+        return answer
+
     fallback = (
         "I can help with pest identification, treatment options, safety, preparation, follow-up, and pricing guidance. "
         f"For direct support, call {contact_info['phone_display']} or WhatsApp {contact_info['whatsapp_display']}."
     )
-    return (fallback, CHATBOT_DEFAULT_SUGGESTIONS)
+    return Answer("fallback", fallback, snapshot.default_suggestions, keyword_scores)
+
+
+def classify_message(message, contact_info, mode="rules"):
+    """Return the route label (e.g. ``pest:Termites``) that answers a message."""
+    return _resolve(_normalize(message), contact_info, mode).route
+
+
+def generate_helpdesk_reply(message, contact_info, mode="rules"):
+    answer = _resolve(_normalize(message), contact_info, mode)
+    return (answer.reply, answer.suggestions)
+
+
+def score_rows(scores):
+    """Per-rule scores as JSON-ready dicts, for debugging responses."""
+    return [{"rule": rule, "score": score, "scorer": scorer} for rule, score, scorer in scores]
+
+
+def generate_helpdesk_replies(messages, contact_info, mode="rules"):
+    """Answer many messages at once, resolving each distinct normalized text once.
+
+    Returns one ``{"route", "reply", "suggestions", "scores"}`` dict per input message.
+    """
+    resolved = {}
+    results = []
+    for message in messages:
+        text = _normalize(message)
+        answer = resolved.get(text)
+        if answer is None:
+            route, reply, suggestions, scores = _resolve(text, contact_info, mode)
+            answer = resolved[text] = {
+                "route": route, "reply": reply, "suggestions": suggestions, "scores": score_rows(scores),
+            }
+        results.append(answer)
+    return results
+
+
+class ReplyCache:
+    """Bounded LRU of helpdesk replies keyed on the normalized message.
+
+    Entries remember the knowledge version and contact details they were built
+    from; when either changes the whole cache is dropped before the next lookup.
+    """
+
+    def __init__(self, max_size=512):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._source = None
+        self._lock = threading.Lock()
+
+    def reply(self, message, contact_info, mode="rules"):
+        """The Answer for a message, from the cache when possible."""
+        text = _normalize(message)
+        key = (text, mode)
+        source = (current_snapshot().version, tuple(sorted(contact_info.items())))
+
+        with self._lock:
+            if source != self._source:
+                if self._entries:
+                    self.invalidations += 1
+                    self._entries.clear()
+                self._source = source
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        entry = _resolve(text, contact_info, mode)
+
+        with self._lock:
+            if source == self._source:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,175 @@
+import heapq
+import math
+import re
+from collections import Counter
+
+
+STOP_WORDS = frozenset(
+    "a about all also am an and any are as at be been but by can do does for from get had has have "
+    "help how i if in into is it its just know many me much my need no not of on or our please "
+    "problem service so some that the their them there these they this to very want was we what "
+    "when where which who why will with you your".split()
+)
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word):
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "ches", "shes", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def analyze(text):
+    """Lower-case, drop stop words and fold simple plurals ("kitchens" -> "kitchen")."""
+    return [_stem(word) for word in _WORD_RE.findall(text.lower()) if word not in STOP_WORDS]
+
+
+class BM25Index:
+    """Okapi BM25 over a small in-memory corpus, built once and queried offline.
+
+    Each term maps to a sparse posting list of precomputed per-document weights,
+    so a query is a sparse dot product over its own terms followed by a top-k
+    selection; documents that share no term with the query are never visited.
+    """
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.keys = []
+        term_counts = []
+        for key, text in documents:
+            self.keys.append(key)
+            term_counts.append(Counter(analyze(text)))
+
+        total = len(term_counts)
+        average_length = sum(sum(counts.values()) for counts in term_counts) / total if total else 0.0
+        document_frequency = Counter(term for counts in term_counts for term in counts)
+
+        self.postings = {}
+        for doc_id, counts in enumerate(term_counts):
+            length_norm = k1 * (1 - b + b * sum(counts.values()) / average_length)
+            for term, frequency in counts.items():
+                df = document_frequency[term]
+                idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+                weight = idf * frequency * (k1 + 1) / (frequency + length_norm)
+                self.postings.setdefault(term, []).append((doc_id, weight))
+
+    def search(self, text, k=3):
+        """Return up to ``k`` ``(key, score, matched_terms)`` triples, best first."""
+        scores = {}
+        matched = Counter()
+        for term, query_frequency in Counter(analyze(text)).items():
+            for doc_id, weight in self.postings.get(term, ()):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight * query_frequency
+                matched[doc_id] += 1
+        best = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [(self.keys[doc_id], score, matched[doc_id]) for doc_id, score in best]
+
+
+def _trigrams(term):
+    padded = f"$${term}$$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a, b, limit):
+    """Optimal-string-alignment distance (adjacent swaps cost 1), or ``limit + 1`` once it exceeds ``limit``.
+
+    Only the diagonal band of width ``2 * limit + 1`` is filled in, so a check
+    costs O(limit * len(a)) rather than O(len(a) * len(b)).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    before = None
+    previous_row = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        row = [over] * (len(b) + 1)
+        if i <= limit:
+            row[0] = i
+        low = max(1, i - limit)
+        high = min(len(b), i + limit)
+        char = a[i - 1]
+        best = row[0]
+        for j in range(low, high + 1):
+            value = previous_row[j - 1] + (char != b[j - 1])
+            if previous_row[j] + 1 < value:
+                value = previous_row[j] + 1
+            if row[j - 1] + 1 < value:
+                value = row[j - 1] + 1
+            if before is not None and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1] and before[j - 2] + 1 < value:
+                value = before[j - 2] + 1
+            row[j] = value if value < over else over
+            if value < best:
+                best = value
+        if best > limit and min(previous_row) > limit:
+            return over
+        before, previous_row = previous_row, row
+    return previous_row[-1]
+
+
+class FuzzyIndex:
+    """Typo-tolerant lookup of single terms through a character-trigram index.
+
+    A candidate must share enough trigrams with the query to possibly lie
+    within the allowed distance (each edit breaks at most four trigrams), so
+    only a handful of terms reach the exact edit-distance check. Short words
+    are never corrected: "cast" is as likely to be a real word as a typo.
+    """
+
+    def __init__(self, entries, min_length=5, long_length=8):
+        self.min_length = min_length
+        self.long_length = long_length
+        self.terms = []
+        self.postings = {}
+        for key, term in entries:
+            term_id = len(self.terms)
+            self.terms.append((term, key))
+            for gram in _trigrams(term):
+                self.postings.setdefault(gram, []).append(term_id)
+
+    def max_distance(self, word):
+        if len(word) < self.min_length:
+            return 0
+        return 2 if len(word) >= self.long_length else 1
+
+    def lookup(self, word):
+        """Return ``(key, term, distance)`` for the closest term within the allowed distance, or None."""
+        limit = self.max_distance(word)
+        if not limit:
+            return None
+        grams = _trigrams(word)
+        shared = {}
+        for gram in grams:
+            for term_id in self.postings.get(gram, ()):
+                shared[term_id] = shared.get(term_id, 0) + 1
+        needed = max(1, len(grams) - 4 * limit)
+        best = None
+        for term_id, count in shared.items():
+            if count < needed:
+                continue
+            term, key = self.terms[term_id]
+            if abs(len(term) - len(word)) > limit:
+                continue
+            distance = edit_distance(word, term, limit)
+            if distance <= limit and (best is None or (distance, term_id) < (best[2], best[3])):
+                best = (key, term, distance, term_id)
+        return best[:3] if best else None
+
+    def search(self, words):
+        """Best match over several query words: fewest edits first, then the longest word."""
+        best = best_rank = None
+        for word in words:
+            if word in STOP_WORDS:
+                continue
+            found = self.lookup(word)
+            if not found:
+                continue
+            rank = (found[2], -len(word))
+            if best is None or rank < best_rank:
+                best, best_rank = found, rank
+        return best
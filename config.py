@@ -14,5 +14,93 @@ class Config:
         SQLALCHEMY_DATABASE_URI = SQLALCHEMY_DATABASE_URI.replace('postgres://', 'postgresql://', 1)
 
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Engine tuning (see db_profiles.py): 'auto' picks 'sqlite' or 'serverless-postgres'
+    # from the URL; 'default' leaves SQLAlchemy's defaults untouched.
+    DB_ENGINE_PROFILE = os.getenv('DB_ENGINE_PROFILE', 'auto')
+    # A serverless instance serves one request at a time, so keep the pool small.
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '2'))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', '3'))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', '10'))
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', '300'))
+    DB_CONNECT_TIMEOUT = int(os.getenv('DB_CONNECT_TIMEOUT', '5'))
+    # Set when DATABASE_URL points at PgBouncer/Supavisor/Neon's pooled endpoint.
+    DB_EXTERNAL_POOLER = os.getenv('DB_EXTERNAL_POOLER', '').lower() in ('1', 'true', 'yes')
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_MMAP_BYTES = int(os.getenv('SQLITE_MMAP_BYTES', str(64 * 1024 * 1024)))
+    # When tables and the admin user are created: 'first-request' (once per process,
+    # for the throwaway default SQLite database) or 'command' (only by 'flask bootstrap',
+    # run once per deploy against a persistent DATABASE_URL).
+    SCHEMA_BOOTSTRAP = os.getenv('SCHEMA_BOOTSTRAP', 'command' if os.getenv('DATABASE_URL') else 'first-request')
     UPLOAD_FOLDER = '/tmp/uploads' if is_vercel else os.path.join(BASE_DIR, 'static', 'uploads')
     MAX_CONTENT_LENGTH = 5 * 1024 * 1024
+
+    # Helpdesk chatbot answering strategy: 'rules', 'retrieval' or 'hybrid'.
+    CHATBOT_MODE = os.getenv('CHATBOT_MODE', 'hybrid')
+    CHATBOT_CACHE_SIZE = int(os.getenv('CHATBOT_CACHE_SIZE', '512'))
+    # Edge cache lifetime for GET chatbot replies (suggestion chips).
+    CHATBOT_CACHE_MAX_AGE = int(os.getenv('CHATBOT_CACHE_MAX_AGE', '300'))
+    # Messages per /api/chatbot/batch call (admins only); larger transcripts go through scripts/chatbot_replay.py.
+    CHATBOT_BATCH_LIMIT = int(os.getenv('CHATBOT_BATCH_LIMIT', '200'))
+    # Editable knowledge base (pest profiles, intent rules); edits are picked up without a restart.
+    CHATBOT_KNOWLEDGE_PATH = os.getenv('CHATBOT_KNOWLEDGE_PATH', os.path.join(BASE_DIR, 'data', 'chatbot_knowledge.json'))
+    # Compiled knowledge-base cache that makes cold starts skip index building ('flask chatbot-snapshot').
+    CHATBOT_SNAPSHOT_PATH = os.getenv(
+        'CHATBOT_SNAPSHOT_PATH',
+        '/tmp/smartpest-chatbot.snapshot' if is_vercel else os.path.join(BASE_DIR, 'data', 'chatbot_knowledge.snapshot')
+    )
+    # Conversation analytics (see chatbot_analytics.py). Serverless instances freeze between
+    # requests, so the background writer would never run on Vercel; it is off there by default.
+    CHATBOT_ANALYTICS_ENABLED = os.getenv('CHATBOT_ANALYTICS_ENABLED', '0' if is_vercel else '1').lower() in ('1', 'true', 'yes')
+    # Events held in memory between writes; the oldest are dropped when the database falls behind.
+    CHATBOT_ANALYTICS_BUFFER = int(os.getenv('CHATBOT_ANALYTICS_BUFFER', '10000'))
+    CHATBOT_ANALYTICS_FLUSH_INTERVAL = float(os.getenv('CHATBOT_ANALYTICS_FLUSH_INTERVAL', '5'))
+    CHATBOT_ANALYTICS_ROLLUP_INTERVAL = float(os.getenv('CHATBOT_ANALYTICS_ROLLUP_INTERVAL', '300'))
+    CHATBOT_ANALYTICS_RETENTION_DAYS = int(os.getenv('CHATBOT_ANALYTICS_RETENTION_DAYS', '90'))
+
+    # Seconds a cached catalogue page stays valid on instances that did not see the edit.
+    PAGE_CACHE_TTL = int(os.getenv('PAGE_CACHE_TTL', '60'))
+    DASHBOARD_PAGE_SIZE = int(os.getenv('DASHBOARD_PAGE_SIZE', '20'))
+    LEADS_PAGE_SIZE = int(os.getenv('LEADS_PAGE_SIZE', '50'))
+
+    # Background export/report jobs; artifacts are written to JOB_ARTIFACT_FOLDER.
+    # The job runs and its artifact is downloaded wherever that folder lives, so jobs need
+    # one persistent instance (or a folder shared by every worker, e.g. a mounted volume).
+    # On Vercel /tmp is per-instance and short-lived: a finished export may not be downloadable.
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_ARTIFACT_FOLDER = os.getenv(
+        'JOB_ARTIFACT_FOLDER',
+        '/tmp/smartpest-jobs' if is_vercel else os.path.join(BASE_DIR, 'job_artifacts')
+    )
+    JOB_DEDUPE_SECONDS = int(os.getenv('JOB_DEDUPE_SECONDS', '300'))
+    JOB_STALE_SECONDS = int(os.getenv('JOB_STALE_SECONDS', '3600'))
+    # Rows between progress writes, so other workers' status pages see a running job move.
+    JOB_PROGRESS_EVERY = int(os.getenv('JOB_PROGRESS_EVERY', '1000'))
+
+    # Where catalogue uploads live: 'local' (UPLOAD_FOLDER) or 's3' (any S3-compatible bucket).
+    # On Vercel UPLOAD_FOLDER is per-instance and ephemeral, so use 's3' there.
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'local')
+    S3_BUCKET = os.getenv('S3_BUCKET', '')
+    S3_PREFIX = os.getenv('S3_PREFIX', 'uploads')
+    # Set for MinIO/R2 and other non-AWS endpoints, e.g. http://localhost:9000.
+    S3_ENDPOINT_URL = os.getenv('S3_ENDPOINT_URL') or None
+    S3_REGION = os.getenv('S3_REGION') or None
+    # Public or CDN base URL objects are served from; defaults to the bucket URL.
+    S3_PUBLIC_URL = os.getenv('S3_PUBLIC_URL') or None
+
+    # Public form submissions: 'buffered' acknowledges once the submission is fsynced to
+    # a local journal and inserts it in batches; 'sync' inserts during the request.
+    # Serverless instances freeze between requests and lose /tmp, so Vercel stays 'sync'.
+    INGEST_MODE = os.getenv('INGEST_MODE', 'sync' if is_vercel else 'buffered')
+    INGEST_JOURNAL_FOLDER = '/tmp/smartpest-ingest' if is_vercel else os.path.join(BASE_DIR, 'ingest_journal')
+    INGEST_FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', '2'))
+    INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', '500'))
+
+    # Request instrumentation (see metrics.py): latency, SQL and template timings per endpoint.
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    # Requests slower than this are logged with their slowest SQL statements.
+    SLOW_REQUEST_MS = int(os.getenv('SLOW_REQUEST_MS', '500'))
+    # Bearer token for Prometheus scrapes of /metrics; without it only logged-in admins can read it.
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+    # ASGI serving mode (see asgi.py): threads that run the Flask views the event loop does not answer itself.
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '8'))
@@ -0,0 +1,70 @@
+from sqlalchemy import event
+from sqlalchemy.pool import NullPool
+
+
+ENGINE_PROFILES = ('default', 'sqlite', 'serverless-postgres')
+
+
+def resolve_profile(config):
+    """The engine profile to use; 'auto' picks one from the database URL."""
+    profile = config['DB_ENGINE_PROFILE']
+    if profile == 'auto':
+        uri = config['SQLALCHEMY_DATABASE_URI']
+        if uri.startswith('sqlite'):
+            return 'sqlite'
+        if uri.startswith('postgresql'):
+            return 'serverless-postgres'
+        return 'default'
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f'Unknown DB_ENGINE_PROFILE {profile!r}; expected auto or one of {ENGINE_PROFILES}.')
+    return profile
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured profile."""
+    profile = resolve_profile(config)
+    if profile == 'sqlite':
+        # sqlite3's own busy wait; the busy_timeout pragma below covers connections it misses.
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    if profile != 'serverless-postgres':
+        return {}
+
+    connect_args = {'connect_timeout': config['DB_CONNECT_TIMEOUT'], 'application_name': 'smartpest'}
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql+psycopg:'):
+        # psycopg 3 prepares repeated statements server-side, which transaction-mode poolers cannot route.
+        connect_args['prepare_threshold'] = None
+    if config['DB_EXTERNAL_POOLER']:
+        # PgBouncer/Supavisor/Neon's pooler keeps the server connections warm; holding
+        # our own idle connections on top would only pin pooler slots per instance.
+        return {'poolclass': NullPool, 'connect_args': connect_args}
+    return {
+        'pool_pre_ping': True,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        # Recycle before managed Postgres and NAT gateways drop idle connections.
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        # Reuse the most recent connection so surplus ones idle out and get recycled.
+        'pool_use_lifo': True,
+        'connect_args': connect_args,
+    }
+
+
+def apply_profile(engine, config):
+    """Hook per-connection settings the profile needs onto ``engine``."""
+    if resolve_profile(config) != 'sqlite':
+        return
+
+    pragmas = (
+        'PRAGMA journal_mode=WAL',
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_BYTES'])}",
+    )
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, _record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
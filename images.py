@@ -0,0 +1,72 @@
+import os
+
+
+# Catalogue variants by maximum width; images are never upscaled.
+VARIANT_WIDTHS = {'thumb': 320, 'card': 640, 'full': 1280}
+VARIANT_FORMATS = {'webp': ('WEBP', {'quality': 80, 'method': 4}), 'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True})}
+MAX_SOURCE_PIXELS = 40_000_000
+
+
+def variant_filename(image, variant, extension):
+    """Name of one stored variant, derived from the ``<stem>-full.jpg`` kept on the model."""
+    stem = image.rsplit('-full.', 1)[0]
+    return f'{stem}-{variant}.{extension}'
+
+
+def variant_widths(full_width):
+    """``(variant, width)`` pairs with distinct widths, smallest first, for srcset."""
+    widths = []
+    for variant, max_width in sorted(VARIANT_WIDTHS.items(), key=lambda item: item[1]):
+        width = min(max_width, full_width)
+        if not widths or widths[-1][1] != width:
+            widths.append((variant, width))
+    return widths
+
+
+def variant_size(full_width, full_height, variant):
+    width = min(VARIANT_WIDTHS[variant], full_width)
+    return width, max(1, round(full_height * width / full_width))
+
+
+def ingest_image(source_path, folder, stem):
+    """Decode an uploaded image once and write every resized variant into ``folder``.
+
+    Returns the model fields to store (``image``, ``image_width``,
+    ``image_height``), or None when the file is not an image Pillow can decode.
+    Raises ImportError when Pillow is not installed.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    Image.MAX_IMAGE_PIXELS = MAX_SOURCE_PIXELS
+    try:
+        with Image.open(source_path) as source:
+            source.load()
+            image = ImageOps.exif_transpose(source)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, ValueError):
+        return None
+
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    resized = image
+    full_size = None
+    # Largest first so each smaller variant is resampled from the previous one.
+    for variant, max_width in sorted(VARIANT_WIDTHS.items(), key=lambda item: -item[1]):
+        if resized.width > max_width:
+            resized = resized.resize((max_width, max(1, round(resized.height * max_width / resized.width))), Image.LANCZOS)
+        if variant == 'full':
+            full_size = resized.size
+        opaque = resized
+        if has_alpha:
+            opaque = Image.new('RGB', resized.size, (255, 255, 255))
+            opaque.paste(resized, mask=resized.getchannel('A'))
+        for extension, (image_format, options) in VARIANT_FORMATS.items():
+            target = resized if extension == 'webp' else opaque
+            target.save(os.path.join(folder, f'{stem}-{variant}.{extension}'), image_format, **options)
+
+    return {
+        'image': f'{stem}-full.jpg',
+        'image_width': full_size[0],
+        'image_height': full_size[1],
+    }
+
@@ -0,0 +1,308 @@
+import atexit
+import contextlib
+import itertools
+import json
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+from models.db_setup import NewsletterSubscriber, QuoteRequest, db
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines; see _claim_owner()
+    fcntl = None
+
+
+INGEST_MODELS = {'quote': QuoteRequest, 'subscriber': NewsletterSubscriber}
+# Unique column each kind is deduplicated on when a batch is (re)inserted.
+CONFLICT_COLUMNS = {'quote': 'ingest_key', 'subscriber': 'email'}
+# Keeps each statement well under SQLite's bound-parameter limit.
+MAX_ROWS_PER_STATEMENT = 1000
+# <pid>-<random>[-<sequence>].<state>.jsonl; anything else in the folder (rejects, lock files) is left alone.
+JOURNAL_NAME_RE = re.compile(r'^(?P<owner>(?P<pid>\d+)-[0-9a-f]{8})(?:-\d{6})?\.(?P<state>active|sealed)\.jsonl$')
+LOCK_NAME_RE = re.compile(r'^(?P<owner>(?P<pid>\d+)-[0-9a-f]{8})\.lock$')
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _try_lock(path):
+    """Open ``path`` and take an exclusive flock without waiting; None when another process holds it."""
+    handle = open(path, 'a+')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.close()
+        return None
+    return handle
+
+
+def _insert_statement(model, rows, conflict_column):
+    dialect = db.engine.dialect.name
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert(model).values(rows).on_conflict_do_nothing(index_elements=[conflict_column])
+
+
+def insert_rows(kind, rows):
+    """Insert rows in one multi-row INSERT ... ON CONFLICT DO NOTHING; return how many were new.
+
+    Rows that collide on the kind's unique column are skipped. Databases
+    without ON CONFLICT fall back to row-by-row inserts inside savepoints.
+    """
+    model = INGEST_MODELS[kind]
+    if db.engine.dialect.name in ('sqlite', 'postgresql'):
+        inserted = 0
+        for start in range(0, len(rows), MAX_ROWS_PER_STATEMENT):
+            statement = _insert_statement(model, rows[start:start + MAX_ROWS_PER_STATEMENT], CONFLICT_COLUMNS[kind])
+            inserted += db.session.execute(statement).rowcount
+        return inserted
+
+    inserted = 0
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(db.insert(model).values(row))
+            inserted += 1
+        except IntegrityError:
+            pass
+    return inserted
+
+
+def validate(kind, values):
+    """Raise ValueError for values the table would reject once the request is long gone."""
+    columns = INGEST_MODELS[kind].__table__.columns
+    for name, value in values.items():
+        length = getattr(columns[name].type, 'length', None)
+        if isinstance(value, str) and length and len(value) > length:
+            raise ValueError(f"{name.replace('_', ' ').capitalize()} must be at most {length} characters.")
+
+
+class IngestBuffer:
+    """Write-behind queue for quote requests and newsletter signups.
+
+    In 'buffered' mode a submission is appended to a local journal and
+    fsynced before the visitor is answered. A background thread seals the
+    journal every INGEST_FLUSH_INTERVAL seconds, or sooner once
+    INGEST_BATCH_SIZE records wait, and writes it in multi-row
+    INSERT ... ON CONFLICT DO NOTHING batches. A journal is deleted only after
+    its rows are committed; journals left by a crashed process (one that no
+    longer holds the flock on its ``<owner>.lock`` file) are replayed, and the
+    per-record keys make a replay insert nothing twice.
+    In 'sync' mode the same insert runs inside the request.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._journal = None
+        self._pending = 0
+        self._sequence = itertools.count()
+        self._started = False
+        self._owner_lock = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.mode = app.config['INGEST_MODE']
+        self.folder = app.config['INGEST_JOURNAL_FOLDER']
+        self.interval = app.config['INGEST_FLUSH_INTERVAL']
+        self.batch_size = app.config['INGEST_BATCH_SIZE']
+        self.owner = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+
+    def submit(self, kind, values):
+        """Accept a validated submission.
+
+        Returns True when the row was inserted, False when it already existed
+        ('sync' mode), or None once it is safely journalled ('buffered' mode).
+        """
+        validate(kind, values)
+        values = dict(values, created_at=datetime.utcnow())
+        if kind == 'quote':
+            values['ingest_key'] = uuid.uuid4().hex
+
+        if self.mode != 'buffered':
+            inserted = insert_rows(kind, [values])
+            db.session.commit()
+            return inserted > 0
+
+        self._start_once()
+        record = json.dumps({'kind': kind, 'values': dict(values, created_at=values['created_at'].isoformat())})
+        with self._lock:
+            if self._journal is None:
+                self._journal = open(self._path('active'), 'a', encoding='utf-8')
+            self._journal.write(record + '\n')
+            self._journal.flush()
+            os.fsync(self._journal.fileno())
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._wake.set()
+        return None
+
+    def flush(self):
+        """Write every sealed journal (including orphans of dead processes) to the database."""
+        os.makedirs(self.folder, exist_ok=True)
+        with self._flush_lock:
+            self._seal()
+            for path in self._journals(self.owner, 'sealed'):
+                self._flush_journal(path)
+            self._replay_orphans()
+
+    def _path(self, state, sequence=None):
+        name = self.owner if sequence is None else f'{self.owner}-{sequence:06d}'
+        return os.path.join(self.folder, f'{name}.{state}.jsonl')
+
+    def _lock_path(self, owner):
+        return os.path.join(self.folder, f'{owner}.lock')
+
+    def _seal(self):
+        with self._lock:
+            if self._journal is None:
+                return
+            self._journal.close()
+            self._journal = None
+            self._pending = 0
+            os.replace(self._path('active'), self._path('sealed', next(self._sequence)))
+
+    def _journals(self, owner=None, state=None):
+        """Journal paths in append order, optionally only one owner's or one state's."""
+        journals = []
+        for name in sorted(os.listdir(self.folder)):
+            match = JOURNAL_NAME_RE.match(name)
+            if not match or (owner and match['owner'] != owner) or (state and match['state'] != state):
+                continue
+            journals.append((match['owner'], int(match['pid']), os.path.join(self.folder, name)))
+        return journals if owner is None else [path for _, _, path in journals]
+
+    def _replay_orphans(self):
+        """Replay the active and sealed journals of every process that no longer holds its owner lock."""
+        owners = {}
+        for name in os.listdir(self.folder):
+            # Lock files of owners that exited with nothing left to replay are cleaned up here too.
+            match = LOCK_NAME_RE.match(name)
+            if match and match['owner'] != self.owner:
+                owners.setdefault((match['owner'], int(match['pid'])), [])
+        for owner, pid, path in self._journals():
+            if owner != self.owner:
+                owners.setdefault((owner, pid), []).append(path)
+        for (owner, pid), paths in owners.items():
+            claim = self._claim_owner(owner, pid)
+            if claim is None:
+                continue
+            try:
+                for path in paths:
+                    self._flush_journal(path)
+                if claim is not True:
+                    # Still holding the lock, so a late replayer cannot mistake a newer file for this one.
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(self._lock_path(owner))
+            finally:
+                if claim is not True:
+                    claim.close()
+
+    def _claim_owner(self, owner, pid):
+        """Take over a dead owner's journals: its lock handle, True without flock, or None while it runs.
+
+        A process holds its owner lock from its first buffered submission until
+        it exits, and the kernel drops the lock with the process however it
+        dies, so a restarted container that reuses the pid cannot hide a
+        crashed worker's journals. Two replayers cannot both win the lock.
+        Without fcntl (Windows) the pid check below is the best available.
+        """
+        if fcntl is None:
+            return None if _process_alive(pid) else True
+        return _try_lock(self._lock_path(owner))
+
+    def _flush_journal(self, path):
+        records = {kind: [] for kind in INGEST_MODELS}
+        try:
+            journal = open(path, encoding='utf-8')
+        except FileNotFoundError:
+            return  # another worker replayed this orphan first
+        with journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn final line from a crash mid-append; it was never acknowledged
+                values = record['values']
+                values['created_at'] = datetime.fromisoformat(values['created_at'])
+                records[record['kind']].append(values)
+
+        with self.app.app_context():
+            for kind, rows in records.items():
+                for start in range(0, len(rows), self.batch_size):
+                    self._insert_batch(kind, rows[start:start + self.batch_size], path)
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+
+    def _insert_batch(self, kind, rows, path):
+        try:
+            insert_rows(kind, rows)
+            db.session.commit()
+            return
+        except (DataError, IntegrityError):
+            db.session.rollback()
+
+        # One bad row must not block the rest of the journal: retry singly and set rejects aside.
+        for row in rows:
+            try:
+                insert_rows(kind, [row])
+                db.session.commit()
+            except (DataError, IntegrityError) as exc:
+                db.session.rollback()
+                self.app.logger.error('Rejected buffered %s submission: %s', kind, exc)
+                with open(path.replace('.jsonl', '.rejected.jsonl'), 'a', encoding='utf-8') as rejected:
+                    rejected.write(json.dumps({'kind': kind, 'values': row}, default=str) + '\n')
+
+    def _start_once(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        os.makedirs(self.folder, exist_ok=True)
+        if fcntl is not None:
+            # Held until exit; other workers treat its release as this process having died.
+            self._owner_lock = _try_lock(self._lock_path(self.owner))
+        threading.Thread(target=self._loop, name='smartpest-ingest', daemon=True).start()
+        atexit.register(self._release_owner_lock)
+        atexit.register(self._flush_quietly)
+
+    def _release_owner_lock(self):
+        # Runs after the final flush; a lock file left behind is cleaned up by the next replay.
+        if self._owner_lock is None or self._journals(self.owner):
+            return
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(self._lock_path(self.owner))
+        self._owner_lock.close()
+        self._owner_lock = None
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self._flush_quietly()
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception:
+            # The journal stays on disk and is retried on the next tick.
+            self.app.logger.exception('Flushing buffered submissions failed')
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+
+from models.db_setup import ExportJob, db
+from models.queries import (
+    QUOTE_COLUMNS,
+    SUBSCRIBER_COLUMNS,
+    lead_counts,
+    lead_summary,
+    parse_lead_filters,
+    stream_quotes,
+    stream_subscribers,
+)
+
+
+JOB_KINDS = {
+    'leads_pdf': 'Leads report (PDF)',
+    'quotes_csv': 'Quote requests (CSV)',
+    'subscribers_csv': 'Newsletter subscribers (CSV)',
+    'summary': 'Summary report (PDF)',
+}
+# Form fields each kind reads; anything else is dropped so it cannot split the dedupe key.
+JOB_PARAMS = {
+    'leads_pdf': ('since', 'until'),
+    'quotes_csv': ('since', 'until'),
+    'subscribers_csv': ('since', 'until'),
+    'summary': ('period',),
+}
+SUMMARY_PERIODS = {'week': 7, 'month': 30, 'quarter': 91}
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class JobRunner:
+    """Runs lead exports and reports on a thread pool, tracked in the ExportJob table.
+
+    Jobs outlive the process: on first use the runner picks up queued jobs and
+    jobs left ``running`` for longer than JOB_STALE_SECONDS. Each job is claimed
+    with a conditional UPDATE so two workers never run it twice. Identical
+    requests share one job while it is active or its artifact is fresher than
+    JOB_DEDUPE_SECONDS. Progress is saved every JOB_PROGRESS_EVERY rows.
+    Artifacts are plain files in JOB_ARTIFACT_FOLDER, so every worker must
+    see the same folder; a job whose artifact is gone is reported as
+    unavailable and can be queued again.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._progress = {}
+        self._resumed = False
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.folder = app.config['JOB_ARTIFACT_FOLDER']
+        self.dedupe_window = timedelta(seconds=app.config['JOB_DEDUPE_SECONDS'])
+        self.stale_after = timedelta(seconds=app.config['JOB_STALE_SECONDS'])
+        self.progress_every = app.config['JOB_PROGRESS_EVERY']
+        self._executor = ThreadPoolExecutor(max_workers=app.config['JOB_WORKERS'], thread_name_prefix='smartpest-job')
+
+    def enqueue(self, kind, params=None):
+        """Queue a job, or return the matching active/fresh job if there is one."""
+        if kind not in JOB_KINDS:
+            raise ValueError(f'Unknown job kind: {kind!r}')
+        self._resume_once()
+
+        params = {key: value for key, value in sorted((params or {}).items()) if value and key in JOB_PARAMS[kind]}
+        dedupe_key = hashlib.sha1(json.dumps([kind, params]).encode('utf-8')).hexdigest()
+        existing = ExportJob.query.filter_by(dedupe_key=dedupe_key).order_by(ExportJob.id.desc()).first()
+        if existing and self._reusable(existing):
+            return existing
+
+        job = ExportJob(kind=kind, params=json.dumps(params), dedupe_key=dedupe_key)
+        db.session.add(job)
+        db.session.commit()
+        self._executor.submit(self._run, job.id)
+        return job
+
+    def get(self, job_id):
+        self._resume_once()
+        return db.session.get(ExportJob, job_id)
+
+    def recent(self, limit=20):
+        self._resume_once()
+        return ExportJob.query.order_by(ExportJob.id.desc()).limit(limit).all()
+
+    def progress(self, job):
+        """Rows processed so far: live for jobs running in this process, else the last saved count."""
+        return self._progress.get(job.id, job.progress)
+
+    def artifact_path(self, job):
+        return os.path.join(self.folder, job.artifact) if job.artifact else None
+
+    def _reusable(self, job):
+        if job.status in ACTIVE_STATUSES:
+            return True
+        if job.status != 'done' or not job.finished_at:
+            return False
+        return job.finished_at >= datetime.utcnow() - self.dedupe_window and os.path.exists(self.artifact_path(job))
+
+    def _resume_once(self):
+        with self._lock:
+            if self._resumed:
+                return
+            self._resumed = True
+
+        stale_before = datetime.utcnow() - self.stale_after
+        db.session.execute(
+            update(ExportJob)
+            .where(ExportJob.status == 'running', ExportJob.started_at < stale_before)
+            .values(status='queued', progress=0)
+        )
+        db.session.commit()
+        pending = db.session.execute(select(ExportJob.id).where(ExportJob.status == 'queued')).scalars().all()
+        for job_id in pending:
+            self._executor.submit(self._run, job_id)
+
+    def _tracked(self, job_id, rows):
+        for row in rows:
+            done = self._progress.get(job_id, 0) + 1
+            self._progress[job_id] = done
+            if done % self.progress_every == 0:
+                self._save_progress(job_id, done)
+            yield row
+
+    def _save_progress(self, job_id, done):
+        # A connection of its own: committing the job's session would close the cursor being streamed.
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(ExportJob).where(ExportJob.id == job_id, ExportJob.status == 'running').values(progress=done)
+            )
+
+    def _build(self, job):
+        from reports import csv_chunks, leads_pdf_chunks, summary_pdf_chunks
+
+        params = json.loads(job.params)
+        filters = parse_lead_filters(params)
+        if job.kind == 'leads_pdf':
+            counts = lead_counts(filters)
+            job.total = counts['quotes'] + counts['subscribers']
+            db.session.commit()
+            quotes = self._tracked(job.id, stream_quotes(filters))
+            subscribers = self._tracked(job.id, stream_subscribers(filters))
+            return 'pdf', leads_pdf_chunks(quotes, subscribers, counts['quotes'], counts['subscribers'])
+        if job.kind == 'quotes_csv':
+            return 'csv', csv_chunks(self._tracked(job.id, stream_quotes(filters)), QUOTE_COLUMNS)
+        if job.kind == 'subscribers_csv':
+            return 'csv', csv_chunks(self._tracked(job.id, stream_subscribers(filters)), SUBSCRIBER_COLUMNS)
+        days = SUMMARY_PERIODS.get(params.get('period'), SUMMARY_PERIODS['month'])
+        summary = lead_summary(datetime.utcnow() - timedelta(days=days))
+        return 'pdf', summary_pdf_chunks(summary, f'Summary Report (last {days} days)')
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            claimed = db.session.execute(
+                update(ExportJob)
+                .where(ExportJob.id == job_id, ExportJob.status == 'queued')
+                .values(status='running', started_at=datetime.utcnow(), progress=0, error=None)
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                return
+
+            job = db.session.get(ExportJob, job_id)
+            try:
+                extension, chunks = self._build(job)
+                os.makedirs(self.folder, exist_ok=True)
+                filename = f'{job.kind}-{job.id}.{extension}'
+                partial_path = os.path.join(self.folder, filename + '.part')
+                with open(partial_path, 'wb') as artifact:
+                    for chunk in chunks:
+                        artifact.write(chunk)
+                os.replace(partial_path, os.path.join(self.folder, filename))
+                job.artifact = filename
+                job.status = 'done'
+            except Exception as exc:
+                db.session.rollback()
+                job = db.session.get(ExportJob, job_id)
+                job.status = 'failed'
+                job.error = str(exc)
+                self.app.logger.exception('Job %s failed', job_id)
+            job.progress = self._progress.pop(job_id, job.progress)
+            job.finished_at = datetime.utcnow()
+            db.session.commit()
@@ -0,0 +1,280 @@
+import bisect
+import logging
+import threading
+import time
+from collections import deque
+
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+MATCH_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05)
+MAX_QUERIES_PER_REQUEST = 100
+
+logger = logging.getLogger('smartpest.slow_requests')
+
+
+class Histogram:
+    """Cumulative Prometheus-style histogram (bucket counts, sum and count)."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating inside its bucket, like histogram_quantile()."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index else 0.0
+                if index == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[index] - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def exposition(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += bucket_count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{_labels(labels, le=le)} {cumulative}')
+        lines.append(f'{name}_sum{_labels(labels)} {self.sum!r}')
+        lines.append(f'{name}_count{_labels(labels)} {self.count}')
+        return lines
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+
+class RequestStats:
+    __slots__ = ('started', 'sql_count', 'sql_seconds', 'queries', 'template_seconds', 'template_stack')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.queries = []
+        self.template_seconds = 0.0
+        self.template_stack = []
+
+
+class Metrics:
+    """Per-process request instrumentation, exported in Prometheus text format.
+
+    Records per-endpoint latency, SQL statements and time per request (from
+    engine events), template render time and chatbot match time. Streaming
+    responses are measured until their last chunk is sent. Requests slower
+    than SLOW_REQUEST_MS are logged with their slowest statements and kept
+    for the admin metrics page. Counters are per process; sum them across
+    workers in Prometheus.
+    """
+
+    def __init__(self, app=None, db=None):
+        self._lock = threading.Lock()
+        self.latency = {}
+        self.sql_queries = {}
+        self.sql_time = {}
+        self.template_time = {}
+        self.chatbot_match = {}
+        self.requests_total = {}
+        self.sql_statements_total = 0
+        self.sql_seconds_total = 0.0
+        self.slow_requests = deque(maxlen=50)
+        self.started_at = time.time()
+        if app is not None:
+            self.init_app(app, db)
+
+    def init_app(self, app, db):
+        self.slow_threshold = app.config['SLOW_REQUEST_MS'] / 1000
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        before_render_template.connect(self._before_render, app, weak=False)
+        template_rendered.connect(self._after_render, app, weak=False)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._before_cursor)
+            event.listen(db.engine, 'after_cursor_execute', self._after_cursor)
+
+    @staticmethod
+    def _current():
+        return g.get('_request_stats') if has_request_context() else None
+
+    def _before_request(self):
+        g._request_stats = RequestStats()
+
+    def _after_request(self, response):
+        stats = g.pop('_request_stats', None)
+        if stats is not None:
+            endpoint = request.endpoint or 'unmatched'
+            method = request.method
+            status = response.status_code
+            path = request.full_path.rstrip('?')
+            # Runs once the body has been sent, so streamed exports count their whole run.
+            response.call_on_close(lambda: self._finish(stats, endpoint, method, status, path))
+            g._finished_stats = stats
+        return response
+
+    def _finish(self, stats, endpoint, method, status, path):
+        elapsed = time.perf_counter() - stats.started
+        self.observe_request(endpoint, method, status, elapsed, stats.sql_count, stats.sql_seconds)
+
+        if elapsed >= self.slow_threshold:
+            slowest = sorted(stats.queries, key=lambda query: query[1], reverse=True)[:10]
+            entry = {
+                'at': time.time(),
+                'endpoint': endpoint,
+                'method': method,
+                'path': path,
+                'status': status,
+                'ms': elapsed * 1000,
+                'sql_count': stats.sql_count,
+                'sql_ms': stats.sql_seconds * 1000,
+                'template_ms': stats.template_seconds * 1000,
+                'queries': [(statement, seconds * 1000) for statement, seconds in slowest],
+            }
+            self.slow_requests.appendleft(entry)
+            logger.warning(
+                'Slow request %s %s: %.0fms, %d SQL statements in %.0fms, templates %.0fms; slowest SQL: %s',
+                method, path, entry['ms'], stats.sql_count, entry['sql_ms'], entry['template_ms'],
+                '; '.join(f'{ms:.1f}ms {statement}' for statement, ms in entry['queries'][:3]) or 'none',
+            )
+
+    def observe_request(self, endpoint, method, status, seconds, sql_count=0, sql_seconds=0.0):
+        """Count one finished request; also used for requests asgi.py answers without Flask."""
+        with self._lock:
+            self._histogram(self.latency, (('endpoint', endpoint), ('method', method)), LATENCY_BUCKETS).observe(seconds)
+            self._histogram(self.sql_queries, (('endpoint', endpoint),), QUERY_COUNT_BUCKETS).observe(sql_count)
+            self._histogram(self.sql_time, (('endpoint', endpoint),), LATENCY_BUCKETS).observe(sql_seconds)
+            key = (('endpoint', endpoint), ('method', method), ('status', str(status)))
+            self.requests_total[key] = self.requests_total.get(key, 0) + 1
+
+    def _histogram(self, family, labels, buckets):
+        histogram = family.get(labels)
+        if histogram is None:
+            histogram = family[labels] = Histogram(buckets)
+        return histogram
+
+    def _before_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+    def _after_cursor(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info['_query_started'].pop()
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.sql_statements_total += 1
+            self.sql_seconds_total += elapsed
+        stats = self._current() or (g.get('_finished_stats') if has_request_context() else None)
+        if stats is not None:
+            stats.sql_count += 1
+            stats.sql_seconds += elapsed
+            if len(stats.queries) < MAX_QUERIES_PER_REQUEST:
+                stats.queries.append((' '.join(statement.split())[:300], elapsed))
+
+    def _before_render(self, sender, template, context, **extra):
+        stats = self._current()
+        if stats is not None:
+            stats.template_stack.append(time.perf_counter())
+
+    def _after_render(self, sender, template, context, **extra):
+        stats = self._current()
+        if stats is None or not stats.template_stack:
+            return
+        elapsed = time.perf_counter() - stats.template_stack.pop()
+        if not stats.template_stack:
+            stats.template_seconds += elapsed
+        with self._lock:
+            self._histogram(self.template_time, (('template', template.name or 'string'),), LATENCY_BUCKETS).observe(elapsed)
+
+    def observe_chatbot_match(self, route, mode, seconds):
+        labels = (('route', route.split(':', 1)[0]), ('mode', mode))
+        with self._lock:
+            self._histogram(self.chatbot_match, labels, MATCH_BUCKETS).observe(seconds)
+
+    def exposition(self):
+        """All metrics in the Prometheus text exposition format."""
+        families = (
+            ('smartpest_request_duration_seconds', 'Request latency by endpoint.', self.latency),
+            ('smartpest_request_sql_statements', 'SQL statements executed per request.', self.sql_queries),
+            ('smartpest_request_sql_seconds', 'Time spent in SQL per request.', self.sql_time),
+            ('smartpest_template_render_seconds', 'Template render time.', self.template_time),
+            ('smartpest_chatbot_match_seconds', 'Helpdesk chatbot matching time (cache misses).', self.chatbot_match),
+        )
+        lines = []
+        with self._lock:
+            for name, help_text, family in families:
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for labels, histogram in sorted(family.items()):
+                    lines += histogram.exposition(name, labels)
+            lines += ['# HELP smartpest_requests_total Requests by endpoint and status.', '# TYPE smartpest_requests_total counter']
+            for labels, count in sorted(self.requests_total.items()):
+                lines.append(f'smartpest_requests_total{_labels(labels)} {count}')
+            lines += [
+                '# HELP smartpest_sql_statements_total SQL statements, including background jobs.',
+                '# TYPE smartpest_sql_statements_total counter',
+                f'smartpest_sql_statements_total {self.sql_statements_total}',
+                '# HELP smartpest_sql_seconds_total Time spent in SQL, including background jobs.',
+                '# TYPE smartpest_sql_seconds_total counter',
+                f'smartpest_sql_seconds_total {self.sql_seconds_total!r}',
+            ]
+        return '\n'.join(lines) + '\n'
+
+    def endpoint_summary(self):
+        """Rows for the admin page: request count, latency percentiles and SQL averages per endpoint."""
+        rows = []
+        with self._lock:
+            for labels, histogram in self.latency.items():
+                endpoint = dict(labels)['endpoint']
+                sql_count = self.sql_queries.get((('endpoint', endpoint),))
+                sql_time = self.sql_time.get((('endpoint', endpoint),))
+                rows.append({
+                    'endpoint': endpoint,
+                    'method': dict(labels)['method'],
+                    'count': histogram.count,
+                    'p50_ms': histogram.quantile(0.5) * 1000,
+                    'p95_ms': histogram.quantile(0.95) * 1000,
+                    'p99_ms': histogram.quantile(0.99) * 1000,
+                    'mean_ms': histogram.sum / histogram.count * 1000,
+                    'sql_per_request': sql_count.sum / sql_count.count if sql_count and sql_count.count else 0,
+                    'sql_ms_per_request': sql_time.sum / sql_time.count * 1000 if sql_time and sql_time.count else 0,
+                })
+        return sorted(rows, key=lambda row: row['mean_ms'] * row['count'], reverse=True)
+
+    def template_summary(self):
+        with self._lock:
+            return sorted(
+                (
+                    {'template': dict(labels)['template'], 'count': histogram.count,
+                     'mean_ms': histogram.sum / histogram.count * 1000, 'p95_ms': histogram.quantile(0.95) * 1000}
+                    for labels, histogram in self.template_time.items()
+                ),
+                key=lambda row: row['mean_ms'] * row['count'], reverse=True,
+            )
+
+    def chatbot_summary(self):
+        with self._lock:
+            return sorted(
+                (
+                    {**dict(labels), 'count': histogram.count,
+                     'mean_ms': histogram.sum / histogram.count * 1000, 'p99_ms': histogram.quantile(0.99) * 1000}
+                    for labels, histogram in self.chatbot_match.items()
+                ),
+                key=lambda row: row['count'], reverse=True,
+            )
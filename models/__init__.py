@@ -1,4 +1,44 @@
-﻿from .db_setup import NewsletterSubscriber, Product, QuoteRequest, Service, User, db
-
-__all__ = ['db', 'User', 'Product', 'Service', 'QuoteRequest', 'NewsletterSubscriber']
+﻿from .db_setup import (
+    ChatbotEvent,
+    ChatbotRollup,
+    ExportJob,
+    NewsletterSubscriber,
+    Product,
+    QuoteRequest,
+    Service,
+    User,
+    db,
+    ensure_columns,
+    ensure_indexes,
+)
+from .queries import (
+    LEAD_FILTER_ARGS,
+    QUOTE_COLUMNS,
+    SUBSCRIBER_COLUMNS,
+    dashboard_counts,
+    decode_cursor,
+    encode_cursor,
+    keyset_page,
+    lead_counts,
+    lead_summary,
+    parse_lead_filters,
+    product_table_page,
+    quote_page,
+    recent_quotes,
+    service_table_page,
+    stream_quotes,
+    stream_subscribers,
+    subscriber_page,
+)
+from .search import SEARCH_FIELDS, ensure_search_indexes, matches, search_catalogue, search_terms
 
+__all__ = [
+    'db', 'User', 'Product', 'Service', 'QuoteRequest', 'NewsletterSubscriber', 'ExportJob',
+    'ChatbotEvent', 'ChatbotRollup',
+    'ensure_columns', 'ensure_indexes',
+    'dashboard_counts', 'recent_quotes', 'product_table_page', 'service_table_page',
+    'keyset_page', 'encode_cursor', 'decode_cursor',
+    'LEAD_FILTER_ARGS', 'parse_lead_filters', 'quote_page', 'subscriber_page',
+    'stream_quotes', 'stream_subscribers', 'QUOTE_COLUMNS', 'SUBSCRIBER_COLUMNS', 'lead_counts', 'lead_summary',
+    'SEARCH_FIELDS', 'ensure_search_indexes', 'matches', 'search_catalogue', 'search_terms',
+]
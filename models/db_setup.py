@@ -2,11 +2,38 @@
 
 from flask_login import UserMixin
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import String
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.sql.functions import FunctionElement
 
 
 db = SQLAlchemy()
 
 
+class bytewise_lower(FunctionElement):
+    """``lower(value)`` compared byte by byte, so a range on it means "starts with".
+
+    SQLite compares text with BINARY by default. Postgres uses the database
+    collation, which under en_US.UTF-8 or ICU skips spaces and punctuation at
+    the first level ("m-b" sorts between "ma" and "mb"), so there the
+    expression carries COLLATE "C", in queries and in the index alike.
+    """
+    type = String()
+    name = 'bytewise_lower'
+    inherit_cache = True
+
+
+@compiles(bytewise_lower)
+def _compile_bytewise_lower(element, compiler, **kw):
+    return f'lower({compiler.process(element.clauses, **kw)})'
+
+
+@compiles(bytewise_lower, 'postgresql')
+def _compile_bytewise_lower_postgresql(element, compiler, **kw):
+    return f'lower({compiler.process(element.clauses, **kw)}) COLLATE "C"'
+
+
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
@@ -20,6 +47,9 @@ class Product(db.Model):
     description = db.Column(db.Text, nullable=True)
     price = db.Column(db.Float, nullable=True)
     image = db.Column(db.String(255), nullable=True)
+    image_width = db.Column(db.Integer, nullable=True)
+    image_height = db.Column(db.Integer, nullable=True)
+    image_hash = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
@@ -28,10 +58,22 @@ class Service(db.Model):
     name = db.Column(db.String(120), nullable=False)
     description = db.Column(db.Text, nullable=True)
     image = db.Column(db.String(255), nullable=True)
+    image_width = db.Column(db.Integer, nullable=True)
+    image_height = db.Column(db.Integer, nullable=True)
+    image_hash = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
 class QuoteRequest(db.Model):
+    # Keyset pagination seeks on (created_at, id), optionally behind an equality filter.
+    __table_args__ = (
+        db.Index('ix_quote_request_created_id', 'created_at', 'id'),
+        db.Index('ix_quote_request_service_created_id', 'service_type', 'created_at', 'id'),
+        db.Index('ix_quote_request_property_created_id', 'property_type', 'created_at', 'id'),
+        # Buffered submissions carry a unique key so a replayed journal never duplicates a quote.
+        db.Index('ux_quote_request_ingest_key', 'ingest_key', unique=True),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(120), nullable=False)
     phone = db.Column(db.String(30), nullable=False)
@@ -40,10 +82,101 @@ class QuoteRequest(db.Model):
     property_type = db.Column(db.String(40), nullable=False)
     service_type = db.Column(db.String(80), nullable=False)
     message = db.Column(db.Text, nullable=True)
+    ingest_key = db.Column(db.String(32), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
 
+# The location filter is a case-insensitive prefix, matched as a range on bytewise_lower(location)
+# (see models/queries.py), so only an index on that expression can serve it.
+db.Index('ix_quote_request_location_bytes_created_id', bytewise_lower(QuoteRequest.location), QuoteRequest.created_at, QuoteRequest.id)
+
+# Superseded indexes that only cost writes; dropped by ensure_indexes().
+OBSOLETE_INDEXES = ('ix_quote_request_location_created_id', 'ix_quote_request_location_lower_created_id')
+
+
 class NewsletterSubscriber(db.Model):
+    __table_args__ = (
+        db.Index('ix_newsletter_subscriber_created_id', 'created_at', 'id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class ExportJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(40), nullable=False)
+    params = db.Column(db.Text, nullable=False, default='{}')
+    dedupe_key = db.Column(db.String(64), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    total = db.Column(db.Integer, nullable=True)
+    artifact = db.Column(db.String(255), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+
+class ChatbotEvent(db.Model):
+    # Append-only log of helpdesk chatbot messages, written in batches by chatbot_analytics.py.
+    __table_args__ = (
+        db.Index('ix_chatbot_event_created_id', 'created_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    route = db.Column(db.String(120), nullable=False)
+    # Scorer of the winning rule ('keywords', 'bm25' or 'fuzzy'); empty for fixed replies and the fallback.
+    matched_by = db.Column(db.String(20), nullable=True)
+    mode = db.Column(db.String(20), nullable=False)
+    latency_us = db.Column(db.Integer, nullable=False)
+    message = db.Column(db.String(500), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+
+
+class ChatbotRollup(db.Model):
+    # One row per UTC day; payload is the JSON summary built by chatbot_analytics.rollup_day().
+    day = db.Column(db.Date, primary_key=True)
+    events = db.Column(db.Integer, nullable=False, default=0)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    computed_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+def ensure_columns():
+    """Add nullable model columns missing from tables that predate them.
+
+    ``db.create_all()`` never alters existing tables, and the app has no
+    migration tool, so new optional columns are added here on startup.
+    """
+    inspector = db.inspect(db.engine)
+    existing_tables = set(inspector.get_table_names())
+    with db.engine.begin() as connection:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            present = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in present or not column.nullable:
+                    continue
+                column_type = column.type.compile(dialect=db.engine.dialect)
+                connection.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def ensure_indexes():
+    """Create model indexes missing from tables that predate them.
+
+    ``db.create_all()`` only adds indexes when it creates the table itself.
+    Indexes listed in OBSOLETE_INDEXES are dropped.
+    """
+    # Reflection skips expression indexes on SQLite, so checkfirst would recreate them every time.
+    if_not_exists = db.engine.dialect.name in ('sqlite', 'postgresql')
+    with db.engine.begin() as connection:
+        for name in OBSOLETE_INDEXES:
+            connection.execute(db.text(f'DROP INDEX IF EXISTS {name}'))
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                if if_not_exists:
+                    connection.execute(CreateIndex(index, if_not_exists=True))
+                else:
+                    index.create(connection, checkfirst=True)
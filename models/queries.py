@@ -0,0 +1,255 @@
+import base64
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import false, func, select, tuple_
+
+from .db_setup import NewsletterSubscriber, Product, QuoteRequest, Service, bytewise_lower, db
+from .search import matches
+
+
+def encode_cursor(row):
+    """Opaque keyset cursor for a row ordered by ``created_at, id``."""
+    raw = f'{row.created_at.isoformat()}|{row.id}'
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` for a cursor, or None when it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        created_raw, id_raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('|')
+        return datetime.fromisoformat(created_raw), int(id_raw)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def keyset_page(statement, model, cursor=None, per_page=20):
+    """Run ``statement`` newest first, starting after ``cursor``.
+
+    Seeks on ``(created_at, id)`` instead of using OFFSET, so every page costs
+    the same. Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the
+    last page.
+    """
+    position = decode_cursor(cursor)
+    if position:
+        statement = statement.where(tuple_(model.created_at, model.id) < position)
+    statement = statement.order_by(model.created_at.desc(), model.id.desc()).limit(per_page + 1)
+    rows = db.session.execute(statement).all()
+    next_cursor = encode_cursor(rows[per_page - 1]) if len(rows) > per_page else None
+    return rows[:per_page], next_cursor
+
+
+def dashboard_counts():
+    """Count products, services, quotes and subscribers in a single round-trip."""
+    row = db.session.execute(
+        select(
+            select(func.count()).select_from(Product).scalar_subquery().label('products'),
+            select(func.count()).select_from(Service).scalar_subquery().label('services'),
+            select(func.count()).select_from(QuoteRequest).scalar_subquery().label('quotes'),
+            select(func.count()).select_from(NewsletterSubscriber).scalar_subquery().label('subscribers'),
+        )
+    ).one()
+    return row._asdict()
+
+
+def recent_quotes(limit=8):
+    statement = (
+        select(
+            QuoteRequest.full_name,
+            QuoteRequest.phone,
+            QuoteRequest.location,
+            QuoteRequest.service_type,
+            QuoteRequest.created_at,
+        )
+        .order_by(QuoteRequest.created_at.desc(), QuoteRequest.id.desc())
+        .limit(limit)
+    )
+    return db.session.execute(statement).all()
+
+
+def product_table_page(cursor=None, per_page=20):
+    statement = select(Product.id, Product.name, Product.price, Product.created_at)
+    return keyset_page(statement, Product, cursor, per_page)
+
+
+def service_table_page(cursor=None, per_page=20):
+    statement = select(Service.id, Service.name, Service.created_at)
+    return keyset_page(statement, Service, cursor, per_page)
+
+
+QUOTE_FILTER_FIELDS = ('service_type', 'property_type', 'location')
+LEAD_FILTER_ARGS = ('q',) + QUOTE_FILTER_FIELDS + ('since', 'until')
+
+QUOTE_COLUMNS = (
+    QuoteRequest.id,
+    QuoteRequest.full_name,
+    QuoteRequest.phone,
+    QuoteRequest.email,
+    QuoteRequest.location,
+    QuoteRequest.property_type,
+    QuoteRequest.service_type,
+    QuoteRequest.message,
+    QuoteRequest.created_at,
+)
+SUBSCRIBER_COLUMNS = (NewsletterSubscriber.id, NewsletterSubscriber.email, NewsletterSubscriber.created_at)
+
+
+def parse_lead_filters(args):
+    """Pick the lead filters out of request args, dropping blanks and bad dates.
+
+    ``q`` is a full-text query (see models/search.py). ``since``/``until``
+    take a date (whole days, both inclusive) or an ISO timestamp (``since``
+    inclusive, ``until`` exclusive) for incremental syncs.
+    """
+    filters = {}
+    for field in ('q',) + QUOTE_FILTER_FIELDS:
+        value = (args.get(field) or '').strip()
+        if value:
+            filters[field] = value
+    for field in ('since', 'until'):
+        value = (args.get(field) or '').strip()
+        if value:
+            try:
+                filters[field] = date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+            except ValueError:
+                continue
+    return filters
+
+
+def _filter_subscribers(statement, filters):
+    if 'q' in filters:
+        pattern = filters['q'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        statement = statement.where(NewsletterSubscriber.email.ilike(f'%{pattern}%', escape='\\'))
+    return _within_dates(statement, NewsletterSubscriber, filters)
+
+
+def _within_dates(statement, model, filters):
+    since = filters.get('since')
+    until = filters.get('until')
+    if since is not None:
+        if not isinstance(since, datetime):
+            since = datetime.combine(since, time.min)
+        statement = statement.where(model.created_at >= since)
+    if until is not None:
+        if not isinstance(until, datetime):
+            until = datetime.combine(until + timedelta(days=1), time.min)
+        statement = statement.where(model.created_at < until)
+    return statement
+
+
+def _location_prefix(prefix):
+    """Case-insensitive "starts with" predicates for the location filter.
+
+    ASCII prefixes become a range on bytewise_lower(location), which the
+    ix_quote_request_location_bytes_created_id expression index serves
+    (ILIKE compiles to lower(location) LIKE ..., which no index can). The
+    range only means "starts with" under byte-order comparison, hence
+    bytewise_lower. SQLite's lower() only folds ASCII, so other prefixes keep
+    the unindexed ILIKE.
+    """
+    if prefix.isascii():
+        lowered = prefix.lower()
+        upper = lowered[:-1] + chr(ord(lowered[-1]) + 1)
+        location = bytewise_lower(QuoteRequest.location)
+        return (location >= lowered, location < upper)
+    pattern = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return (QuoteRequest.location.ilike(f'{pattern}%', escape='\\'),)
+
+
+def _filter_quotes(statement, filters):
+    if 'q' in filters:
+        found = matches(QuoteRequest.__tablename__, filters['q'], ranked=False)
+        # On SQLite, "id + 0" keeps the planner from looking up and sorting every match;
+        # it walks the recency index instead and stops after one page.
+        column = QuoteRequest.id + 0 if db.engine.dialect.name == 'sqlite' else QuoteRequest.id
+        statement = statement.where(column.in_(select(found.c.id)) if found is not None else false())
+    if 'service_type' in filters:
+        statement = statement.where(QuoteRequest.service_type == filters['service_type'])
+    if 'property_type' in filters:
+        statement = statement.where(QuoteRequest.property_type == filters['property_type'])
+    if 'location' in filters:
+        statement = statement.where(*_location_prefix(filters['location']))
+    return _within_dates(statement, QuoteRequest, filters)
+
+
+def quote_page(filters=None, cursor=None, per_page=50):
+    """One keyset page of quote requests matching ``filters`` (see parse_lead_filters).
+
+    ``q`` searches name, phone, location and message; service and property
+    types match exactly; location matches as a prefix.
+    """
+    statement = _filter_quotes(select(*QUOTE_COLUMNS), filters or {})
+    return keyset_page(statement, QuoteRequest, cursor, per_page)
+
+
+def subscriber_page(filters=None, cursor=None, per_page=50):
+    """One keyset page of newsletter subscribers; ``q`` matches within the email, plus the date range."""
+    statement = _filter_subscribers(select(*SUBSCRIBER_COLUMNS), filters or {})
+    return keyset_page(statement, NewsletterSubscriber, cursor, per_page)
+
+
+def _stream(statement, batch_size):
+    # yield_per fetches in batches (a server-side cursor on Postgres) instead of
+    # materializing the whole result.
+    result = db.session.execute(statement.execution_options(yield_per=batch_size))
+    for partition in result.partitions():
+        yield from partition
+
+
+def stream_quotes(filters=None, batch_size=1000):
+    """Iterate every quote request matching ``filters``, newest first, in constant memory."""
+    statement = _filter_quotes(select(*QUOTE_COLUMNS), filters or {})
+    statement = statement.order_by(QuoteRequest.created_at.desc(), QuoteRequest.id.desc())
+    return _stream(statement, batch_size)
+
+
+def stream_subscribers(filters=None, batch_size=1000):
+    """Iterate every newsletter subscriber, newest first, in constant memory."""
+    statement = _filter_subscribers(select(*SUBSCRIBER_COLUMNS), filters or {})
+    statement = statement.order_by(NewsletterSubscriber.created_at.desc(), NewsletterSubscriber.id.desc())
+    return _stream(statement, batch_size)
+
+
+def lead_counts(filters=None):
+    """Quote and subscriber totals matching ``filters``, in a single round-trip."""
+    filters = filters or {}
+    quotes = _filter_quotes(select(func.count()).select_from(QuoteRequest), filters)
+    subscribers = _filter_subscribers(select(func.count()).select_from(NewsletterSubscriber), filters)
+    row = db.session.execute(
+        select(quotes.scalar_subquery().label('quotes'), subscribers.scalar_subquery().label('subscribers'))
+    ).one()
+    return row._asdict()
+
+
+def lead_summary(since):
+    """Grouped quote counts and new-subscriber totals for leads created since ``since``."""
+    def grouped(column, limit=None):
+        statement = (
+            select(column, func.count())
+            .where(QuoteRequest.created_at >= since)
+            .group_by(column)
+            .order_by(func.count().desc(), column)
+        )
+        if limit:
+            statement = statement.limit(limit)
+        return db.session.execute(statement).all()
+
+    day = func.date(QuoteRequest.created_at)
+    daily = db.session.execute(
+        select(day, func.count()).where(QuoteRequest.created_at >= since).group_by(day).order_by(day)
+    ).all()
+    totals = db.session.execute(
+        select(
+            select(func.count()).select_from(QuoteRequest).where(QuoteRequest.created_at >= since).scalar_subquery(),
+            select(func.count()).select_from(NewsletterSubscriber).where(NewsletterSubscriber.created_at >= since).scalar_subquery(),
+        )
+    ).one()
+    return {
+        'quotes': totals[0],
+        'subscribers': totals[1],
+        'by_service': grouped(QuoteRequest.service_type),
+        'by_property': grouped(QuoteRequest.property_type),
+        'top_locations': grouped(QuoteRequest.location, limit=10),
+        'daily': daily,
+    }
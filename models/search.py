@@ -0,0 +1,145 @@
+import re
+
+from sqlalchemy import Float, Integer, and_, or_, select, text
+from sqlalchemy.exc import OperationalError
+
+from .db_setup import Product, QuoteRequest, Service, db
+
+
+# Searchable columns per table, with their relevance weight (highest first).
+SEARCH_FIELDS = {
+    Product.__tablename__: (('name', 'A', 10.0), ('description', 'B', 1.0)),
+    Service.__tablename__: (('name', 'A', 10.0), ('description', 'B', 1.0)),
+    QuoteRequest.__tablename__: (
+        ('full_name', 'A', 10.0),
+        ('phone', 'A', 10.0),
+        ('location', 'B', 5.0),
+        ('message', 'C', 1.0),
+    ),
+}
+SEARCH_MODELS = {Product.__tablename__: Product, Service.__tablename__: Service, QuoteRequest.__tablename__: QuoteRequest}
+MAX_TERMS = 8
+
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+_fts5_ready = {}
+
+
+def search_terms(query):
+    """Lower-cased word tokens of a user query, capped at MAX_TERMS."""
+    return _TERM_RE.findall((query or '').lower())[:MAX_TERMS]
+
+
+def _sqlite_ddl(table, columns):
+    names = ', '.join(column for column, _, _ in columns)
+    new_values = ', '.join(f'new.{column}' for column, _, _ in columns)
+    old_values = ', '.join(f'old.{column}' for column, _, _ in columns)
+    fts = f'{table}_fts'
+    delete = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.id, {old_values});"
+    insert = f'INSERT INTO {fts}(rowid, {names}) VALUES (new.id, {new_values});'
+    return [
+        f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content='{table}', content_rowid='id', "
+        f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_insert AFTER INSERT ON {table} BEGIN {insert} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_delete AFTER DELETE ON {table} BEGIN {delete} END',
+        f'CREATE TRIGGER IF NOT EXISTS {fts}_update AFTER UPDATE OF {names} ON {table} BEGIN {delete} {insert} END',
+        f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",
+    ]
+
+
+def _postgres_ddl(table, columns):
+    vector = ' || '.join(
+        f"setweight(to_tsvector('simple', coalesce({column}, '')), '{weight}')" for column, weight, _ in columns
+    )
+    return [
+        f'ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED',
+        f'CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} USING gin (search_vector)',
+    ]
+
+
+def ensure_search_indexes():
+    """Create the full-text indexes for the current backend. Safe to repeat.
+
+    SQLite gets FTS5 tables kept current by triggers; Postgres gets a
+    generated, GIN-indexed ``search_vector`` column. Either way the database
+    maintains the index on every write, including bulk and buffered inserts.
+    Other backends, and SQLite builds without FTS5, fall back to LIKE scans;
+    returns False in that case so the caller can say so.
+    """
+    dialect = db.engine.dialect.name
+    if dialect not in ('sqlite', 'postgresql'):
+        return False
+    inspector = db.inspect(db.engine)
+    existing = set(inspector.get_table_names())
+    try:
+        for table, columns in SEARCH_FIELDS.items():
+            if dialect == 'postgresql':
+                statements = _postgres_ddl(table, columns)
+            elif f'{table}_fts' in existing:
+                continue
+            else:
+                statements = _sqlite_ddl(table, columns)
+            with db.engine.begin() as connection:
+                for statement in statements:
+                    connection.execute(text(statement))
+    except OperationalError:
+        if dialect != 'sqlite':
+            raise
+        # "no such module: fts5": matches() finds no _fts table and uses LIKE instead.
+        return False
+    finally:
+        _fts5_ready.clear()
+    return True
+
+
+def _has_fts5(table):
+    key = (db.engine.url, table)
+    if key not in _fts5_ready:
+        try:
+            found = db.session.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': f'{table}_fts'}
+            ).first()
+        except OperationalError:
+            found = None
+        _fts5_ready[key] = found is not None
+    return _fts5_ready[key]
+
+
+def matches(table, query, ranked=True):
+    """Subquery of ``(id, rank)`` for rows of ``table`` matching every term of ``query``.
+
+    Terms match as prefixes, so "mas" finds "Maseru". A lower rank is a
+    better match; pass ``ranked=False`` when only the ids are needed, which
+    skips scoring. Returns None when the query has no searchable terms.
+    """
+    terms = search_terms(query)
+    if not terms:
+        return None
+    columns = SEARCH_FIELDS[table]
+    dialect = db.engine.dialect.name
+
+    if dialect == 'sqlite' and _has_fts5(table):
+        weights = ', '.join(str(weight) for _, _, weight in columns)
+        rank = f'bm25({table}_fts, {weights})' if ranked else '0'
+        statement = text(
+            f'SELECT rowid AS id, {rank} AS rank FROM {table}_fts WHERE {table}_fts MATCH :query'
+        ).bindparams(query=' '.join(f'"{term}"*' for term in terms))
+    elif dialect == 'postgresql':
+        rank = "-ts_rank(search_vector, to_tsquery('simple', :query))" if ranked else '0'
+        statement = text(
+            f"SELECT id, {rank} AS rank FROM {table} WHERE search_vector @@ to_tsquery('simple', :query)"
+        ).bindparams(query=' & '.join(f'{term}:*' for term in terms))
+    else:
+        model = SEARCH_MODELS[table]
+        fields = [getattr(model, column) for column, _, _ in columns]
+        condition = and_(*(or_(*(field.ilike(f'%{term}%') for field in fields)) for term in terms))
+        return select(model.id.label('id'), model.id.label('rank')).where(condition).subquery()
+    return statement.columns(id=Integer, rank=Float).subquery()
+
+
+def search_catalogue(model, query, limit=24):
+    """Products or services matching ``query``, best match first."""
+    found = matches(model.__tablename__, query)
+    if found is None:
+        return []
+    statement = select(model).join(found, found.c.id == model.id).order_by(found.c.rank, model.id.desc()).limit(limit)
+    return db.session.execute(statement).scalars().all()
@@ -0,0 +1,55 @@
+import threading
+import time
+
+
+class PageCache:
+    """In-process cache of rendered HTML for public pages and page fragments.
+
+    Catalogue entries are tagged with the current catalogue generation and a
+    TTL: an admin edit invalidates them immediately on this instance and other
+    serverless instances pick it up once the TTL lapses. Static entries are
+    rendered once and kept for the lifetime of the deploy.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.generation = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            html, generation, expires_at = entry
+            if generation is not None and (generation != self.generation or expires_at <= time.monotonic()):
+                del self._entries[key]
+                return None
+            return html
+
+    def set(self, key, html, static=False):
+        with self._lock:
+            if static:
+                self._entries[key] = (html, None, None)
+            else:
+                self._entries[key] = (html, self.generation, time.monotonic() + self.ttl)
+
+    def get_or_render(self, key, render, static=False):
+        html = self.get(key)
+        if html is None:
+            html = render()
+            self.set(key, html, static)
+        return html
+
+    def invalidate_catalogue(self):
+        """Drop every catalogue page and fragment; static pages are kept."""
+        with self._lock:
+            self.generation += 1
+            self._entries = {key: entry for key, entry in self._entries.items() if entry[1] is None}
+
+    def clear(self):
+        """Drop every entry, static pages included."""
+        with self._lock:
+            self.generation += 1
+            self._entries = {}
@@ -0,0 +1,116 @@
+import zlib
+from array import array
+
+
+A4 = (595.2756, 841.8898)
+
+_FONTS = {'Helvetica': 'F1', 'Helvetica-Bold': 'F2'}
+_CATALOG_ID = 1
+_PAGES_ID = 2
+_FONT_IDS = {'F1': 3, 'F2': 4}
+_FIRST_FREE_ID = 5
+# Cross-reference lines per chunk yielded by finish().
+XREF_BATCH = 1000
+
+
+def _pdf_string(text):
+    raw = text.replace('\r', ' ').replace('\n', ' ').encode('cp1252', errors='replace')
+    return b'(' + raw.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)') + b')'
+
+
+class StreamingPdf:
+    """Text-only PDF writer that hands back each page as soon as it is finished.
+
+    Between pages only the byte offset of each object is retained, packed 8
+    bytes per object for the cross-reference table the format requires, and
+    finish() writes that table out in chunks. Page ids are not stored: every
+    page is a content object followed by its page object, so they are every
+    second id from _FIRST_FREE_ID + 1. The drawing calls mirror the small
+    part of reportlab's canvas API the reports use.
+
+    Usage: ``yield pdf.begin()``, draw, ``yield pdf.show_page()`` per page,
+    then ``yield from pdf.finish()``.
+    """
+
+    def __init__(self, pagesize=A4):
+        self.width, self.height = pagesize
+        self._offsets = array('Q', [0] * _FIRST_FREE_ID)
+        self._position = 0
+        self._next_id = _FIRST_FREE_ID
+        self._page_count = 0
+        self._ops = []
+        self._font = ('F1', 12)
+
+    def _object(self, object_id, body):
+        self._offsets[object_id] = self._position
+        data = b'%d 0 obj\n' % object_id + body + b'\nendobj\n'
+        self._position += len(data)
+        return data
+
+    def _allocate(self):
+        object_id = self._next_id
+        self._next_id += 1
+        self._offsets.append(0)
+        return object_id
+
+    def begin(self):
+        data = b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n'
+        self._position += len(data)
+        return data
+
+    def setFont(self, name, size):
+        self._font = (_FONTS[name], size)
+
+    def drawString(self, x, y, text):
+        font, size = self._font
+        self._ops.append(b'BT /%s %g Tf %.2f %.2f Td %s Tj ET' % (font.encode(), size, x, y, _pdf_string(text)))
+
+    def line(self, x1, y1, x2, y2):
+        self._ops.append(b'%.2f %.2f m %.2f %.2f l S' % (x1, y1, x2, y2))
+
+    def show_page(self):
+        """Close the current page and return its bytes."""
+        content = zlib.compress(b'\n'.join(self._ops))
+        self._ops = []
+        content_id = self._allocate()
+        page_id = self._allocate()
+        self._page_count += 1
+        stream = b'<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(content) + content + b'\nendstream'
+        page = (
+            b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %.4f %.4f] '
+            b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> /Contents %d 0 R >>'
+            % (_PAGES_ID, self.width, self.height, _FONT_IDS['F1'], _FONT_IDS['F2'], content_id)
+        )
+        return self._object(content_id, stream) + self._object(page_id, page)
+
+    def finish(self):
+        """Yield the closing bytes: any pending page, page tree, catalog and xref."""
+        if self._ops or not self._page_count:
+            yield self.show_page()
+        data = b''
+        for name, font in (('Helvetica', 'F1'), ('Helvetica-Bold', 'F2')):
+            data += self._object(
+                _FONT_IDS[font],
+                b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % name.encode(),
+            )
+        yield data
+
+        page_ids = range(_FIRST_FREE_ID + 1, self._next_id, 2)
+        head = b'%d 0 obj\n<< /Type /Pages /Kids [' % _PAGES_ID
+        self._offsets[_PAGES_ID] = self._position
+        self._position += len(head)
+        yield head
+        for start in range(0, len(page_ids), XREF_BATCH):
+            kids = b''.join(b'%d 0 R ' % page_id for page_id in page_ids[start:start + XREF_BATCH])
+            self._position += len(kids)
+            yield kids
+        tail = b'] /Count %d >>\nendobj\n' % self._page_count
+        self._position += len(tail)
+        yield tail + self._object(_CATALOG_ID, b'<< /Type /Catalog /Pages %d 0 R >>' % _PAGES_ID)
+
+        xref_offset = self._position
+        yield b'xref\n0 %d\n0000000000 65535 f \n' % self._next_id
+        for start in range(1, self._next_id, XREF_BATCH):
+            stop = min(start + XREF_BATCH, self._next_id)
+            yield b''.join(b'%010d 00000 n \n' % self._offsets[object_id] for object_id in range(start, stop))
+        yield b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (self._next_id, _CATALOG_ID, xref_offset)
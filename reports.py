@@ -0,0 +1,228 @@
+import csv
+import io
+import json
+from datetime import datetime
+
+from pdf_stream import A4, StreamingPdf
+
+
+def _continued_page(pdf, left, height):
+    y = height - 40
+    pdf.setFont('Helvetica-Bold', 14)
+    pdf.drawString(left, y, 'Smart Pest Solutions - Leads Report (continued)')
+    pdf.setFont('Helvetica', 9)
+    return y - 24
+
+
+def leads_pdf_chunks(quotes, subscribers, quote_count, subscriber_count, generated_at=None):
+    """Yield the leads report PDF page by page.
+
+    ``quotes`` and ``subscribers`` are iterables of rows (see
+    ``models.queries.stream_quotes``); they are consumed once, so the report
+    never holds more than one page of leads in memory.
+    """
+    pdf = StreamingPdf(pagesize=A4)
+    width, height = A4
+    left = 40
+    y = height - 40
+    generated_at = generated_at or datetime.now()
+
+    yield pdf.begin()
+    pdf.setFont('Helvetica-Bold', 16)
+    pdf.drawString(left, y, 'Smart Pest Solutions - Leads Report')
+    y -= 18
+    pdf.setFont('Helvetica', 9)
+    pdf.drawString(left, y, f'Generated: {generated_at.strftime("%Y-%m-%d %H:%M")}')
+    y -= 22
+
+    pdf.setFont('Helvetica-Bold', 12)
+    pdf.drawString(left, y, f'Quote Requests ({quote_count})')
+    y -= 16
+    pdf.setFont('Helvetica', 9)
+    pdf.drawString(left, y, 'Date | Name | Phone | Location | Service')
+    y -= 12
+    pdf.line(left, y, width - left, y)
+    y -= 10
+
+    for quote in quotes:
+        date_txt = quote.created_at.strftime('%Y-%m-%d')
+        lines = [(left, f"{date_txt} | {quote.full_name[:20]} | {quote.phone[:16]} | {quote.location[:18]} | {quote.service_type[:22]}")]
+        if quote.email:
+            lines.append((left + 14, f'Email: {quote.email[:55]}'))
+        if quote.message:
+            lines.append((left + 14, f"Note: {quote.message.replace(chr(10), ' ')[:90]}"))
+        for x, text in lines:
+            if y < 60:
+                yield pdf.show_page()
+                y = _continued_page(pdf, left, height)
+            pdf.drawString(x, y, text)
+            y -= 12
+        y -= 4
+
+    if y < 90:
+        yield pdf.show_page()
+        y = _continued_page(pdf, left, height)
+    y -= 8
+    pdf.setFont('Helvetica-Bold', 12)
+    pdf.drawString(left, y, f'Newsletter Subscribers ({subscriber_count})')
+    y -= 16
+    pdf.setFont('Helvetica', 9)
+    pdf.drawString(left, y, 'Date | Email')
+    y -= 12
+    pdf.line(left, y, width - left, y)
+    y -= 10
+
+    for subscriber in subscribers:
+        if y < 60:
+            yield pdf.show_page()
+            y = _continued_page(pdf, left, height)
+        date_txt = subscriber.created_at.strftime('%Y-%m-%d')
+        pdf.drawString(left, y, f'{date_txt} | {subscriber.email[:70]}')
+        y -= 12
+
+    yield from pdf.finish()
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _batched(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_chunks(rows, columns, batch_size=500):
+    """Yield a UTF-8 CSV export of ``rows``, one batch of lines per chunk."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([column.key for column in columns])
+    for batch in _batched(rows, batch_size):
+        writer.writerows([_plain(value) for value in row] for row in batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def ndjson_chunks(rows, columns, batch_size=500):
+    """Yield one JSON object per row, newline-delimited."""
+    keys = [column.key for column in columns]
+    for batch in _batched(rows, batch_size):
+        lines = (json.dumps(dict(zip(keys, map(_plain, row))), ensure_ascii=False) for row in batch)
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands buffered bytes out on ``drain()``.
+
+    It keeps counting the bytes written so ``tell()`` stays correct for the
+    Parquet footer offsets after earlier bytes were drained.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def parquet_chunks(rows, columns, batch_size=10000):
+    """Return a generator yielding a Parquet file, one row group per chunk.
+
+    Needs pyarrow, which is optional: ImportError is raised here, before any
+    bytes are produced, when it is missing.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    def arrow_type(column):
+        python_type = column.type.python_type
+        if python_type is int:
+            return pa.int64()
+        if python_type is float:
+            return pa.float64()
+        if python_type is datetime:
+            return pa.timestamp('us')
+        return pa.string()
+
+    schema = pa.schema([(column.key, arrow_type(column)) for column in columns])
+
+    def generate():
+        sink = _ChunkSink()
+        with pq.ParquetWriter(sink, schema) as writer:
+            for batch in _batched(rows, batch_size):
+                writer.write_table(pa.Table.from_pylist([row._asdict() for row in batch], schema=schema))
+                yield sink.drain()
+        yield sink.drain()
+
+    return generate()
+
+
+def summary_pdf_chunks(summary, title, generated_at=None):
+    """Yield a one-section-per-table PDF for ``models.queries.lead_summary`` output."""
+    pdf = StreamingPdf(pagesize=A4)
+    width, height = A4
+    left = 40
+    y = height - 40
+    generated_at = generated_at or datetime.now()
+
+    yield pdf.begin()
+    pdf.setFont('Helvetica-Bold', 16)
+    pdf.drawString(left, y, f'Smart Pest Solutions - {title}')
+    y -= 18
+    pdf.setFont('Helvetica', 9)
+    pdf.drawString(left, y, f'Generated: {generated_at.strftime("%Y-%m-%d %H:%M")}')
+    y -= 16
+    pdf.drawString(left, y, f"New quote requests: {summary['quotes']}    New subscribers: {summary['subscribers']}")
+    y -= 22
+
+    sections = [
+        ('Quotes by Service', summary['by_service']),
+        ('Quotes by Property Type', summary['by_property']),
+        ('Top Locations', summary['top_locations']),
+        ('Quotes per Day', summary['daily']),
+    ]
+    for heading, rows in sections:
+        if y < 90:
+            yield pdf.show_page()
+            y = height - 40
+        pdf.setFont('Helvetica-Bold', 12)
+        pdf.drawString(left, y, heading)
+        y -= 14
+        pdf.line(left, y, width - left, y)
+        y -= 12
+        pdf.setFont('Helvetica', 9)
+        for label, count in rows or [('No quote requests in this period.', '')]:
+            if y < 60:
+                yield pdf.show_page()
+                y = height - 40
+                pdf.setFont('Helvetica', 9)
+            pdf.drawString(left, y, str(label)[:70])
+            pdf.drawString(width - left - 60, y, str(count))
+            y -= 12
+        y -= 10
+
+    yield from pdf.finish()
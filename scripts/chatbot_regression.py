@@ -0,0 +1,44 @@
+"""Check the helpdesk chatbot routing against the regression corpus.
+
+Usage: python scripts/chatbot_regression.py [path/to/corpus.jsonl]
+
+Each corpus line is {"message", "expected"} with an optional "mode"
+("rules" by default, or "retrieval"/"hybrid") and optional "reply_contains",
+a list of snippets the composed reply must include.
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from chatbot_data import generate_helpdesk_replies  # noqa: E402
+
+
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), os.pardir, 'data', 'chatbot_regression.jsonl')
+CONTACT_STUB = {'phone_display': '', 'whatsapp_display': ''}
+
+
+def main(argv):
+    path = argv[1] if len(argv) > 1 else DEFAULT_CORPUS
+    failures = 0
+    total = 0
+    with open(path, encoding='utf-8') as corpus:
+        for line in corpus:
+            if not line.strip():
+                continue
+            case = json.loads(line)
+            total += 1
+            result = generate_helpdesk_replies([case['message']], CONTACT_STUB, case.get('mode', 'rules'))[0]
+            missing = [snippet for snippet in case.get('reply_contains', ()) if snippet not in result['reply']]
+            if result['route'] != case['expected'] or missing:
+                failures += 1
+                print(f"FAIL {case['message']!r}: expected {case['expected']}, got {result['route']}"
+                      + (f"; reply lacks {missing}" if missing else ''))
+
+    print(f'{total - failures}/{total} phrasings routed as expected')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,68 @@
+"""Stream a JSONL transcript through the helpdesk chatbot engine.
+
+Usage: python scripts/chatbot_replay.py [--mode rules|retrieval|hybrid] [input.jsonl] > replies.jsonl
+
+Each input line is either a JSON string or an object with a "message" field;
+other fields are passed through. One JSON object is written per input line with
+"route", "reply" and "suggestions" added. Route counts are printed to stderr.
+"""
+import argparse
+import json
+import os
+import sys
+from collections import Counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+from app import CONTACT_INFO  # noqa: E402
+from chatbot_data import CHATBOT_MODES, generate_helpdesk_replies  # noqa: E402
+from config import Config  # noqa: E402
+
+
+CHUNK_SIZE = 1000
+
+
+def _read_records(stream):
+    for line in stream:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        yield record if isinstance(record, dict) else {'message': record}
+
+
+def _chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', nargs='?', help='JSONL file (defaults to stdin)')
+    parser.add_argument('--mode', choices=CHATBOT_MODES, default=Config.CHATBOT_MODE)
+    args = parser.parse_args(argv)
+
+    stream = open(args.input, encoding='utf-8') if args.input else sys.stdin
+    routes = Counter()
+    try:
+        for chunk in _chunks(_read_records(stream), CHUNK_SIZE):
+            messages = [str(record.get('message') or '') for record in chunk]
+            for record, answer in zip(chunk, generate_helpdesk_replies(messages, CONTACT_INFO, args.mode)):
+                routes[answer['route']] += 1
+                sys.stdout.write(json.dumps({**record, **answer}) + '\n')
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    for route, count in routes.most_common():
+        print(f'{count:8d}  {route}', file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
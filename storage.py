@@ -0,0 +1,152 @@
+import os
+import shutil
+
+from flask import url_for
+
+
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+PRESIGN_EXPIRES = 600
+
+
+class LocalStorage:
+    """Uploads kept in a directory on this instance and served by the ``uploaded_file`` view.
+
+    Fine for a single long-lived server; on serverless hosts the directory is
+    per-instance and ephemeral, so use ``S3Storage`` there.
+    """
+
+    direct_uploads = False
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def _path(self, name):
+        return os.path.join(self.folder, *name.split('/'))
+
+    def save(self, name, source_path, content_type=None, cache_control=None):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(source_path, path + '.part')
+        os.replace(path + '.part', path)
+
+    def download(self, name, target):
+        with open(self._path(name), 'rb') as source:
+            shutil.copyfileobj(source, target)
+
+    def exists(self, name):
+        return os.path.exists(self._path(name))
+
+    def delete(self, name):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def list(self):
+        """Yield ``(name, modified_timestamp)`` for every stored file."""
+        for root, _dirs, files in os.walk(self.folder):
+            for filename in files:
+                if filename.startswith('.'):
+                    continue
+                path = os.path.join(root, filename)
+                yield os.path.relpath(path, self.folder).replace(os.sep, '/'), os.path.getmtime(path)
+
+    def url(self, name):
+        return url_for('uploaded_file', filename=name)
+
+    def presigned_upload(self, name, content_type, max_bytes):
+        return None
+
+
+class S3Storage:
+    """Uploads kept in an S3-compatible bucket (AWS S3, MinIO, R2, ...).
+
+    Files are pushed with boto3's managed transfer, which switches to a
+    streaming multipart upload above ``multipart_threshold``. When
+    ``public_url`` is unset, objects are addressed path-style under the
+    endpoint, which is what a local MinIO stand-in expects.
+    """
+
+    direct_uploads = True
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None, public_url=None,
+                 multipart_threshold=8 * 1024 * 1024):
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config as BotoConfig
+
+        self.bucket = bucket
+        self.prefix = prefix.strip('/') + '/' if prefix.strip('/') else ''
+        self.endpoint_url = endpoint_url
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.client = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=BotoConfig(signature_version='s3v4', s3={'addressing_style': 'path' if endpoint_url else 'auto'}),
+        )
+        self.transfer = TransferConfig(multipart_threshold=multipart_threshold, multipart_chunksize=multipart_threshold)
+
+    def _key(self, name):
+        return self.prefix + name
+
+    def save(self, name, source_path, content_type=None, cache_control=None):
+        extra = {}
+        if content_type:
+            extra['ContentType'] = content_type
+        if cache_control:
+            extra['CacheControl'] = cache_control
+        self.client.upload_file(source_path, self.bucket, self._key(name), ExtraArgs=extra, Config=self.transfer)
+
+    def download(self, name, target):
+        self.client.download_fileobj(self.bucket, self._key(name), target, Config=self.transfer)
+
+    def exists(self, name):
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except ClientError as exc:
+            if exc.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+
+    def list(self):
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+            for item in page.get('Contents', []):
+                yield item['Key'][len(self.prefix):], item['LastModified'].timestamp()
+
+    def url(self, name):
+        if self.public_url:
+            return f'{self.public_url}/{self._key(name)}'
+        if self.endpoint_url:
+            return f"{self.endpoint_url.rstrip('/')}/{self.bucket}/{self._key(name)}"
+        return f'https://{self.bucket}.s3.amazonaws.com/{self._key(name)}'
+
+    def presigned_upload(self, name, content_type, max_bytes):
+        """Form fields that let the browser POST a file straight to the bucket."""
+        return self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=self._key(name),
+            Fields={'Content-Type': content_type},
+            Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, max_bytes]],
+            ExpiresIn=PRESIGN_EXPIRES,
+        )
+
+
+def create_storage(config):
+    """Build the upload storage selected by ``STORAGE_BACKEND`` ('local' or 's3')."""
+    if config['STORAGE_BACKEND'] == 's3':
+        return S3Storage(
+            config['S3_BUCKET'],
+            prefix=config['S3_PREFIX'],
+            endpoint_url=config['S3_ENDPOINT_URL'],
+            region=config['S3_REGION'],
+            public_url=config['S3_PUBLIC_URL'],
+        )
+    return LocalStorage(config['UPLOAD_FOLDER'])
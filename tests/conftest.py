@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# app.py reads its configuration at import time, so the throwaway database is chosen before any test imports it.
+WORKDIR = tempfile.mkdtemp(prefix='smartpest-tests-')
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(WORKDIR, 'test.db')}",
+    SCHEMA_BOOTSTRAP='command',
+    INGEST_MODE='sync',
+    CHATBOT_SNAPSHOT_PATH=os.path.join(WORKDIR, 'chatbot.snapshot'),
+    CHATBOT_ANALYTICS_ENABLED='0',
+    METRICS_ENABLED='0',
+    ADMIN_USERNAME='tester',
+    ADMIN_PASSWORD='tester-password',
+)
+os.environ.pop('ADMIN_PASSWORD_HASH', None)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir)))
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app, bootstrap_database
+
+    with app.app_context():
+        bootstrap_database()
+    return app
+
+
+@pytest.fixture
+def db_session(app):
+    from models.db_setup import db
+
+    with app.app_context():
+        yield db.session
+        db.session.rollback()
+
+
+@pytest.fixture
+def admin_client(app):
+    client = app.test_client()
+    client.post('/admin/login', data={'username': 'tester', 'password': 'tester-password'}).close()
+    return client
@@ -0,0 +1,75 @@
+import asyncio
+from urllib.parse import urlencode
+
+from models.db_setup import QuoteRequest
+
+
+def drive(application, scope, messages):
+    """Run one ASGI request fed from ``messages``; return what the app sent."""
+    incoming = list(messages)
+    sent = []
+
+    async def receive():
+        return incoming.pop(0) if incoming else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    return sent
+
+
+def http_scope(method, path, headers=()):
+    return {
+        'type': 'http',
+        'http_version': '1.1',
+        'method': method,
+        'path': path,
+        'query_string': b'',
+        'headers': list(headers),
+        'client': ('127.0.0.1', 50000),
+        'server': ('testserver', 80),
+    }
+
+
+def test_disconnect_mid_upload_writes_no_quote(app, db_session):
+    from asgi import application
+
+    body = urlencode({
+        'full_name': 'Truncated Visitor',
+        'phone': '+266 50000000',
+        'location': 'Maseru',
+        'property_type': 'Residential',
+        'service_type': 'Pest Control',
+        'message': 'hello world',
+    }).encode('ascii')
+    scope = http_scope('POST', '/request-quote', [
+        (b'content-type', b'application/x-www-form-urlencoded'),
+        (b'content-length', str(len(body)).encode('ascii')),
+    ])
+    cut = body.index(b'world') + 3
+    sent = drive(application, scope, [
+        {'type': 'http.request', 'body': body[:cut], 'more_body': True},
+        {'type': 'http.disconnect'},
+    ])
+
+    assert sent == []
+    assert QuoteRequest.query.filter_by(full_name='Truncated Visitor').count() == 0
+
+
+def test_complete_post_is_dispatched(app, db_session):
+    from asgi import application
+
+    body = urlencode({
+        'full_name': 'Complete Visitor',
+        'phone': '+266 50000001',
+        'location': 'Maseru',
+        'property_type': 'Residential',
+        'service_type': 'Pest Control',
+        'message': 'hello world',
+    }).encode('ascii')
+    scope = http_scope('POST', '/request-quote', [(b'content-type', b'application/x-www-form-urlencoded')])
+    sent = drive(application, scope, [{'type': 'http.request', 'body': body}])
+
+    assert sent[0]['status'] == 302
+    assert QuoteRequest.query.filter_by(full_name='Complete Visitor').one().message == 'hello world'
@@ -0,0 +1,15 @@
+from chatbot_retrieval import FuzzyIndex
+
+
+def test_fuzzy_search_prefers_the_longest_query_word_between_equal_distances():
+    index = FuzzyIndex([('pest:Termites', 'termites'), ('pest:Cockroaches', 'cockroach')])
+
+    # Both words are one edit away; "cocroach" is the longer query word in either order.
+    assert index.search(['termits', 'cocroach'])[0] == 'pest:Cockroaches'
+    assert index.search(['cocroach', 'termits'])[0] == 'pest:Cockroaches'
+
+
+def test_fuzzy_search_prefers_fewer_edits_over_length():
+    index = FuzzyIndex([('pest:Termites', 'termites'), ('pest:Cockroaches', 'cockroaches')])
+
+    assert index.search(['cokroachs', 'termits'])[0] == 'pest:Termites'
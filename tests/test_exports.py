@@ -0,0 +1,43 @@
+import re
+import zlib
+
+from models.db_setup import QuoteRequest
+
+
+def pdf_text(data):
+    return b''.join(zlib.decompress(stream) for stream in re.findall(rb'stream\n(.*?)\nendstream', data, re.S))
+
+
+def test_leads_pdf_applies_the_page_filters(app, db_session, admin_client):
+    for name, location in (('Lead Teya', 'Teyateyaneng'), ('Lead Qacha', "Qacha's Nek")):
+        db_session.add(QuoteRequest(full_name=name, phone='+266 50000003', location=location,
+                                    property_type='Residential', service_type='Pest Control'))
+    db_session.commit()
+
+    response = admin_client.get('/admin/leads/export/pdf?location=teya')
+    text = pdf_text(response.get_data())
+
+    assert response.status_code == 200
+    assert b'Lead Teya' in text
+    assert b'Lead Qacha' not in text
+    assert b'Quote Requests \\(1\\)' in text
+
+
+def test_streaming_pdf_xref_points_at_every_object():
+    from pdf_stream import XREF_BATCH, StreamingPdf
+
+    pdf = StreamingPdf()
+    chunks = [pdf.begin()]
+    for page in range(XREF_BATCH):  # enough objects for the xref to span several chunks
+        pdf.drawString(40, 800, f'Page {page}')
+        chunks.append(pdf.show_page())
+    chunks.extend(pdf.finish())
+    data = b''.join(chunks)
+
+    xref_offset = int(data.rsplit(b'startxref\n', 1)[1].split(b'\n')[0])
+    lines = data[xref_offset:].split(b'\n')
+    count = int(lines[1].split()[1])
+    for object_id in range(1, count):
+        offset = int(lines[2 + object_id][:10])
+        assert data[offset:].startswith(b'%d 0 obj' % object_id)
+    assert b'/Count %d >>' % XREF_BATCH in data
@@ -0,0 +1,31 @@
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateIndex
+
+from models.db_setup import QuoteRequest
+from models.queries import QUOTE_COLUMNS, _filter_quotes, stream_quotes
+
+
+def add_quote(session, location):
+    session.add(QuoteRequest(full_name=f'Lead in {location}', phone='+266 50000002', location=location,
+                             property_type='Residential', service_type='Pest Control'))
+
+
+def test_location_prefix_skips_punctuated_neighbours(app, db_session):
+    for location in ('Maseru', 'MAFETENG', 'M-Berea', 'M Aseru', 'M.bokong', 'Mb Village', 'Leribe'):
+        add_quote(db_session, location)
+    db_session.flush()
+
+    found = {row.location for row in stream_quotes({'location': 'ma'})}
+
+    assert found == {'Maseru', 'MAFETENG'}
+
+
+def test_location_prefix_compares_bytewise_on_postgres():
+    statement = _filter_quotes(select(*QUOTE_COLUMNS), {'location': 'ma'})
+    sql = str(statement.compile(dialect=postgresql.dialect()))
+    assert sql.count('lower(quote_request.location) COLLATE "C"') == 2
+
+    index = next(index for index in QuoteRequest.__table__.indexes if index.name == 'ix_quote_request_location_bytes_created_id')
+    ddl = str(CreateIndex(index).compile(dialect=postgresql.dialect()))
+    assert 'lower(location) COLLATE "C"' in ddl
@@ -0,0 +1,154 @@
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import time
+
+from werkzeug.utils import secure_filename
+
+from images import VARIANT_FORMATS, VARIANT_WIDTHS, ingest_image
+from models.db_setup import Product, Service, db
+from storage import IMMUTABLE_CACHE_CONTROL
+
+
+CHUNK_SIZE = 64 * 1024
+STEM_LENGTH = 32
+CONTENT_ADDRESSED = re.compile(r'^[0-9a-f]{%d}(-[a-z]+)?\.[a-z0-9]+$' % STEM_LENGTH)
+# Direct browser uploads land here until the form that references them is saved.
+INCOMING_KEY = re.compile(r'^incoming/[0-9a-f]{32}\.[a-z0-9]+$')
+
+
+class _HashingWriter:
+    def __init__(self, target, hasher):
+        self.target = target
+        self.hasher = hasher
+
+    def write(self, chunk):
+        self.hasher.update(chunk)
+        return self.target.write(chunk)
+
+
+def is_content_addressed(filename):
+    """True for upload names derived from their content hash, which never change."""
+    return bool(CONTENT_ADDRESSED.match(os.path.basename(filename)))
+
+
+def image_files(image):
+    """Every stored file behind an ``image`` value kept on a Product or Service."""
+    if image.endswith('-full.jpg') and is_content_addressed(image):
+        stem = image[:STEM_LENGTH]
+        return [f'{stem}-{variant}.{extension}' for variant in VARIANT_WIDTHS for extension in VARIANT_FORMATS]
+    return [image]
+
+
+def _stored_fields(digest, storage):
+    """Image fields of a row already pointing at this content, if its files are still stored."""
+    for model in (Product, Service):
+        statement = (
+            db.select(model.image, model.image_width, model.image_height)
+            .where(model.image_hash == digest, model.image.isnot(None))
+            .limit(1)
+        )
+        row = db.session.execute(statement).first()
+        if row and all(storage.exists(name) for name in image_files(row.image)):
+            return {'image': row.image, 'image_width': row.image_width, 'image_height': row.image_height}
+    return None
+
+
+def _store(source_path, digest, extension, storage, workdir):
+    fields = _stored_fields(digest, storage)
+    if fields is None:
+        stem = digest[:STEM_LENGTH]
+        try:
+            fields = ingest_image(source_path, workdir, stem)
+            names = image_files(fields['image']) if fields else []
+        except ImportError:
+            # Without Pillow the original file itself is the stored image.
+            fields = {'image': f'{stem}.{extension}', 'image_width': None, 'image_height': None}
+            os.replace(source_path, os.path.join(workdir, fields['image']))
+            names = [fields['image']]
+        if fields is None:
+            return None
+        for name in names:
+            storage.save(
+                name,
+                os.path.join(workdir, name),
+                content_type=mimetypes.guess_type(name)[0],
+                cache_control=IMMUTABLE_CACHE_CONTROL,
+            )
+    fields['image_hash'] = digest
+    return fields
+
+
+def store_upload(file_storage, storage):
+    """Store an upload under its content hash and return the model image fields.
+
+    The SHA-256 is computed while the upload streams to a temporary file, so
+    the bytes are read once. Uploading the same image again reuses the stored
+    variants. Returns None when the file cannot be decoded as an image.
+    """
+    extension = secure_filename(file_storage.filename).rsplit('.', 1)[1].lower()
+    hasher = hashlib.sha256()
+    with tempfile.TemporaryDirectory() as workdir:
+        source_path = os.path.join(workdir, 'source')
+        with open(source_path, 'wb') as source:
+            while chunk := file_storage.stream.read(CHUNK_SIZE):
+                hasher.update(chunk)
+                source.write(chunk)
+        return _store(source_path, hasher.hexdigest(), extension, storage, workdir)
+
+
+def store_incoming(key, storage):
+    """Finish a direct upload: fetch ``key`` once, store it like a form upload, drop the original."""
+    if not INCOMING_KEY.match(key) or not storage.exists(key):
+        return None
+    hasher = hashlib.sha256()
+    with tempfile.TemporaryDirectory() as workdir:
+        source_path = os.path.join(workdir, 'source')
+        with open(source_path, 'wb') as source:
+            storage.download(key, _HashingWriter(source, hasher))
+        fields = _store(source_path, hasher.hexdigest(), key.rsplit('.', 1)[1], storage, workdir)
+    storage.delete(key)
+    return fields
+
+
+def is_referenced(image):
+    statement = db.select(
+        db.or_(
+            db.select(Product.id).where(Product.image == image).exists(),
+            db.select(Service.id).where(Service.image == image).exists(),
+        )
+    )
+    return bool(db.session.execute(statement).scalar())
+
+
+def release_image(image, storage):
+    """Delete an image's files once no product or service refers to it any more."""
+    if not image or is_referenced(image):
+        return False
+    for name in image_files(image):
+        storage.delete(name)
+    return True
+
+
+def collect_orphans(storage, grace_seconds=3600, dry_run=False):
+    """Remove uploads no product or service references; return the removed names.
+
+    Files modified within ``grace_seconds`` are kept so an upload whose
+    record has not been committed yet is not collected.
+    """
+    referenced = set()
+    for model in (Product, Service):
+        for image in db.session.execute(db.select(model.image).where(model.image.isnot(None))).scalars():
+            referenced.update(image_files(image))
+
+    cutoff = time.time() - grace_seconds
+    removed = []
+    for name, modified in list(storage.list()):
+        if name in referenced or modified > cutoff:
+            continue
+        if not dry_run:
+            storage.delete(name)
+        removed.append(name)
+    return sorted(removed)